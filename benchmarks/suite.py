@@ -0,0 +1,189 @@
+"""
+Benchmark suite for data loading, single and bulk prediction, history reads and the dashboard
+
+Runs offline on the inbuilt data resampled with a fixed seed, writes the timings
+as JSON and compares them with a stored baseline. Exits with status 1 when a
+metric is slower than its baseline by more than the tolerance.
+
+Usage:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --tolerance 0.25 --output results.json
+    python -m benchmarks.suite --update-baseline
+"""
+import pandas as pd
+import numpy as np
+import platform
+import argparse
+import sklearn
+import glob
+import json
+import time
+import sys
+import os
+
+from utils import compact_frame, dashboard_cube, data_cache, func, registry, scoring, tree_engine
+
+
+BASELINE_FILE = "./benchmarks/baseline.json"
+RESULTS_FILE = "./benchmarks/results.json"
+DEFAULT_TOLERANCE = 0.5
+# Slowdowns smaller than this are timer noise, whatever their percentage
+DEFAULT_MIN_DELTA_MS = 1.0
+DEFAULT_BULK_SIZES = [2_000, 100_000, 1_000_000]
+
+# One customer as entered on the single prediction form
+SINGLE_CUSTOMER = {
+    "gender": "Female", "SeniorCitizen": "No", "Partner": "Yes", "Dependents": "No", "tenure": 12, "PhoneService": "Yes",
+    "MultipleLines": "No", "InternetService": "Fiber optic", "OnlineSecurity": "No", "OnlineBackup": "Yes",
+    "DeviceProtection": "No", "TechSupport": "No", "StreamingTV": "Yes", "StreamingMovies": "No", "Contract": "Month-to-month",
+    "PaperlessBilling": "Yes", "PaymentMethod": "Electronic check", "MonthlyCharges": 84.45, "TotalCharges": 1059.55,
+}
+
+
+def best_of(function, repeats):
+    """
+    returns the fastest of `repeats` timed calls, in seconds
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def median_of(function, calls):
+    """
+    returns the median time of many short calls, in seconds
+    """
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def resample(df, n_rows, seed):
+    return df.sample(n_rows, replace = True, random_state = seed).reset_index(drop = True)
+
+
+def run(bulk_sizes, repeats, seed):
+    """
+    runs every benchmark and returns {metric: {"seconds": ..., "rows": ...}}
+    """
+    metrics = {}
+
+    def record(name, seconds, rows = None):
+        metrics[name] = {"seconds": round(seconds, 6)}
+        if rows is not None:
+            metrics[name]["rows"] = rows
+            metrics[name]["rows_per_second"] = round(rows / max(seconds, 1e-12), 1)
+        print(f"{name:<40} {seconds * 1000:>12.3f} ms" + (f" {rows / max(seconds, 1e-12):>14,.0f} rows/s" if rows else ""))
+
+    # Loading the inbuilt dataset, from the Excel file and through the app's loader
+    record("load_data.excel", best_of(data_cache.read_source, repeats))
+    func.load_data()
+    record("load_data", best_of(func.load_data, repeats))
+    inbuilt = compact_frame.expand(func.load_data())
+
+    # Model time of one prediction from the entry form
+    for name in ["gradient_boost", "logistic_regression"]:
+        predictor, _ = registry.get_single_predictor(name)
+        predictor.predict_proba(SINGLE_CUSTOMER)
+        record(f"single_predict.{name}", median_of(lambda: predictor.predict_proba(SINGLE_CUSTOMER), 200))
+
+    # Bulk scoring throughput with the sklearn pipeline and the vectorized tree engine
+    model, threshold = registry.get("gradient_boost")
+    engine = tree_engine.compile_pipeline(model)
+    encoder = registry.get("encoder")
+    for n_rows in bulk_sizes:
+        df = resample(inbuilt, n_rows, seed)
+        record(f"bulk_predict.sklearn.{n_rows}", best_of(lambda: scoring.bulk_prediction(model, threshold, df, encoder), repeats), n_rows)
+        record(f"bulk_predict.vectorized.{n_rows}", best_of(lambda: scoring.bulk_prediction(engine, threshold, df, encoder), repeats), n_rows)
+
+    # Reading the prediction history files
+    for path in sorted(glob.glob("./data/*.csv")):
+        rows = sum(1 for _ in open(path, "rb")) - 1
+        record(f"history_read.{os.path.basename(path)}", best_of(lambda: pd.read_csv(path), repeats), rows)
+
+    # Analytical Dashboard: building the filter cube, then one slider change answered from it
+    dashboard_data = pd.read_csv("./data/data_output.csv")
+    for n_rows in [len(dashboard_data), max(bulk_sizes)]:
+        df = dashboard_data if n_rows == len(dashboard_data) else resample(dashboard_data, n_rows, seed)
+        record(f"dashboard_cube_build.{n_rows}", best_of(lambda: dashboard_cube.FilterCube.from_frame(df), repeats), n_rows)
+        cube = dashboard_cube.FilterCube.from_frame(df)
+
+        def filter_and_aggregate():
+            filtered = cube.filter((5, 40), (1000.0, 5000.0), (30.0, 90.0))
+            filtered.total("MonthlyCharges"), filtered.total("TotalCharges"), filtered.churn_count("No")
+            filtered.churn_by_tenure(), filtered.churned_by("InternetService"), filtered.churned_by("Contract")
+
+        record(f"dashboard_filter.{n_rows}", best_of(filter_and_aggregate, repeats), n_rows)
+
+    return metrics
+
+
+def compare(metrics, baseline, tolerance, min_delta_ms = DEFAULT_MIN_DELTA_MS):
+    """
+    returns the metrics slower than their baseline by more than the tolerance
+    """
+    regressions = []
+    for name, result in metrics.items():
+        if name not in baseline:
+            continue
+        limit = max(baseline[name]["seconds"] * (1 + tolerance), baseline[name]["seconds"] + min_delta_ms / 1000)
+        if result["seconds"] > limit:
+            regressions.append((name, baseline[name]["seconds"], result["seconds"]))
+    return regressions
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Time loading, prediction, history and dashboard steps against a stored baseline")
+    parser.add_argument("--output", default = RESULTS_FILE, help = "JSON file the results are written to")
+    parser.add_argument("--baseline", default = BASELINE_FILE, help = "JSON results to compare with")
+    parser.add_argument("--tolerance", type = float, default = DEFAULT_TOLERANCE, help = "allowed slowdown, 0.5 means 50%% slower")
+    parser.add_argument("--min-delta-ms", type = float, default = DEFAULT_MIN_DELTA_MS, help = "ignore slowdowns smaller than this")
+    parser.add_argument("--bulk-sizes", type = int, nargs = "+", default = DEFAULT_BULK_SIZES, help = "rows per bulk scoring run")
+    parser.add_argument("--repeats", type = int, default = 5, help = "runs per benchmark, the fastest is kept")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--update-baseline", action = "store_true", help = "store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    metrics = run(args.bulk_sizes, args.repeats, args.seed)
+    results = {
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                        "numpy": np.__version__, "pandas": pd.__version__, "scikit-learn": sklearn.__version__},
+        "seed": args.seed,
+        "repeats": args.repeats,
+        "metrics": metrics,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent = 2)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent = 2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --update-baseline to store one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["metrics"]
+
+    regressions = compare(metrics, baseline, args.tolerance, args.min_delta_ms)
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms ({after / before - 1:+.0%})")
+    if regressions:
+        print(f"{len(regressions)} metric(s) slower than the baseline by more than {args.tolerance:.0%}")
+        return 1
+    print(f"All metrics within {args.tolerance:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
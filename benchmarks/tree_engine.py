@@ -0,0 +1,59 @@
+"""
+Throughput of the vectorized tree engine against the gradient boost pipeline's predict_proba
+
+Rows are resampled from the inbuilt Telco data with a fixed seed.
+
+Usage:
+    python -m benchmarks.tree_engine
+    python -m benchmarks.tree_engine --sizes 1 1000 1000000 --repeats 3
+"""
+import numpy as np
+import argparse
+import time
+
+from utils import data_cache, scoring, tree_engine
+
+
+def load_rows(n_rows, seed = 0):
+    """
+    returns n_rows feature rows sampled with replacement from the inbuilt data
+    """
+    df = data_cache.load_inbuilt_data()[scoring.expected_features]
+    return df.sample(n_rows, replace = True, random_state = seed).reset_index(drop = True)
+
+
+def best_time(predict, df, repeats):
+    """
+    returns the fastest of `repeats` runs and the last probabilities
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        probability = predict(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), probability
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Compare sklearn and vectorized tree engine throughput")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = [1, 1_000, 1_000_000], help = "batch sizes in rows")
+    parser.add_argument("--repeats", type = int, default = 3, help = "runs per batch size, the fastest is reported")
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args(argv)
+
+    pipeline, _ = scoring.load_gradient_boost()
+    start = time.perf_counter()
+    engine = tree_engine.compile_pipeline(pipeline)
+    print(f"Compiled {len(pipeline.named_steps['classifier'].estimators_)} trees in {time.perf_counter() - start:.3f}s")
+
+    print(f"{'rows':>10} {'sklearn rows/s':>16} {'engine rows/s':>16} {'speedup':>8} {'max abs diff':>13}")
+    for n_rows in args.sizes:
+        df = load_rows(n_rows, args.seed)
+        sklearn_seconds, expected = best_time(pipeline.predict_proba, df, args.repeats)
+        engine_seconds, probability = best_time(engine.predict_proba, df, args.repeats)
+        print(f"{n_rows:>10,} {n_rows / sklearn_seconds:>16,.0f} {n_rows / engine_seconds:>16,.0f} "
+              f"{sklearn_seconds / engine_seconds:>7.2f}x {np.abs(expected - probability).max():>13.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,360 +1,562 @@
-import streamlit as st
-import streamlit_authenticator as stauth
-from streamlit_authenticator.utilities import Hasher
-from streamlit_lottie import st_lottie
-from yaml.loader import  SafeLoader
-import pandas as pd
-import numpy as np
-import datetime
-import joblib
-import yaml
-import json
-import sys
-import os
-
-
-# Calculate the path you want to add
-root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-# Add it to sys.path only if it's not already there
-if root_path not in sys.path:
-    sys.path.append(root_path)
-
-# Import custom modules
-from utils import func
-
-# Set up Home page
-st.set_page_config(page_title = "Customer Churn Prediction App", page_icon = "🔭", layout = "wide")
-
-# Load yaml file    
-with open("config.yaml") as file:
-    config = yaml.load(file, Loader=SafeLoader)
-
-# Pre-hashing all plain text passwords once
-Hasher.hash_passwords(config["credentials"])
-
-authenticator = stauth.Authenticate(
-    config["credentials"],
-    config["cookie"]["name"],
-    config["cookie"]["key"],
-    config["cookie"]["expiry_days"],
-    config["pre-authorized"],
-    False
-)
-
-authenticator.login("sidebar", "Login")
-
-if st.session_state["authentication_status"] is False:
-    st.sidebar.error("Incorrect Username/Password")
-    st.sidebar.info("Please enter username and password to access the bulk prediction page")
-    st.sidebar.code(
-            """
-            Test Account's Credentials:
-            Username: test_user
-            Password: user123
-            """
-            )
-      
-if st.session_state["authentication_status"] is None:
-    st.sidebar.info("Please enter username and password to access the bulk prediction page")
-    st.sidebar.code(
-            """
-            Test Account's Credentials:
-            Username: test_user
-            Password: user123
-            """
-            )
-
-    # Load gradient boost and threshold
-    @st.cache_resource(show_spinner = "Model Loading")
-    def load_gradient_boost():
-        model, threshold = joblib.load("./models/gradient_boost_model.joblib")
-        return model, threshold
-
-    # Load logistic regression and threshold
-    @st.cache_resource(show_spinner = "Model Loading")
-    def load_logistic_regression():
-        model, threshold = joblib.load("./models/logistic_regression_model.joblib")
-        return model, threshold
-
-
-    def select_model():
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.markdown("<h1 style='color: lightblue;'> 🔮 Prediction Hub</h1>", unsafe_allow_html=True)
-        with col2:
-            st.selectbox("Select a model", options = ["Gradient Boost", "Logistic Regression"], key = "selected_model")
-            
-        if st.session_state["selected_model"] == "Gradient Boost":
-            pipeline, threshold = load_gradient_boost()
-        else:
-            pipeline, threshold = load_logistic_regression()
-
-        if pipeline and threshold:
-            encoder = joblib.load("./models/encoder.joblib")
-        else:
-            encoder = None
-
-        return pipeline, encoder, threshold
-
-
-    if "probability" not in st.session_state:
-        st.session_state["probability"] = None
-    if "prediction" not in st.session_state:
-        st.session_state["prediction"] = None
-
-
-    def make_prediction(pipeline, encoder, threshold):
-        data = [[st.session_state["gender"], st.session_state["SeniorCitizen"], st.session_state["Partner"], st.session_state["Dependents"],
-                st.session_state["tenure"], st.session_state["PhoneService"], st.session_state["MultipleLines"],
-                st.session_state["InternetService"], st.session_state["OnlineSecurity"], st.session_state["OnlineBackup"],
-                st.session_state["DeviceProtection"], st.session_state["TechSupport"], st.session_state["StreamingTV"],
-                st.session_state["StreamingMovies"], st.session_state["Contract"], st.session_state["PaperlessBilling"],
-                st.session_state["PaymentMethod"], st.session_state["MonthlyCharges"], st.session_state["TotalCharges"]]]
-        
-        columns = ["gender", "SeniorCitizen", "Partner", "Dependents", "tenure", "PhoneService", "MultipleLines",
-                "InternetService", "OnlineSecurity", "OnlineBackup", "DeviceProtection", "TechSupport", "StreamingTV",
-                "StreamingMovies", "Contract", "PaperlessBilling", "PaymentMethod", "MonthlyCharges", "TotalCharges"]
-        
-        df = pd.DataFrame(data, columns = columns)
-
-        probability = pipeline.predict_proba(df)
-        pred = (probability[:, 1] >= threshold).astype(int)
-        pred = int(pred[0])
-        prediction = encoder.inverse_transform([pred])[0]
-
-        # Copy the original DataFrame to avoid modifying it directly
-        history_df = df.copy()
-        
-        # Get the current date and time
-        now = datetime.datetime.now()
-        formatted_time = f"{now.hour:02d}:{now.minute:02d}"
-        formatted_date = f"{now.date()}"
-        
-        # Add relevant information to the DataFrame
-        history_df.insert(0, "Prediction_Date", formatted_date)
-        history_df.insert(1, "Prediction_Time", formatted_time)
-        history_df["Model_used"] = st.session_state["selected_model"]
-        history_df["Customer_Churn_status"] = prediction
-        history_df["Probability"] = np.where(pred == 0, np.round(probability[:, 0]*100, 2), np.round(probability[:, 1]*100, 2))
-        
-        # Save the DataFrame to a CSV file, appending to it if it already exists
-        history_df.to_csv("./data/history.csv", mode = "a", header = not os.path.exists("./data/history.csv"), index = False)
-
-        st.session_state["probability"] = probability
-        st.session_state["prediction"] = prediction
-
-        return probability, prediction
-
-
-    def entry_form(pipeline, encoder, threshold):
-        st.markdown("#### Enter Customer's Information")
-        with st.form(key = "Customer_info"):
-
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                gender = st.selectbox("Gender", options = ["Male", "Female"], key = "gender")
-                SeniorCitizen = st.selectbox("Senior Citizen", options = ["Yes", "No"], key = "SeniorCitizen")
-                Dependents = st.selectbox("Has dependents", options = ["Yes", "No"], key = "Dependents")
-                Partner = st.selectbox("Has a partner", options = ["Yes", "No"], key = "Partner")
-                PhoneService = st.selectbox("Has phone service", options = ["Yes", "No"], key = "PhoneService")
-                            
-            with col2:
-                DeviceProtection = st.selectbox("Has device protection",options = ["Yes", "No", "No internet service"], key = "DeviceProtection")
-                OnlineBackup = st.selectbox("Has online backup", options = ["Yes", "No", "No internet service"], key = "OnlineBackup")
-                OnlineSecurity = st.selectbox("Has online security", options = ["Yes", "No", "No internet service"], key = "OnlineSecurity")
-                TechSupport = st.selectbox("Has tech support", options = ["Yes", "No", "No internet service"], key = "TechSupport")
-                InternetService = st.selectbox("Internet service", options = ["DSL", "Fiber optic", "No"], key = "InternetService")
-                
-            with col3:
-                MultipleLines = st.selectbox("Multiple lines", options = ["Yes", "No", "No phone service"], key = "MultipleLines")
-                PaperlessBilling = st.selectbox("Paperless billing", options = ["Yes", "No"], key = "PaperlessBilling")
-                StreamingTV = st.selectbox("Streaming TV", options = ["Yes", "No", "No internet service"], key = "StreamingTV")
-                PaymentMethod = st.selectbox("Payment method", options = ["Electronic check", "Mailed check", "Bank transfer", "Credit card"], key = "PaymentMethod")
-                StreamingMovies = st.selectbox("Streaming movies", options = ["Yes", "No", "No internet service"], key = "StreamingMovies")      
-                        
-            with col4:
-                Contract = st.selectbox("Contract type", options = ["Month-to-month", "One year", "Two year"], key = "Contract")
-                tenure = st.number_input("Number of Months (tenure)", min_value = 1, key = "tenure")
-                MonthlyCharges = st.number_input("Monthly charges ($)", min_value = 0.0, step = 0.01, key = "MonthlyCharges")
-                TotalCharges = st.number_input("Total charges ($)", min_value = 0.0, step = 0.01, key = "TotalCharges")
-
-            sumbit_button = st.form_submit_button("Make Prediction")
-
-            if sumbit_button:
-                if None in [gender, SeniorCitizen, Dependents, Partner, tenure, PhoneService, PaymentMethod,
-                            DeviceProtection, OnlineBackup, OnlineSecurity, TechSupport, MonthlyCharges, InternetService,
-                            MultipleLines, PaperlessBilling, StreamingTV, StreamingMovies, Contract, TotalCharges]:
-                    st.warning("Please fill in all required fields.")
-                else:
-                    make_prediction(pipeline, encoder, threshold)
-
-
-    if __name__ == "__main__":
-        
-        pipeline, encoder, threshold = select_model()
-
-        if pipeline and encoder and threshold:
-            entry_form(pipeline, encoder, threshold)
-
-            probability = st.session_state["probability"]
-            prediction = st.session_state["prediction"]
-
-            if prediction == "Yes":
-                st.warning(f"#### ❌ Customer is likely to churn.\nProbability: {probability[0][1]*100:.2f}%")
-            elif prediction == "No":
-                st.success(f"#### ✅ Customer is unlikely to churn.\nProbability: {probability[0][0]*100:.2f}%")
-            else:
-                st.markdown("#### No prediction made yet") 
-
-     
-elif st.session_state["authentication_status"]:
-    authenticator.logout(location = "sidebar")
-    st.markdown("<h1 style='color: lightblue;'> 📁 Bulk Prediction Hub</h1>", unsafe_allow_html=True)
-    st.info(f"### You are in *{st.session_state['name']}* 😊")
-
-    # Load gradient boost and threshold
-    def load_gradient_boost():
-        model, threshold = joblib.load("./models/gradient_boost_model.joblib")
-        return model, threshold
-    
-    encoder = joblib.load("./models/encoder.joblib")
-
-    def bulk_prediction(model, threshold, df, encoder):
-        # Make predictions
-        prob_score = model.predict_proba(df.drop(columns=["customerID"]))
-        bulk_pred = (prob_score[:, 1] >= threshold).astype(int)
-        # Inverse transform encoded predictions
-        bulk_prediction = encoder.inverse_transform(bulk_pred)
-        return bulk_prediction, prob_score
-
-    def make_prediction(df, is_uploaded_data):
-        
-        # Define expected feature columns
-        expected_features = ["gender", "SeniorCitizen", "Partner", "Dependents", "tenure", "PhoneService", "MultipleLines",
-                             "InternetService", "OnlineSecurity", "OnlineBackup", "DeviceProtection", "TechSupport", "StreamingTV",
-                             "StreamingMovies", "Contract", "PaperlessBilling", "PaymentMethod", "MonthlyCharges", "TotalCharges"]
-        
-        # Button to preview data
-        if df is not None:
-            # Load data
-            if st.button("Preview Data"):
-                st.dataframe(df.head())
-
-            # Button to make prediction
-            if st.button("Make Prediction"):
-                # Check if uploaded data has same feature as expected
-                if all(feature in df.columns for feature in expected_features):
-                    model, threshold = load_gradient_boost()
-
-                    if model is not None:
-                        bulk_predict, probability_score = bulk_prediction(model, threshold, df, encoder)
-            
-                        # Copy the original DataFrame to avoid modifying it directly
-                        bulk_history_df = df.copy()
-                        
-                        # Get the current date and time
-                        now = datetime.datetime.now()
-                        formatted_date = f"{now.date()}"
-                        
-                        # Add relevant information to the DataFrame
-                        bulk_history_df.insert(1, "Prediction_Date", formatted_date)
-                        bulk_history_df["Model_used"] = "Gradient Boost Classifier"
-                        bulk_history_df["Churn"] = bulk_predict
-                        bulk_history_df["Probability"] = np.where(bulk_predict == 0, np.round(probability_score[:, 0]*100, 2), np.round(probability_score[:, 1]*100, 2))
-
-                        # Determine history file based on dataset source
-                        history_file = "./data/uploaded_data_history.csv" if is_uploaded_data else "./data/inbuilt_data_history.csv"
-                        
-                        # Save the DataFrame to a CSV file, overrriding already existed file
-                        bulk_history_df.to_csv(history_file, mode = "w", header = True, index = False)
-
-                        st.success(f"#### Predictions made successfully.")
-                    else:
-                        st.error("### Failed to load Gradient Boost model.")
-                else:
-                    st.error("### Uploaded data does not match expected features.")
-
-            # Button to preview prediction history
-            if st.button("Preview Prediction"):
-                history_file = "./data/uploaded_data_history.csv" if is_uploaded_data else "./data/inbuilt_data_history.csv"
-                if os.path.exists(history_file):
-                    history_df = pd.read_csv(history_file)
-                    st.dataframe(history_df.head())
-                else:
-                    st.warning("### No prediction history found")
-
-
-    def main():
-        # Option to use inbuilt or uploaded data
-        data_source = st.radio("Choose a data source", ["Inbuilt Data", "Use previously uploaded data", "Upload new data"])
-
-        if data_source == "Inbuilt Data":
-
-            df = func.load_data()
-
-            # Load lottie
-            lottie_animation = func.load_lottie("assets/Animation_predict.json")
-            with st.sidebar:
-                st_lottie(lottie_animation, height = 350)
-
-            make_prediction(df, is_uploaded_data = False)
-
-        elif data_source == "Use previously uploaded data":
-            if "uploaded_data" in st.session_state:
-                df = st.session_state["uploaded_data"]
-                st.sidebar.success("### Using previously uploaded data from data page")
-
-                if make_prediction(df, is_uploaded_data = True):
-                    # Delete uploaded data from session state after successful prediction
-                    st.session_state["uploaded_data"] = None
-
-            lottie_animation = func.load_lottie("assets/Animation_predict.json")
-            with st.sidebar:
-                st_lottie(lottie_animation, height = 350)
-
-        elif data_source == "Upload new data":
-                
-                # Upload data
-                uploaded_file = st.sidebar.file_uploader("Upload Dataset", type = ["csv", "xlsx"])
-
-                if uploaded_file is not None:
-                    if uploaded_file.name.endswith(".csv"):
-                        df = pd.read_csv(uploaded_file)
-                    elif uploaded_file.name.endswith(".xlsx"):
-                        df = pd.read_excel(uploaded_file)
-                    else:
-                        st.warning("Unsupported file type. Please upload a csv or xlsx file")
-                    
-                    # Coerce non-numeric entries in numeric columns to NaN
-                    df["SeniorCitizen"] = df["SeniorCitizen"].map({1: "Yes", 0: "No"})
-                    df["tenure"] = pd.to_numeric(df["tenure"], errors = "coerce")
-                    df["MonthlyCharges"] = pd.to_numeric(df["MonthlyCharges"], errors = "coerce")
-                    df["TotalCharges"] = pd.to_numeric(df["TotalCharges"], errors = "coerce")
-
-                    make_prediction(df, is_uploaded_data = True)
-                    
-                else:
-                    st.sidebar.warning("### Please upload a dataset and continue.")
-        
-
-                right, middle, left = st.columns([2, 2, 1])
-                with left:
-                    # Load lottie
-                    lottie_animation = func.load_lottie("assets/Animation_predict.json")
-                    # with st.sidebar:
-                    st_lottie(lottie_animation, height = 350)
-
-    main()
-
-    
-   
-
-
-
-
-
-
-
-
-
+import streamlit as st
+from streamlit_lottie import st_lottie
+import plotly.express as px
+import pandas as pd
+import numpy as np
+import datetime
+import sys
+import os
+
+
+# Calculate the path you want to add
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Add it to sys.path only if it's not already there
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+# Import custom modules
+from utils import auth, bulk_archive, compact_frame, explain, func, history_store, history_writer, incremental, ingest, model_compare, parallel, registry, scoring, stage_timing, thresholds
+
+# Set up Home page
+st.set_page_config(page_title = "Customer Churn Prediction App", page_icon = "🔭", layout = "wide")
+
+# Show version, load time and memory of the models loaded by this server process
+def show_model_registry():
+    with st.sidebar.expander("Loaded models"):
+        st.dataframe(pd.DataFrame(registry.stats()).drop(columns = ["path"]), hide_index = True)
+
+
+# Login config is parsed and its passwords hashed once per server process, not on every rerun
+authenticator = auth.authenticator()
+authenticator.login("sidebar", "Login")
+
+if st.session_state["authentication_status"] is False:
+    st.sidebar.error("Incorrect Username/Password")
+    st.sidebar.info("Please enter username and password to access the bulk prediction page")
+    st.sidebar.code(
+            """
+            Test Account's Credentials:
+            Username: test_user
+            Password: user123
+            """
+            )
+      
+if st.session_state["authentication_status"] is None:
+    st.sidebar.info("Please enter username and password to access the bulk prediction page")
+    st.sidebar.code(
+            """
+            Test Account's Credentials:
+            Username: test_user
+            Password: user123
+            """
+            )
+
+    # Load gradient boost and threshold, once per process through the model registry,
+    # with the encoding of every categorical option precomputed
+    def load_gradient_boost():
+        return registry.get_single_predictor("gradient_boost")
+
+    # Load logistic regression and threshold
+    def load_logistic_regression():
+        return registry.get_single_predictor("logistic_regression")
+
+
+    def select_model():
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.markdown("<h1 style='color: lightblue;'> 🔮 Prediction Hub</h1>", unsafe_allow_html=True)
+        with col2:
+            st.selectbox("Select a model", options = ["Gradient Boost", "Logistic Regression"], key = "selected_model")
+            
+        if st.session_state["selected_model"] == "Gradient Boost":
+            pipeline, threshold = load_gradient_boost()
+        else:
+            pipeline, threshold = load_logistic_regression()
+
+        if pipeline and threshold:
+            encoder = registry.get("encoder")
+        else:
+            encoder = None
+
+        return pipeline, encoder, threshold
+
+
+    if "probability" not in st.session_state:
+        st.session_state["probability"] = None
+    if "prediction" not in st.session_state:
+        st.session_state["prediction"] = None
+    if "drivers" not in st.session_state:
+        st.session_state["drivers"] = None
+
+
+    def make_prediction(pipeline, encoder, threshold):
+        data = [[st.session_state["gender"], st.session_state["SeniorCitizen"], st.session_state["Partner"], st.session_state["Dependents"],
+                st.session_state["tenure"], st.session_state["PhoneService"], st.session_state["MultipleLines"],
+                st.session_state["InternetService"], st.session_state["OnlineSecurity"], st.session_state["OnlineBackup"],
+                st.session_state["DeviceProtection"], st.session_state["TechSupport"], st.session_state["StreamingTV"],
+                st.session_state["StreamingMovies"], st.session_state["Contract"], st.session_state["PaperlessBilling"],
+                st.session_state["PaymentMethod"], st.session_state["MonthlyCharges"], st.session_state["TotalCharges"]]]
+        
+        columns = ["gender", "SeniorCitizen", "Partner", "Dependents", "tenure", "PhoneService", "MultipleLines",
+                "InternetService", "OnlineSecurity", "OnlineBackup", "DeviceProtection", "TechSupport", "StreamingTV",
+                "StreamingMovies", "Contract", "PaperlessBilling", "PaymentMethod", "MonthlyCharges", "TotalCharges"]
+
+        # Score from the precomputed encoding tables, the DataFrame is only built for the history
+        with stage_timing.timed("single.predict_proba", rows = 1):
+            probability = pipeline.predict_proba(dict(zip(columns, data[0])))
+
+        df = pd.DataFrame(data, columns = columns)
+
+        pred = (probability[:, 1] >= threshold).astype(int)
+        pred = int(pred[0])
+        with stage_timing.timed("single.inverse_transform", rows = 1):
+            prediction = encoder.inverse_transform([pred])[0]
+
+        # Copy the original DataFrame to avoid modifying it directly
+        history_df = df.copy()
+        
+        # Get the current date and time
+        now = datetime.datetime.now()
+        formatted_time = f"{now.hour:02d}:{now.minute:02d}"
+        formatted_date = f"{now.date()}"
+        
+        # Add relevant information to the DataFrame
+        history_df.insert(0, "Prediction_Date", formatted_date)
+        history_df.insert(1, "Prediction_Time", formatted_time)
+        history_df["Model_used"] = st.session_state["selected_model"]
+        history_df["Customer_Churn_status"] = prediction
+        with stage_timing.timed("single.format_probability", rows = 1):
+            history_df["Probability"] = np.where(pred == 0, np.round(probability[:, 0]*100, 2), np.round(probability[:, 1]*100, 2))
+        
+        # Hand the prediction to the background history writer, the disk write is not waited for
+        with stage_timing.timed("single.write_history", rows = 1):
+            history_writer.submit(history_df)
+        stage_timing.export()
+
+        # Inputs that moved this customer's churn odds the most, with the selected model
+        with stage_timing.timed("single.explain", rows = 1):
+            model_name = "gradient_boost" if st.session_state["selected_model"] == "Gradient Boost" else "logistic_regression"
+            drivers = registry.get_explainer(model_name).customer_drivers(df)
+
+        st.session_state["probability"] = probability
+        st.session_state["prediction"] = prediction
+        st.session_state["drivers"] = drivers
+
+        return probability, prediction
+
+
+    def entry_form(pipeline, encoder, threshold):
+        st.markdown("#### Enter Customer's Information")
+        with st.form(key = "Customer_info"):
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                gender = st.selectbox("Gender", options = ["Male", "Female"], key = "gender")
+                SeniorCitizen = st.selectbox("Senior Citizen", options = ["Yes", "No"], key = "SeniorCitizen")
+                Dependents = st.selectbox("Has dependents", options = ["Yes", "No"], key = "Dependents")
+                Partner = st.selectbox("Has a partner", options = ["Yes", "No"], key = "Partner")
+                PhoneService = st.selectbox("Has phone service", options = ["Yes", "No"], key = "PhoneService")
+                            
+            with col2:
+                DeviceProtection = st.selectbox("Has device protection",options = ["Yes", "No", "No internet service"], key = "DeviceProtection")
+                OnlineBackup = st.selectbox("Has online backup", options = ["Yes", "No", "No internet service"], key = "OnlineBackup")
+                OnlineSecurity = st.selectbox("Has online security", options = ["Yes", "No", "No internet service"], key = "OnlineSecurity")
+                TechSupport = st.selectbox("Has tech support", options = ["Yes", "No", "No internet service"], key = "TechSupport")
+                InternetService = st.selectbox("Internet service", options = ["DSL", "Fiber optic", "No"], key = "InternetService")
+                
+            with col3:
+                MultipleLines = st.selectbox("Multiple lines", options = ["Yes", "No", "No phone service"], key = "MultipleLines")
+                PaperlessBilling = st.selectbox("Paperless billing", options = ["Yes", "No"], key = "PaperlessBilling")
+                StreamingTV = st.selectbox("Streaming TV", options = ["Yes", "No", "No internet service"], key = "StreamingTV")
+                PaymentMethod = st.selectbox("Payment method", options = ["Electronic check", "Mailed check", "Bank transfer", "Credit card"], key = "PaymentMethod")
+                StreamingMovies = st.selectbox("Streaming movies", options = ["Yes", "No", "No internet service"], key = "StreamingMovies")      
+                        
+            with col4:
+                Contract = st.selectbox("Contract type", options = ["Month-to-month", "One year", "Two year"], key = "Contract")
+                tenure = st.number_input("Number of Months (tenure)", min_value = 1, key = "tenure")
+                MonthlyCharges = st.number_input("Monthly charges ($)", min_value = 0.0, step = 0.01, key = "MonthlyCharges")
+                TotalCharges = st.number_input("Total charges ($)", min_value = 0.0, step = 0.01, key = "TotalCharges")
+
+            sumbit_button = st.form_submit_button("Make Prediction")
+
+            if sumbit_button:
+                if None in [gender, SeniorCitizen, Dependents, Partner, tenure, PhoneService, PaymentMethod,
+                            DeviceProtection, OnlineBackup, OnlineSecurity, TechSupport, MonthlyCharges, InternetService,
+                            MultipleLines, PaperlessBilling, StreamingTV, StreamingMovies, Contract, TotalCharges]:
+                    st.warning("Please fill in all required fields.")
+                else:
+                    make_prediction(pipeline, encoder, threshold)
+
+
+    if __name__ == "__main__":
+        
+        pipeline, encoder, threshold = select_model()
+
+        if pipeline and encoder and threshold:
+            show_model_registry()
+            entry_form(pipeline, encoder, threshold)
+
+            probability = st.session_state["probability"]
+            prediction = st.session_state["prediction"]
+
+            if prediction == "Yes":
+                st.warning(f"#### ❌ Customer is likely to churn.\nProbability: {probability[0][1]*100:.2f}%")
+            elif prediction == "No":
+                st.success(f"#### ✅ Customer is unlikely to churn.\nProbability: {probability[0][0]*100:.2f}%")
+            else:
+                st.markdown("#### No prediction made yet") 
+
+            drivers = st.session_state["drivers"]
+            if prediction is not None and drivers is not None:
+                st.markdown("##### Top churn drivers")
+                st.dataframe(drivers, hide_index = True)
+                st.caption("Effect on the log-odds of churn: positive values push towards churn, negative ones away from it")
+
+     
+elif st.session_state["authentication_status"]:
+    authenticator.logout(location = "sidebar")
+    st.markdown("<h1 style='color: lightblue;'> 📁 Bulk Prediction Hub</h1>", unsafe_allow_html=True)
+    st.info(f"### You are in *{st.session_state['name']}* 😊")
+
+    # Load gradient boost and threshold, once per process through the model registry
+    def load_gradient_boost():
+        # The compiled vectorized engine is a drop-in for the pipeline's predict_proba
+        if st.session_state.get("vectorized_engine"):
+            return registry.get_engine("gradient_boost")
+        return registry.get("gradient_boost")
+    
+    encoder = registry.get("encoder")
+
+    # Rows read and scored at a time in streaming mode
+    default_chunk_size = 50_000
+
+    def score_bulk(model, threshold, df):
+        # Whole scoring step, the only one timed here when the shards are scored by worker processes
+        with stage_timing.timed("bulk.score", rows = len(df)):
+            # Shard the rows across a process pool when parallel scoring is switched on
+            if st.session_state.get("parallel_mode"):
+                engine = "vectorized" if st.session_state.get("vectorized_engine") else "sklearn"
+                return parallel.parallel_bulk_prediction(df, workers = st.session_state["workers"], shard_size = st.session_state["shard_size"], engine = engine)
+            return scoring.bulk_prediction(model, threshold, df, encoder)
+
+    def bulk_scorer(model, threshold, history_file):
+        """
+        returns the scoring function of a run: scores only new or changed customers unless switched off
+        """
+        if not st.session_state.get("incremental_scoring", True):
+            return None
+        # Stored probabilities are only reused for the same model file scored by the same engine
+        engine = "vectorized" if st.session_state.get("vectorized_engine") else "sklearn"
+        return incremental.IncrementalScorer(lambda df: score_bulk(model, threshold, df), threshold, encoder, history_file,
+                                             f"{registry.version('gradient_boost')}:{engine}")
+
+    def explain_bulk(df):
+        """
+        returns the top drivers of the gradient boost model's predictions, or None when explanations are switched off
+        """
+        if not st.session_state.get("explain_predictions", True):
+            return None
+        with stage_timing.timed("bulk.explain", rows = len(df)):
+            return registry.get_explainer("gradient_boost").top_drivers(df)
+
+    def show_reuse(scorer):
+        if scorer is not None:
+            st.caption(f"Reused the scores of {scorer.reused:,} unchanged customers, scored {scorer.scored:,} new or changed rows")
+
+    def preview_prediction(is_uploaded_data):
+        # Button to preview prediction history
+        if st.button("Preview Prediction"):
+            history_file = scoring.history_file_for(is_uploaded_data)
+            if os.path.exists(history_file):
+                # Only the first rows are shown, so avoid parsing the whole file
+                history_df = pd.read_csv(history_file, nrows = 5)
+                st.dataframe(history_df)
+            else:
+                st.warning("### No prediction history found")
+
+    def load_threshold_sweep(source, run_id):
+        """
+        returns the threshold sweep of a run, built from its stored probabilities once per session and run
+        """
+        cached = st.session_state.get("threshold_sweep")
+        if cached is None or cached[0] != run_id:
+            with stage_timing.timed("bulk.threshold_sweep") as timer:
+                run = bulk_archive.read([source], run_ids = [run_id], columns = ["Churn_probability", "MonthlyCharges", "Actual_Churn"])
+                sweep = thresholds.ThresholdSweep(run["Churn_probability"], run["MonthlyCharges"], run["Actual_Churn"])
+                timer.rows = len(run)
+            cached = st.session_state["threshold_sweep"] = (run_id, sweep)
+        return cached[1]
+
+    def threshold_explorer(is_uploaded_data):
+        # Labels and metrics of the latest run at any threshold, from its stored probabilities without the model
+        with st.expander("Threshold explorer"):
+            source = bulk_archive.source_for(is_uploaded_data)
+            run_id = bulk_archive.latest_run(source)
+            if run_id is None:
+                st.info("Make a bulk prediction to explore thresholds")
+                return
+            sweep = load_threshold_sweep(source, run_id)
+            _, model_threshold = load_gradient_boost()
+            threshold = st.slider("Threshold", min_value = 0.0, max_value = 1.0, value = float(model_threshold), step = 0.005,
+                                  format = "%.3f", key = f"explore_threshold_{source}")
+            st.caption(f"Run {run_id}, {sweep.rows:,} customers. The model's threshold is {model_threshold:.3f}.")
+
+            point = sweep.at([threshold]).iloc[0]
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Predicted churners", f"{int(point['predicted_churners']):,}", f"{point['flagged_share']:.1%} of customers", delta_color = "off")
+            col2.metric("Monthly revenue flagged", f"${point['flagged_revenue']:,.0f}")
+            col3.metric("Expected retained revenue", f"${point['expected_retained_revenue']:,.0f}",
+                        help = "Churn probability times MonthlyCharges, summed over the flagged customers")
+            if sweep.has_actual:
+                col4.metric("Precision / Recall", f"{point['precision']:.1%} / {point['recall']:.1%}")
+                st.dataframe(pd.DataFrame({"Predicted Yes": [point["true_positives"], point["false_positives"]],
+                                           "Predicted No": [point["false_negatives"], point["true_negatives"]]},
+                                          index = ["Actual Yes", "Actual No"]).astype(int))
+            else:
+                col4.metric("Precision / Recall", "n/a", help = "The scored data had no Churn column with known outcomes")
+
+            # The whole sweep is a lookup into the sorted cumulative sums
+            curve = sweep.at(np.linspace(0, 1, 201))
+            measures = ["flagged_share", "precision", "recall"] if sweep.has_actual else ["flagged_share"]
+            fig = px.line(curve, x = "threshold", y = measures, title = "Threshold sweep")
+            fig.add_vline(x = threshold, line_dash = "dash")
+            st.plotly_chart(fig, use_container_width = True)
+
+    def compare_models(chunks, is_uploaded_data):
+        """
+        scores the data with both models at once, writes the merged predictions and reports where the models disagree
+        """
+        comparison_file = model_compare.comparison_file_for(is_uploaded_data)
+        engine = "vectorized" if st.session_state.get("vectorized_engine") else "sklearn"
+        summary = model_compare.AgreementSummary()
+        model_seconds = dict.fromkeys(model_compare.MODELS, 0.0)
+        wall_seconds = 0.0
+        largest_gaps = None
+        for chunk_number, chunk in enumerate(chunks):
+            # Both models score the same parsed rows side by side on the worker pool
+            results, seconds = model_compare.score(chunk, workers = st.session_state["workers"], shard_size = st.session_state["shard_size"], engine = engine)
+            comparison = model_compare.build_comparison(chunk, results, scoring.prediction_date())
+            model_compare.write_comparison(comparison, comparison_file, append = chunk_number > 0)
+            summary.add(comparison)
+            wall_seconds += seconds
+            for name, (_, _, worker_seconds) in results.items():
+                model_seconds[name] += worker_seconds
+            disagreements = comparison[comparison["Models_disagree"]].nlargest(20, "Probability_gap")
+            largest_gaps = disagreements if largest_gaps is None else pd.concat([largest_gaps, disagreements]).nlargest(20, "Probability_gap")
+        stage_timing.export()
+
+        st.success(f"#### Compared the predictions of both models for {summary.rows:,} customers.")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Agreement", f"{summary.agreement_rate:.1%}")
+        col2.metric("Cohen's kappa", f"{summary.kappa:.3f}", help = "Agreement corrected for the agreement expected by chance")
+        col3.metric("Disagreements", f"{summary.disagreements:,}")
+        col4.metric("Mean probability gap", f"{summary.gap_sum / max(summary.rows, 1):.1%}")
+        st.dataframe(summary.crosstab())
+        st.caption(", ".join(f"{label} {model_seconds[name]:.2f}s" for name, (_, label) in model_compare.MODELS.items())
+                   + f" of worker time, {wall_seconds:.2f}s wall time")
+        if largest_gaps is not None and not largest_gaps.empty:
+            st.markdown("##### Largest disagreements")
+            st.dataframe(largest_gaps, hide_index = True)
+        with open(comparison_file, "rb") as file:
+            st.download_button("Download comparison", file, file_name = os.path.basename(comparison_file), mime = "text/csv")
+
+    def make_prediction(df, is_uploaded_data):
+        
+        # Button to preview data
+        if df is not None:
+            # Load data
+            if st.button("Preview Data"):
+                st.dataframe(compact_frame.expand(df.head()))
+
+            # Button to make prediction
+            if st.button("Make Prediction"):
+                # Data is held compact, the pipelines take the object and float64 columns it was read with
+                df = compact_frame.expand(df)
+                # Check if uploaded data has same feature as expected
+                if scoring.has_expected_features(df):
+                    model, threshold = load_gradient_boost()
+                    show_model_registry()
+
+                    if model is not None:
+                        scorer = bulk_scorer(model, threshold, scoring.history_file_for(is_uploaded_data))
+                        bulk_predict, probability_score = scorer(df) if scorer is not None else score_bulk(model, threshold, df)
+                        bulk_history_df = scoring.build_bulk_history(df, bulk_predict, probability_score, scoring.prediction_date(), explain_bulk(df))
+
+                        # Save the DataFrame to the history file of the dataset source, overrriding already existed file
+                        bulk_archive.import_legacy_history()
+                        scoring.write_history(bulk_history_df, scoring.history_file_for(is_uploaded_data))
+                        # Every run is also kept in the archive under its own run id
+                        source = bulk_archive.source_for(is_uploaded_data)
+                        bulk_archive.append(bulk_history_df, source, bulk_archive.new_run_id())
+                        bulk_archive.compact_if_needed(source)
+                        with stage_timing.timed("bulk.history_aggregates", rows = len(bulk_history_df)):
+                            history_store.record_bulk_history(bulk_history_df, scoring.history_file_for(is_uploaded_data))
+                        if scorer is not None:
+                            scorer.save()
+                        stage_timing.export()
+
+                        st.success("#### Predictions made successfully.")
+                        show_reuse(scorer)
+                    else:
+                        st.error("### Failed to load Gradient Boost model.")
+                else:
+                    st.error("### Uploaded data does not match expected features.")
+
+            # Button to score the data with both models and compare them
+            if st.button("Compare Models"):
+                df = compact_frame.expand(df)
+                if scoring.has_expected_features(df):
+                    compare_models([df], is_uploaded_data)
+                else:
+                    st.error("### Uploaded data does not match expected features.")
+
+            preview_prediction(is_uploaded_data)
+            threshold_explorer(is_uploaded_data)
+
+    def make_streaming_prediction(uploaded_file, chunksize):
+        """
+        scores an uploaded file chunk by chunk, so memory depends on chunk size and not file size
+        """
+        if st.button("Preview Data"):
+            st.dataframe(next(scoring.read_in_chunks(uploaded_file, uploaded_file.name, 5)))
+
+        if st.button("Make Prediction"):
+            model, threshold = load_gradient_boost()
+
+            if model is not None:
+                total_rows = scoring.count_rows(uploaded_file, uploaded_file.name)
+                progress_bar = st.progress(0.0, text = "Starting streaming prediction")
+                chunks = stage_timing.timed_chunks("bulk.parse", scoring.read_in_chunks(uploaded_file, uploaded_file.name, chunksize))
+                history_file = scoring.history_file_for(is_uploaded_data = True)
+
+                rows_scored = 0
+                run_id = bulk_archive.new_run_id()
+                bulk_archive.import_legacy_history()
+                scorer = bulk_scorer(model, threshold, history_file)
+                try:
+                    # Every chunk carries the same run date
+                    scored_chunks = scoring.score_chunks(chunks, scorer or (lambda chunk: score_bulk(model, threshold, chunk)), scoring.prediction_date(), explain_bulk)
+                    for chunk_number, bulk_history_df in enumerate(scored_chunks):
+                        # First chunk overrides the history file, the rest are appended as they finish
+                        scoring.write_history(bulk_history_df, history_file, append = chunk_number > 0)
+                        bulk_archive.append(bulk_history_df, bulk_archive.source_for(is_uploaded_data = True), run_id, part = chunk_number)
+                        with stage_timing.timed("bulk.history_aggregates", rows = len(bulk_history_df)):
+                            history_store.record_bulk_history(bulk_history_df, history_file, append = chunk_number > 0)
+
+                        rows_scored += len(bulk_history_df)
+                        progress_bar.progress(min(rows_scored / max(total_rows, 1), 1.0), text = f"Scored {rows_scored:,} of {total_rows:,} rows")
+                    # Chunks of a streaming run are one file each, merge them once there are many
+                    bulk_archive.compact_if_needed(bulk_archive.source_for(is_uploaded_data = True))
+                    # Only a complete run replaces the stored scores
+                    if scorer is not None:
+                        scorer.save()
+                    st.success("#### Predictions made successfully.")
+                    show_reuse(scorer)
+                except ValueError as e:
+                    # A failed run leaves the stored scores as they were
+                    if scorer is not None:
+                        scorer.discard()
+                    st.error(f"### {e}")
+                stage_timing.export()
+            else:
+                st.error("### Failed to load Gradient Boost model.")
+
+        if st.button("Compare Models"):
+            chunks = stage_timing.timed_chunks("bulk.parse", scoring.read_in_chunks(uploaded_file, uploaded_file.name, chunksize))
+            try:
+                compare_models(scoring.prepare_chunks(chunks), is_uploaded_data = True)
+            except ValueError as e:
+                st.error(f"### {e}")
+
+        preview_prediction(is_uploaded_data = True)
+        threshold_explorer(is_uploaded_data = True)
+
+
+    def main():
+        # Option to use inbuilt or uploaded data
+        data_source = st.radio("Choose a data source", ["Inbuilt Data", "Use previously uploaded data", "Upload new data"])
+
+        # Scoring settings, parallel workers load the model once and are reused between runs
+        with st.sidebar.expander("Scoring engine"):
+            st.toggle("Score on multiple CPU cores", key = "parallel_mode")
+            st.number_input("Worker processes", min_value = 1, value = parallel.DEFAULT_WORKERS, key = "workers")
+            st.number_input("Rows per shard", min_value = 1_000, value = parallel.DEFAULT_SHARD_SIZE, step = 10_000, key = "shard_size")
+            st.toggle("Vectorized tree engine", key = "vectorized_engine",
+                      help = "Scores all trees of the gradient boost model for a block of rows at once, same probabilities")
+            st.toggle("Reuse scores of unchanged customers", value = True, key = "incremental_scoring",
+                      help = "Only customers that are new or whose features changed since the last run are scored again, same output")
+            st.toggle("Explain predictions", value = True, key = "explain_predictions",
+                      help = f"Stores the {explain.TOP_K} inputs that moved each customer's churn odds the most with the bulk history")
+
+        if data_source == "Inbuilt Data":
+
+            df = func.load_data()
+
+            # Load lottie
+            lottie_animation = func.load_lottie("assets/Animation_predict.json")
+            with st.sidebar:
+                st_lottie(lottie_animation, height = 350, key = func.lottie_key("assets/Animation_predict.json"))
+
+            make_prediction(df, is_uploaded_data = False)
+
+        elif data_source == "Use previously uploaded data":
+            if "uploaded_data" in st.session_state:
+                df = st.session_state["uploaded_data"]
+                st.sidebar.success("### Using previously uploaded data from data page")
+
+                if make_prediction(df, is_uploaded_data = True):
+                    # Delete uploaded data from session state after successful prediction
+                    st.session_state["uploaded_data"] = None
+
+            lottie_animation = func.load_lottie("assets/Animation_predict.json")
+            with st.sidebar:
+                st_lottie(lottie_animation, height = 350, key = func.lottie_key("assets/Animation_predict.json"))
+
+        elif data_source == "Upload new data":
+                
+                # Upload data
+                uploaded_file = st.sidebar.file_uploader("Upload Dataset", type = ["csv", "xlsx"])
+
+                # Streaming mode keeps memory bounded for files larger than memory
+                stream_mode = st.sidebar.toggle("Stream large file in chunks", key = "stream_mode")
+                if stream_mode:
+                    chunksize = st.sidebar.number_input("Rows per chunk", min_value = 1_000, value = default_chunk_size, step = 10_000, key = "chunk_size")
+
+                if uploaded_file is not None:
+                    if stream_mode:
+                        make_streaming_prediction(uploaded_file, chunksize)
+                    else:
+                        # Parsed once per file content, shared with the Data page
+                        try:
+                            df, _ = ingest.read_upload(uploaded_file)
+                        except ValueError as e:
+                            st.error(f"### {e}")
+                            df = None
+
+                        make_prediction(df, is_uploaded_data = True)
+                    
+                else:
+                    st.sidebar.warning("### Please upload a dataset and continue.")
+        
+
+                right, middle, left = st.columns([2, 2, 1])
+                with left:
+                    # Load lottie
+                    lottie_animation = func.load_lottie("assets/Animation_predict.json")
+                    # with st.sidebar:
+                    st_lottie(lottie_animation, height = 350, key = func.lottie_key("assets/Animation_predict.json"))
+
+    main()
+
+    
+   
+
+
+
+
+
+
+
+
+
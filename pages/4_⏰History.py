@@ -1,93 +1,163 @@
-import streamlit as st
-from streamlit_lottie import st_lottie
-import pandas as pd
-import json
-import os
-import sys
-
-# Calculate the path you want to add
-root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-# Add it to sys.path only if it's not already there
-if root_path not in sys.path:
-    sys.path.append(root_path)
-
-# Import custom modules
-from utils import func
-
-
-# Set up Home page
-st.set_page_config(page_title = "Customer Churn Prediction App", page_icon = "🔭", layout = "wide")
-
-st.markdown("<h1 style='color: lightblue;'> ⏰ Customer Churn Prediction History</h1>", unsafe_allow_html=True)
-
-
-# History of Single predictions
-def data_history():
-    if os.path.exists("./data/history.csv"):
-        history_df = pd.read_csv("./data/history.csv")
-    else:
-        history_df = pd.DataFrame()
-    return history_df
-
-
-# Prediction history on inbuilt data
-def load_data():
-    if os.path.exists("./data/inbuilt_data_history.csv"):
-        data = pd.read_csv("./data/inbuilt_data_history.csv")
-    else:
-        data = pd.DataFrame()
-    return data
-
-
-# Predictions history on uploaded data
-def load_uploaded_data_history():
-    if os.path.exists("./data/uploaded_data_history.csv"):
-        uploaded_data_history_df = pd.read_csv("./data/uploaded_data_history.csv")
-    else:
-        uploaded_data_history_df = pd.DataFrame()
-    return uploaded_data_history_df
-    
-
-# Function to view prediction history based on user's choice
-def view_prediction_history():
-    user_choice = st.sidebar.radio("### Display Prediction History",
-                                   options = ["Single Prediction", "Bulk Prediction (For test data)", "Bulk Prediction (For uploaded data)"],
-                                   key = "user_choice")
-    df = None
-    
-    # Display the chosen data history
-    if user_choice == "Single Prediction":
-        st.info("### 🔓 Churn Status Unlocked")
-        st.subheader("Single Prediction History")
-        if st.button("View History"):
-            df = st.dataframe(data_history().iloc[::-1])
-    
-    elif user_choice == "Bulk Prediction (For test data)":
-        st.info("### 🔓 Churn Status Unlocked")
-        st.subheader("Bulk Prediction History (For Test Data)")
-        if st.button("View History"):
-            df = st.dataframe(load_data())
-    
-    elif user_choice == "Bulk Prediction (For uploaded data)":
-        st.info("### 🔓 Churn Status Unlocked")
-        st.subheader("Bulk Prediction History (For Uploaded Data)")
-        if st.button("View History"):
-            # Load the historical data
-            df = load_uploaded_data_history()
-
-            if df is not None:
-                # Display data in streamlit
-                st.dataframe(df)
-                # Save df to session state
-                st.session_state["dashboard_data"] = df
-
-    return df
-
-# Execute function
-view_prediction_history()
-
-
-# Load lottie
-lottie_animation = func.load_lottie("assets/Animation_history.json")
-with st.sidebar:
-    st_lottie(lottie_animation, height = 350)
\ No newline at end of file
+import streamlit as st
+from streamlit_lottie import st_lottie
+import json
+import os
+import sys
+
+# Calculate the path you want to add
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Add it to sys.path only if it's not already there
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+# Import custom modules
+from utils import bulk_archive, compact_frame, func, history_aggregates, history_store, history_writer, stage_timing
+
+
+# Set up Home page
+st.set_page_config(page_title = "Customer Churn Prediction App", page_icon = "🔭", layout = "wide")
+
+st.markdown("<h1 style='color: lightblue;'> ⏰ Customer Churn Prediction History</h1>", unsafe_allow_html=True)
+
+
+# History of Single predictions, one page at a time from the indexed history store
+def data_history(page_size, before_id = None, after_id = None, **filters):
+    # Predictions still queued by this process are written first so they show up
+    if not history_writer.flush():
+        st.warning(f"Some predictions are not in the history yet: {history_writer.stats()['last_error'] or 'the history writer is behind'}")
+    with stage_timing.timed("history.single_page") as timer:
+        df = history_store.read_page(page_size, before_id = before_id, after_id = after_id, **filters)
+        timer.rows = len(df)
+    return df
+
+
+# Go back to the newest page whenever the filters change
+def reset_history_page():
+    st.session_state["history_cursor"] = (None, None)
+
+
+def set_history_page(before_id, after_id):
+    st.session_state["history_cursor"] = (before_id, after_id)
+
+
+# Filters on date, model and churn status for the single prediction history
+def history_filters():
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        dates = st.date_input("Prediction date", value = [], key = "history_dates", on_change = reset_history_page)
+    with col2:
+        model = st.selectbox("Model", options = ["All", "Gradient Boost", "Logistic Regression"], key = "history_model", on_change = reset_history_page)
+    with col3:
+        churn = st.selectbox("Churn status", options = ["All", "Yes", "No"], key = "history_churn", on_change = reset_history_page)
+    with col4:
+        page_size = st.selectbox("Rows per page", options = [25, 50, 100, 500], index = 1, key = "history_page_size", on_change = reset_history_page)
+
+    filters = {
+        "date_from": dates[0] if len(dates) > 0 else None,
+        # A single picked date filters on that day only
+        "date_to": dates[-1] if len(dates) > 0 else None,
+        "model": None if model == "All" else model,
+        "churn": None if churn == "All" else churn,
+    }
+    return page_size, filters
+
+
+# Archived bulk runs of a source, read only from the partitions and row groups the filters select
+def load_bulk_history(source, run_ids = None, **filters):
+    with stage_timing.timed(f"history.{source}_bulk") as timer:
+        data = bulk_archive.read([source], run_ids = run_ids, compact = True, **filters)
+        timer.rows = len(data)
+    return data
+
+
+# Filters on date, run and churn status for the bulk prediction history, the latest run by default
+def bulk_history_filters(source):
+    # Runs kept in the history csv files before the archive existed become its first runs
+    bulk_archive.import_legacy_history()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        dates = st.date_input("Prediction date", value = [], key = f"bulk_dates_{source}")
+    date_from = dates[0] if len(dates) > 0 else None
+    date_to = dates[-1] if len(dates) > 0 else None
+
+    runs = bulk_archive.runs([source], date_from, date_to)
+    labels = {row.run_id: f"{row.run_id} ({row.Prediction_Date}, {row.rows:,} rows)" for row in runs.itertuples()}
+    with col2:
+        run_id = st.selectbox("Run", options = ["All runs"] + list(labels), index = 1 if labels else 0,
+                              format_func = lambda run_id: labels.get(run_id, run_id), key = f"bulk_run_{source}")
+    with col3:
+        churn = st.selectbox("Churn", options = ["All", "Yes", "No"], key = f"bulk_churn_{source}")
+
+    filters = {
+        "run_ids": None if run_id == "All runs" else [run_id],
+        "date_from": date_from,
+        "date_to": date_to,
+        "churn": None if churn == "All" else churn,
+    }
+    return filters
+    
+
+# Function to view prediction history based on user's choice
+def view_prediction_history():
+    user_choice = st.sidebar.radio("### Display Prediction History",
+                                   options = ["Single Prediction", "Bulk Prediction (For test data)", "Bulk Prediction (For uploaded data)"],
+                                   key = "user_choice")
+    df = None
+    
+    # Display the chosen data history
+    if user_choice == "Single Prediction":
+        st.info("### 🔓 Churn Status Unlocked")
+        st.subheader("Single Prediction History")
+        page_size, filters = history_filters()
+
+        if st.button("View History"):
+            st.session_state["view_single_history"] = True
+            reset_history_page()
+
+        if st.session_state.get("view_single_history"):
+            before_id, after_id = st.session_state.get("history_cursor", (None, None))
+            # Newest predictions come first
+            df = data_history(page_size, before_id, after_id, **filters)
+            st.dataframe(df, hide_index = True)
+
+            if not df.empty:
+                newer, older = df.index[0], df.index[-1]
+                left, right = st.columns(2)
+                with left:
+                    st.button("⬅️ Newer", on_click = set_history_page, args = (None, newer),
+                              disabled = not history_store.has_rows(after_id = newer, **filters))
+                with right:
+                    st.button("Older ➡️", on_click = set_history_page, args = (older, None),
+                              disabled = not history_store.has_rows(before_id = older, **filters))
+    
+    elif user_choice == "Bulk Prediction (For test data)":
+        st.info("### 🔓 Churn Status Unlocked")
+        st.subheader("Bulk Prediction History (For Test Data)")
+        filters = bulk_history_filters(history_aggregates.INBUILT)
+        if st.button("View History"):
+            df = st.dataframe(compact_frame.expand(load_bulk_history(history_aggregates.INBUILT, **filters)))
+    
+    elif user_choice == "Bulk Prediction (For uploaded data)":
+        st.info("### 🔓 Churn Status Unlocked")
+        st.subheader("Bulk Prediction History (For Uploaded Data)")
+        filters = bulk_history_filters(history_aggregates.UPLOADED)
+        if st.button("View History"):
+            # Load the historical data
+            df = load_bulk_history(history_aggregates.UPLOADED, **filters)
+
+            if df is not None:
+                # Display data in streamlit
+                st.dataframe(compact_frame.expand(df))
+                # Save the compact df to session state
+                st.session_state["dashboard_data"] = df
+
+    return df
+
+# Execute function
+view_prediction_history()
+
+
+# Load lottie
+lottie_animation = func.load_lottie("assets/Animation_history.json")
+with st.sidebar:
+    st_lottie(lottie_animation, height = 350, key = func.lottie_key("assets/Animation_history.json"))
\ No newline at end of file
@@ -1,214 +1,309 @@
-import streamlit as st
-import os
-import time
-import numpy as np
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-
-
-# Set up Home page
-st.set_page_config(page_title = "Customer Churn Prediction App",
-                   page_icon = "🔭",
-                   layout="wide"
-                   )
-
-
-# Radio buttons to select between prediction history data or inbuilt data
-data_source_choice = st.sidebar.radio("Choose Data Source", options = ["Inbuilt Data", "Prediction History"])
-
-user_choice = st.sidebar.radio("Display a Dashboard", options = ["EDA Dashboard", "Analytical Dashboard"], key = "selected_dashboard")
-
-# @st.cache_data(persist = True)
-def load_inbuilt_data():
-    if os.path.exists("./data/data_output.csv"):
-        return pd.read_csv("./data/data_output.csv")
-    else:
-        st.error("Data file not found.")
-        return None
-
-
-# Load data based on user's choice
-if data_source_choice == "Inbuilt Data":
-    df = load_inbuilt_data()
-
-elif data_source_choice == "Prediction History":
-    if "dashboard_data" in st.session_state:
-        df = st.session_state["dashboard_data"]
-
-    else:
-        st.error("No prediction history found.")
-        df = None
-
-# Now use the `df` for dashboard based on user’s selected dashboard
-if df is not None and not df.empty:
-    if st.session_state["selected_dashboard"] == "EDA Dashboard":
-        left, middle, right = st.columns([1, 5, 1])
-        with middle:
-            st.markdown("<h1 style='color: lightblue;'> 🔍 Exploratory Data Analysis</h1>", unsafe_allow_html=True)
-
-        st.write(df.head())
-
-
-        # Left, Middle, Right Columns
-        left_column, middle_column, right_column = st.columns(3)
-
-        # Boxplot for MonthlyCharges
-        with left_column:
-            fig = px.box(df, y="MonthlyCharges", title="Boxplot of Monthly Charges", color_discrete_sequence=["#C70039"])
-            st.plotly_chart(fig)
-
-        # Boxplot for TotalCharges
-        with middle_column:
-            fig = px.box(df, y="TotalCharges", title="Boxplot of Total Charges", color_discrete_sequence=["#900C3F"])
-            st.plotly_chart(fig)
-
-        # Correlation Heatmap with Annotations and No Color Bar
-        with right_column:
-            corr_matrix = df[["TotalCharges", "MonthlyCharges", "tenure"]].dropna().corr()
-
-            # Annotate the heatmap with correlation values
-            heatmap = go.Figure(data=go.Heatmap(
-                z=corr_matrix.values,
-                x=corr_matrix.columns,
-                y=corr_matrix.columns,
-                colorscale="RdBu",
-                text=corr_matrix.values,  # Add the correlation values as text
-                texttemplate="%{text:.2f}",  # Format the text to 2 decimal places
-                showscale=False  # Remove the color bar
-            ))
-
-            heatmap.update_layout(
-                title="Correlation Matrix",
-                xaxis_nticks=36
-            )
-            
-            st.plotly_chart(heatmap)
-
-        # Pair Plot
-        pairplot_fig = px.scatter_matrix(
-            df[["Churn", "TotalCharges", "tenure", "MonthlyCharges"]],
-            dimensions=["TotalCharges", "tenure", "MonthlyCharges"],
-            color="Churn",
-            title="Pairplot"
-        )
-        st.plotly_chart(pairplot_fig)
-
-        # Left, Middle, Right Columns for Countplots
-        left, middle, right = st.columns(3)
-
-        # Countplot for SeniorCitizen
-        with left:
-            countplot_fig = px.histogram(df, x="SeniorCitizen", color="Churn", barmode="group", title="Distribution of SeniorCitizen")
-            st.plotly_chart(countplot_fig)
-
-        # Countplot for InternetService
-        with middle:
-            countplot_fig = px.histogram(df, x="InternetService", color="Churn", barmode="group", title="Distribution of InternetService")
-            st.plotly_chart(countplot_fig)
-
-        # Countplot for Contract
-        with right:
-            countplot_fig = px.histogram(df, x="Contract", color="Churn", barmode="group", title="Distribution of Contract")
-            st.plotly_chart(countplot_fig)
-
-
-    if st.session_state["selected_dashboard"] == "Analytical Dashboard":
-        # Title of dashboard
-        left, middle, right = st.columns([1, 5, 1])
-        with middle:
-            st.markdown("<h1 style='color: lightblue;'> 💡 Churn Indicator Dashboard</h1>", unsafe_allow_html=True)
-
-        # Sidebar widgets
-        st.sidebar.header("Filter Options")
-
-        # Tenure slider
-        tenure = st.sidebar.slider("Tenure", 0, int(df["tenure"].max()), (0, int(df["tenure"].max())))
-
-        # Total Charges range slider
-        total_charges = st.sidebar.slider("Total Charges", float(df["TotalCharges"].min()), float(df["TotalCharges"].max()), (float(df["TotalCharges"].min()), float(df["TotalCharges"].max())))
-
-        # Monthly Charges range slider
-        monthly_charges = st.sidebar.slider("Monthly Charges", float(df["MonthlyCharges"].min()), float(df["MonthlyCharges"].max()), (float(df["MonthlyCharges"].min()), float(df["MonthlyCharges"].max())))
-
-        # Filter the data based on sidebar input
-        filtered_df = df[(df["tenure"] >= tenure[0]) & (df["tenure"] <= tenure[1]) &
-                        (df["TotalCharges"] >= total_charges[0]) & (df["TotalCharges"] <= total_charges[1]) &
-                        (df["MonthlyCharges"] >= monthly_charges[0]) & (df["MonthlyCharges"] <= monthly_charges[1])]
-
-
-        # Calculate deltas for metrics
-        total_monthly_charge = filtered_df["MonthlyCharges"].sum()
-        total_charge = filtered_df["TotalCharges"].sum()
-        total_customers_retained = len(filtered_df[filtered_df["Churn"] == "No"])
-        churn_rate = (len(filtered_df[filtered_df["Churn"] == "Yes"]) / len(filtered_df)) * 100
-
-        # Calculate unfiltered values
-        unfiltered_monthly_charge = df["MonthlyCharges"].sum()
-        unfiltered_total_charge = df["TotalCharges"].sum()
-        unfiltered_customers_retained = len(df[df["Churn"] == "No"])
-
-        # Calculate deltas
-        monthly_charge_delta = (total_monthly_charge - unfiltered_monthly_charge) / unfiltered_monthly_charge * 100
-        total_charge_delta = (total_charge - unfiltered_total_charge) / unfiltered_total_charge * 100
-        customers_retained_delta = (total_customers_retained - unfiltered_customers_retained) / unfiltered_customers_retained * 100
-
-    
-        left_column, middle_column, right_column = st.columns(3)
-
-        with left_column:
-            st.metric("Total Monthly Charge", f"${total_monthly_charge/1e3:,.2f}K", delta=f"{monthly_charge_delta:.2f}%")
-
-        with middle_column:
-            st.metric("Total Charge", f"${total_charge/1e6:,.2f}M", delta=f"{total_charge_delta:.2f}%")
-
-        with right_column:
-            st.metric("Total Customers Retained", total_customers_retained, delta=f"{customers_retained_delta:.2f}%")
-
-
-        # Row 1: Churn Rate by Tenure churn rate gauge
-        col1, col2 = st.columns(2)
-        with col1:
-            churn_by_tenure = filtered_df.groupby("tenure")["Churn"].value_counts(normalize=True).unstack().fillna(0)
-            fig_tenure = px.line(churn_by_tenure, y="Yes", title="Churn Rate by Tenure", width=450, height=300)
-            st.plotly_chart(fig_tenure)
-
-        with col2:
-            gauge_fig = go.Figure(go.Indicator(
-                mode = "gauge+number",
-                value = churn_rate,
-                title = {"text": "Churn Rate (%)"},
-                gauge = {
-                    "axis": {"range": [0, 100]},
-                    "bar": {"color": "blue"},
-                    "steps": [
-                        {"range": [0, 30], "color": "lightgray"},
-                        {"range": [30, 70], "color": "gray"},
-                        {"range": [70, 100], "color": "red"}],
-                    "threshold": {
-                        "line": {"color": "black", "width": 4},
-                        "thickness": 0.75,
-                        "value": churn_rate}}))
-            gauge_fig.update_layout(width=450, height=300)
-            st.plotly_chart(gauge_fig)
-
-        # Row 2: Churn Rate by Internet service and Churn Rate by Contract
-        col1, col2 = st.columns(2)
-        with col1:
-            churn_by_internet_service = filtered_df[filtered_df["Churn"] == "Yes"].groupby("InternetService").size()
-            fig_internet_service = px.pie(values=churn_by_internet_service, names=churn_by_internet_service.index, title="Churn Rate by InternetService", width=450, height=300)
-            st.plotly_chart(fig_internet_service)
-
-        with col2:
-            churn_by_contract = filtered_df[filtered_df["Churn"] == "Yes"].groupby("Contract").size()
-            fig_contract = px.bar(x=churn_by_contract.index, y=churn_by_contract.values, labels={"x":"Contract", "y":"Churn Rate (%)"}, title="Churn Rate by Contract", width=450, height=300)
-            st.plotly_chart(fig_contract)
-
-else:
-    st.error("### The selected data source is empty!!!")
-
-
-
-
-
-
+import streamlit as st
+import os
+import time
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import sys
+
+# Calculate the path you want to add
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Add it to sys.path only if it's not already there
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+# Import custom modules
+from utils import binned_plots, bulk_archive, compact_frame, dashboard_cube, history_aggregates, history_store, history_writer
+
+
+# Set up Home page
+st.set_page_config(page_title = "Customer Churn Prediction App",
+                   page_icon = "🔭",
+                   layout="wide"
+                   )
+
+
+# Radio buttons to select between prediction history data or inbuilt data
+data_source_choice = st.sidebar.radio("Choose Data Source", options = ["Inbuilt Data", "Prediction History"])
+
+user_choice = st.sidebar.radio("Display a Dashboard", options = ["EDA Dashboard", "Analytical Dashboard"], key = "selected_dashboard")
+
+# Read once per version of the file; shared rather than copied, the dashboards only read it
+@st.cache_resource
+def read_inbuilt_data(mtime_ns):
+    return pd.read_csv("./data/data_output.csv")
+
+
+def load_inbuilt_data():
+    if os.path.exists("./data/data_output.csv"):
+        return read_inbuilt_data(os.stat("./data/data_output.csv").st_mtime_ns)
+    else:
+        st.error("Data file not found.")
+        return None
+
+
+@st.cache_resource
+def build_inbuilt_cube(mtime_ns):
+    return dashboard_cube.FilterCube.from_frame(read_inbuilt_data(mtime_ns))
+
+
+def load_filter_cube():
+    """
+    returns the pre-aggregated filter cube of the selected data source
+    """
+    if data_source_choice == "Inbuilt Data":
+        if not os.path.exists("./data/data_output.csv"):
+            return None
+        return build_inbuilt_cube(os.stat("./data/data_output.csv").st_mtime_ns)
+    # Running aggregates of the prediction history, updated as predictions are written
+    if not history_writer.flush():
+        st.warning(f"Some predictions are not in the history yet: {history_writer.stats()['last_error'] or 'the history writer is behind'}")
+    return history_store.dashboard_cube(st.session_state["history_sources"])
+
+
+def load_latest_bulk_runs(sources):
+    """
+    returns the rows of the newest archived run of each bulk source as a compact frame, reading only those runs
+    """
+    bulk_sources = [source for source in sources if source in history_aggregates.BULK_HISTORY_FILES]
+    if not bulk_sources:
+        return pd.DataFrame()
+    bulk_archive.import_legacy_history()
+    runs = bulk_archive.runs(bulk_sources)
+    if runs.empty:
+        return pd.DataFrame()
+    latest = runs.groupby("source")["run_id"].max().tolist()
+    return bulk_archive.read(bulk_sources, run_ids = latest, compact = True)
+
+
+# Load data based on user's choice
+if data_source_choice == "Inbuilt Data":
+    df = load_inbuilt_data()
+
+elif data_source_choice == "Prediction History":
+    st.sidebar.multiselect("History", options = list(history_aggregates.SOURCES), default = list(history_aggregates.SOURCES),
+                           format_func = history_aggregates.SOURCES.get, key = "history_sources")
+
+    # Only the EDA Dashboard needs the rows, the Analytical Dashboard reads the aggregates
+    if "dashboard_data" in st.session_state:
+        df = st.session_state["dashboard_data"]
+
+    elif st.session_state["selected_dashboard"] == "EDA Dashboard":
+        # Without history loaded on the History page, read the latest archived run of each chosen bulk source
+        df = load_latest_bulk_runs(st.session_state["history_sources"])
+        if df.empty:
+            st.error("No prediction history found.")
+            df = None
+
+    else:
+        df = None
+
+# The Analytical Dashboard is answered from the cube alone
+if st.session_state["selected_dashboard"] == "Analytical Dashboard":
+    cube = load_filter_cube()
+    has_data = cube is not None and len(cube) > 0
+else:
+    has_data = df is not None and not df.empty
+
+# Now use the `df` for dashboard based on user’s selected dashboard
+if has_data:
+    if st.session_state["selected_dashboard"] == "EDA Dashboard":
+        # History is kept compact in the session, the charts read the columns as they were in the file
+        df = compact_frame.expand(df)
+
+        left, middle, right = st.columns([1, 5, 1])
+        with middle:
+            st.markdown("<h1 style='color: lightblue;'> 🔍 Exploratory Data Analysis</h1>", unsafe_allow_html=True)
+
+        st.write(df.head())
+
+        # Large data is summarised on the server so the charts stay the same size whatever the row count
+        large_data = len(df) > binned_plots.LARGE_DATA_ROWS
+        if large_data:
+            st.caption(f"{len(df):,} rows: box plots are drawn from quartiles, the pairplot from density grids and counts are pre-aggregated")
+
+
+        # Left, Middle, Right Columns
+        left_column, middle_column, right_column = st.columns(3)
+
+        # Boxplot for MonthlyCharges
+        with left_column:
+            if large_data:
+                fig = binned_plots.box_figure(df, "MonthlyCharges", "Boxplot of Monthly Charges", "#C70039")
+            else:
+                fig = px.box(df, y="MonthlyCharges", title="Boxplot of Monthly Charges", color_discrete_sequence=["#C70039"])
+            st.plotly_chart(fig)
+
+        # Boxplot for TotalCharges
+        with middle_column:
+            if large_data:
+                fig = binned_plots.box_figure(df, "TotalCharges", "Boxplot of Total Charges", "#900C3F")
+            else:
+                fig = px.box(df, y="TotalCharges", title="Boxplot of Total Charges", color_discrete_sequence=["#900C3F"])
+            st.plotly_chart(fig)
+
+        # Correlation Heatmap with Annotations and No Color Bar
+        with right_column:
+            corr_matrix = df[["TotalCharges", "MonthlyCharges", "tenure"]].dropna().corr()
+
+            # Annotate the heatmap with correlation values
+            heatmap = go.Figure(data=go.Heatmap(
+                z=corr_matrix.values,
+                x=corr_matrix.columns,
+                y=corr_matrix.columns,
+                colorscale="RdBu",
+                text=corr_matrix.values,  # Add the correlation values as text
+                texttemplate="%{text:.2f}",  # Format the text to 2 decimal places
+                showscale=False  # Remove the color bar
+            ))
+
+            heatmap.update_layout(
+                title="Correlation Matrix",
+                xaxis_nticks=36
+            )
+            
+            st.plotly_chart(heatmap)
+
+        # Pair Plot
+        if large_data:
+            pairplot_fig = binned_plots.density_pairplot(df, ["TotalCharges", "tenure", "MonthlyCharges"], "Churn", "Pairplot")
+        else:
+            pairplot_fig = px.scatter_matrix(
+                df[["Churn", "TotalCharges", "tenure", "MonthlyCharges"]],
+                dimensions=["TotalCharges", "tenure", "MonthlyCharges"],
+                color="Churn",
+                title="Pairplot"
+            )
+        st.plotly_chart(pairplot_fig)
+
+        # Left, Middle, Right Columns for Countplots
+        left, middle, right = st.columns(3)
+
+        # Countplot for SeniorCitizen
+        with left:
+            if large_data:
+                countplot_fig = binned_plots.count_figure(df, "SeniorCitizen", "Churn", "Distribution of SeniorCitizen")
+            else:
+                countplot_fig = px.histogram(df, x="SeniorCitizen", color="Churn", barmode="group", title="Distribution of SeniorCitizen")
+            st.plotly_chart(countplot_fig)
+
+        # Countplot for InternetService
+        with middle:
+            if large_data:
+                countplot_fig = binned_plots.count_figure(df, "InternetService", "Churn", "Distribution of InternetService")
+            else:
+                countplot_fig = px.histogram(df, x="InternetService", color="Churn", barmode="group", title="Distribution of InternetService")
+            st.plotly_chart(countplot_fig)
+
+        # Countplot for Contract
+        with right:
+            if large_data:
+                countplot_fig = binned_plots.count_figure(df, "Contract", "Churn", "Distribution of Contract")
+            else:
+                countplot_fig = px.histogram(df, x="Contract", color="Churn", barmode="group", title="Distribution of Contract")
+            st.plotly_chart(countplot_fig)
+
+
+    if st.session_state["selected_dashboard"] == "Analytical Dashboard":
+        # Title of dashboard
+        left, middle, right = st.columns([1, 5, 1])
+        with middle:
+            st.markdown("<h1 style='color: lightblue;'> 💡 Churn Indicator Dashboard</h1>", unsafe_allow_html=True)
+
+        # Sidebar widgets
+        st.sidebar.header("Filter Options")
+
+        # Sliders and charts are answered from the pre-aggregated cube instead of the raw rows
+
+        # Tenure slider
+        tenure_max = cube.tenure_max()
+        tenure = st.sidebar.slider("Tenure", 0, tenure_max, (0, tenure_max))
+
+        # Total Charges range slider, in steps of whole bins
+        total_min, total_max = cube.charge_range("TotalCharges")
+        total_charges = st.sidebar.slider("Total Charges", total_min, total_max, (total_min, total_max), step = dashboard_cube.BIN_WIDTHS["TotalCharges"])
+
+        # Monthly Charges range slider
+        monthly_min, monthly_max = cube.charge_range("MonthlyCharges")
+        monthly_charges = st.sidebar.slider("Monthly Charges", monthly_min, monthly_max, (monthly_min, monthly_max), step = dashboard_cube.BIN_WIDTHS["MonthlyCharges"])
+
+        # Filter the data based on sidebar input
+        filtered_cube = cube.filter(tenure, total_charges, monthly_charges)
+
+
+        # Calculate deltas for metrics
+        total_monthly_charge = filtered_cube.total("MonthlyCharges")
+        total_charge = filtered_cube.total("TotalCharges")
+        total_customers_retained = filtered_cube.churn_count("No")
+        churn_rate = (filtered_cube.churn_count("Yes") / len(filtered_cube)) * 100 if len(filtered_cube) else 0.0
+
+        # Calculate unfiltered values
+        unfiltered_monthly_charge = cube.total("MonthlyCharges")
+        unfiltered_total_charge = cube.total("TotalCharges")
+        unfiltered_customers_retained = cube.churn_count("No")
+
+        # Calculate deltas
+        monthly_charge_delta = (total_monthly_charge - unfiltered_monthly_charge) / unfiltered_monthly_charge * 100
+        total_charge_delta = (total_charge - unfiltered_total_charge) / unfiltered_total_charge * 100
+        customers_retained_delta = (total_customers_retained - unfiltered_customers_retained) / unfiltered_customers_retained * 100
+
+    
+        left_column, middle_column, right_column = st.columns(3)
+
+        with left_column:
+            st.metric("Total Monthly Charge", f"${total_monthly_charge/1e3:,.2f}K", delta=f"{monthly_charge_delta:.2f}%")
+
+        with middle_column:
+            st.metric("Total Charge", f"${total_charge/1e6:,.2f}M", delta=f"{total_charge_delta:.2f}%")
+
+        with right_column:
+            st.metric("Total Customers Retained", total_customers_retained, delta=f"{customers_retained_delta:.2f}%")
+
+
+        # Row 1: Churn Rate by Tenure churn rate gauge
+        col1, col2 = st.columns(2)
+        with col1:
+            churn_by_tenure = filtered_cube.churn_by_tenure()
+            fig_tenure = px.line(churn_by_tenure, y="Yes", title="Churn Rate by Tenure", width=450, height=300)
+            st.plotly_chart(fig_tenure)
+
+        with col2:
+            gauge_fig = go.Figure(go.Indicator(
+                mode = "gauge+number",
+                value = churn_rate,
+                title = {"text": "Churn Rate (%)"},
+                gauge = {
+                    "axis": {"range": [0, 100]},
+                    "bar": {"color": "blue"},
+                    "steps": [
+                        {"range": [0, 30], "color": "lightgray"},
+                        {"range": [30, 70], "color": "gray"},
+                        {"range": [70, 100], "color": "red"}],
+                    "threshold": {
+                        "line": {"color": "black", "width": 4},
+                        "thickness": 0.75,
+                        "value": churn_rate}}))
+            gauge_fig.update_layout(width=450, height=300)
+            st.plotly_chart(gauge_fig)
+
+        # Row 2: Churn Rate by Internet service and Churn Rate by Contract
+        col1, col2 = st.columns(2)
+        with col1:
+            churn_by_internet_service = filtered_cube.churned_by("InternetService")
+            fig_internet_service = px.pie(values=churn_by_internet_service, names=churn_by_internet_service.index, title="Churn Rate by InternetService", width=450, height=300)
+            st.plotly_chart(fig_internet_service)
+
+        with col2:
+            churn_by_contract = filtered_cube.churned_by("Contract")
+            fig_contract = px.bar(x=churn_by_contract.index, y=churn_by_contract.values, labels={"x":"Contract", "y":"Churn Rate (%)"}, title="Churn Rate by Contract", width=450, height=300)
+            st.plotly_chart(fig_contract)
+
+else:
+    st.error("### The selected data source is empty!!!")
+
+
+
+
+
+
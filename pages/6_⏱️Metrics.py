@@ -0,0 +1,86 @@
+import streamlit as st
+import plotly.express as px
+import pandas as pd
+import sys
+import os
+
+
+# Calculate the path you want to add
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Add it to sys.path only if it's not already there
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+# Import custom modules
+from utils import assets, auth, history_writer, stage_timing
+
+# Set up Home page
+st.set_page_config(page_title = "Customer Churn Prediction App", page_icon = "🔭", layout = "wide")
+
+
+# Login config is parsed and its passwords hashed once per server process, not on every rerun
+authenticator = auth.authenticator()
+authenticator.login("sidebar", "Login")
+
+
+# Latency and throughput of every timed stage since the server started
+def stage_table():
+    stages = pd.DataFrame(stage_timing.snapshot())
+    if stages.empty:
+        return stages
+    return stages.round({"mean_ms": 3, "p50_ms": 3, "p95_ms": 3, "p99_ms": 3, "total_s": 3, "rows_per_second": 0})
+
+
+# Calls per latency bucket of one stage
+def histogram_figure(stage):
+    buckets = stage_timing.histogram(stage)
+    labels = [f"≤ {bound * 1000:g} ms" if bound != float("inf") else "> 60 s" for bound, _ in buckets]
+    fig = px.bar(x = labels, y = [count for _, count in buckets], labels = {"x": "Latency", "y": "Calls"},
+                 title = f"Latency histogram of {stage}")
+    return fig
+
+
+if st.session_state["authentication_status"] is False:
+    st.sidebar.error("Incorrect Username/Password")
+    st.sidebar.info("Please enter username and password to access the metrics page")
+
+elif st.session_state["authentication_status"] is None:
+    st.sidebar.info("Please enter username and password to access the metrics page")
+
+elif st.session_state["authentication_status"]:
+    authenticator.logout(location = "sidebar")
+    st.markdown("<h1 style='color: lightblue;'> ⏱️ Stage Metrics</h1>", unsafe_allow_html=True)
+    st.caption("Time spent in each stage of the prediction and loading paths since this server process started")
+    writer = history_writer.stats()
+    st.caption(f"History writer: {writer['written']:,} rows written, {writer['queued']:,} predictions queued, {writer['dropped']:,} rows dropped"
+               + (f", last error: {writer['last_error']}" if writer["last_error"] else ""))
+
+    stages = stage_table()
+    if stages.empty:
+        st.info("### No stage has been timed yet. Make a prediction or open the history to collect metrics.")
+    else:
+        st.dataframe(stages, hide_index = True,
+                     column_config = {"rows_per_second": st.column_config.NumberColumn("rows/s", format = "%d")})
+
+        stage = st.selectbox("Stage", options = stages["stage"].tolist(), key = "metrics_stage")
+        st.plotly_chart(histogram_figure(stage), use_container_width = True)
+
+    # Prometheus text export, also written to the metrics file after predictions
+    with st.expander("Prometheus export"):
+        text = stage_timing.prometheus_text()
+        st.code(text, language = "text")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.download_button("Download metrics", data = text, file_name = "metrics.prom", mime = "text/plain")
+        with col2:
+            if st.button("Write metrics file"):
+                st.success(f"Written to {stage_timing.write_textfile()}")
+        with col3:
+            if st.button("Reset metrics"):
+                stage_timing.reset()
+                st.rerun()
+
+    # Size and per-rerun load time of the lottie animations, as shipped before and after minifying
+    with st.expander("Lottie assets"):
+        if st.button("Measure assets"):
+            st.dataframe(pd.DataFrame(assets.report()), hide_index = True)
@@ -0,0 +1,53 @@
+"""
+Shared fixtures of the equality tests, all built from the bundled Telco file
+"""
+import pandas as pd
+import pathlib
+import pytest
+import os
+
+from utils import scoring
+
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+TELCO_FILE = ROOT / "data" / "Telco-churn-last-2000.xlsx"
+
+
+@pytest.fixture(autouse = True, scope = "session")
+def repo_root():
+    # Models and data files are opened relative to the repository root, as when the app runs
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    yield ROOT
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope = "session")
+def telco():
+    """
+    the bundled customers as read by pandas, before any coercion; copy before modifying
+    """
+    return pd.read_excel(TELCO_FILE)
+
+
+@pytest.fixture(scope = "session")
+def customers(telco):
+    """
+    the bundled customers coerced as the app scores them
+    """
+    return scoring.coerce_columns(telco.copy())
+
+
+@pytest.fixture(scope = "session")
+def gradient_boost():
+    return scoring.load_gradient_boost()
+
+
+@pytest.fixture(scope = "session")
+def logistic_regression():
+    return scoring.load_logistic_regression()
+
+
+@pytest.fixture(scope = "session")
+def encoder():
+    return scoring.load_encoder()
@@ -0,0 +1,86 @@
+"""
+Stored password hashes must be reused without bcrypt work while config.yaml is unchanged
+"""
+import bcrypt
+import pytest
+import yaml
+
+from utils import auth
+
+
+@pytest.fixture
+def bcrypt_calls(monkeypatch):
+    """
+    counts bcrypt hashes and checks, at the lowest cost bcrypt allows so the tests stay fast
+    """
+    calls = {"hashpw": 0, "checkpw": 0}
+    hashpw, checkpw, gensalt = bcrypt.hashpw, bcrypt.checkpw, bcrypt.gensalt
+
+    def counted_hashpw(password, salt):
+        calls["hashpw"] += 1
+        return hashpw(password, salt)
+
+    def counted_checkpw(password, hashed):
+        calls["checkpw"] += 1
+        return checkpw(password, hashed)
+
+    monkeypatch.setattr(bcrypt, "hashpw", counted_hashpw)
+    monkeypatch.setattr(bcrypt, "checkpw", counted_checkpw)
+    monkeypatch.setattr(bcrypt, "gensalt", lambda rounds = 4, prefix = b"2b": gensalt(4, prefix))
+    return calls
+
+
+def write_config(path, passwords):
+    config = {"credentials": {"usernames": {username: {"name": username, "email": f"{username}@example.com", "password": password}
+                                            for username, password in passwords.items()}},
+              "cookie": {"expiry_days": 30, "key": "key", "name": "cookie"}, "pre-authorized": {"emails": []}}
+    path.write_text(yaml.safe_dump(config))
+
+
+def load(config_path, store_path):
+    # A new server process starts without the parsed config
+    auth._cache.pop(str(config_path), None)
+    return auth.load_config(str(config_path), str(store_path))["credentials"]["usernames"]
+
+
+def test_second_load_does_no_bcrypt_work(tmp_path, bcrypt_calls):
+    config_path, store_path = tmp_path / "config.yaml", tmp_path / "credentials.json"
+    passwords = {f"user{number}": f"password{number}" for number in range(5)}
+    write_config(config_path, passwords)
+
+    first = load(config_path, store_path)
+    assert bcrypt_calls["hashpw"] == len(passwords)
+    calls_after_first = dict(bcrypt_calls)
+    second = load(config_path, store_path)
+    assert bcrypt_calls == calls_after_first
+    assert {username: user["password"] for username, user in second.items()} == \
+           {username: user["password"] for username, user in first.items()}
+    for username, password in passwords.items():
+        assert bcrypt.checkpw(password.encode(), second[username]["password"].encode())
+
+
+def test_edited_config_rehashes_changed_passwords(tmp_path, bcrypt_calls):
+    config_path, store_path = tmp_path / "config.yaml", tmp_path / "credentials.json"
+    write_config(config_path, {"alice": "one", "bob": "two"})
+    first = load(config_path, store_path)
+
+    write_config(config_path, {"alice": "one", "bob": "changed", "carol": "three"})
+    second = load(config_path, store_path)
+    assert second["alice"]["password"] == first["alice"]["password"]
+    assert bcrypt.checkpw(b"changed", second["bob"]["password"].encode())
+    assert bcrypt.checkpw(b"three", second["carol"]["password"].encode())
+    assert set(auth.read_store(str(store_path))["users"]) == {"alice", "bob", "carol"}
+
+    # The store now carries the edited file's stamp, the next process checks nothing
+    calls = dict(bcrypt_calls)
+    load(config_path, store_path)
+    assert bcrypt_calls == calls
+
+
+def test_store_holds_only_hashes(tmp_path, bcrypt_calls):
+    config_path, store_path = tmp_path / "config.yaml", tmp_path / "credentials.json"
+    write_config(config_path, {"alice": "one"})
+    load(config_path, store_path)
+    store = auth.read_store(str(store_path))
+    assert store["users"] == {"alice": {"hash": store["users"]["alice"]["hash"]}}
+    assert "one" not in store_path.read_text()
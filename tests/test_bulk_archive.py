@@ -0,0 +1,78 @@
+"""
+Run listings from the archive footers must count what reading the rows counts, also while a compaction runs
+"""
+import pandas as pd
+import numpy as np
+import threading
+import pytest
+import os
+
+from utils import bulk_archive, scoring
+
+
+@pytest.fixture(scope = "module")
+def bulk_history(customers, gradient_boost, encoder):
+    pipeline, threshold = gradient_boost
+    bulk_predict, probability_score = scoring.bulk_prediction(pipeline, threshold, customers, encoder)
+    return scoring.build_bulk_history(customers, bulk_predict, probability_score, "2024-05-01 10:00:00")
+
+
+def archive_runs(bulk_history, archive_dir):
+    # Three streamed runs over two dates and both sources, one with predictions missing
+    for number, (source, prediction_date) in enumerate([("inbuilt", "2024-05-01 10:00:00"), ("inbuilt", "2024-05-02 10:00:00"),
+                                                         ("uploaded", "2024-05-02 11:00:00")]):
+        history = bulk_history.assign(Prediction_Date = prediction_date)
+        if number == 1:
+            history.loc[history.index[::5], "Churn"] = np.nan
+        for part in range(3):
+            bulk_archive.append(history.iloc[part::3], source, f"20240501-00000{number}-run", part, str(archive_dir))
+
+
+def runs_from_rows(archive_dir, **filters):
+    rows = bulk_archive.read(columns = ["source", "run_id", "Prediction_Date", "Churn"], archive_dir = str(archive_dir), **filters)
+    summary = rows.assign(churned = rows["Churn"] == "Yes").groupby(["source", "run_id"], as_index = False) \
+        .agg(Prediction_Date = ("Prediction_Date", "min"), rows = ("Churn", "size"), churned = ("churned", "sum"))
+    return summary.sort_values("run_id", ascending = False, ignore_index = True)
+
+
+@pytest.mark.parametrize("filters", [{}, {"sources": ["inbuilt"]}, {"date_from": "2024-05-02", "date_to": "2024-05-02 23:59:59"}])
+def test_runs_match_the_rows(bulk_history, tmp_path, filters):
+    archive_runs(bulk_history, tmp_path)
+    listed = bulk_archive.runs(archive_dir = str(tmp_path), **filters)
+    pd.testing.assert_frame_equal(listed, runs_from_rows(tmp_path, **filters), check_dtype = False)
+    bulk_archive.compact(archive_dir = str(tmp_path))
+    pd.testing.assert_frame_equal(bulk_archive.runs(archive_dir = str(tmp_path), **filters), listed)
+
+
+def test_runs_read_no_rows(bulk_history, tmp_path, monkeypatch):
+    archive_runs(bulk_history, tmp_path)
+    monkeypatch.setattr(bulk_archive.pq.ParquetFile, "read_row_group", lambda *args, **kwargs: pytest.fail("rows were read"))
+    assert bulk_archive.runs(archive_dir = str(tmp_path))["rows"].sum() == 3 * len(bulk_history)
+    assert bulk_archive.latest_run("inbuilt", str(tmp_path)) == "20240501-000001-run"
+
+
+def test_reads_during_compaction_count_every_row_once(bulk_history, tmp_path, monkeypatch):
+    archive_runs(bulk_history, tmp_path)
+    expected = 3 * len(bulk_history)
+    counts = []
+    readers = []
+    remove = os.remove
+
+    def count_rows():
+        counts.append((len(bulk_archive.read(columns = ["run_id"], archive_dir = str(tmp_path))),
+                       int(bulk_archive.runs(archive_dir = str(tmp_path))["rows"].sum())))
+
+    # A reader starts once the merged file is written and the merged files are being removed
+    def remove_while_reading(path):
+        if path.startswith(str(tmp_path)) and not readers:
+            readers.append(threading.Thread(target = count_rows))
+            readers[0].start()
+            readers[0].join(0.5)
+        remove(path)
+
+    monkeypatch.setattr(os, "remove", remove_while_reading)
+    assert bulk_archive.compact(archive_dir = str(tmp_path))
+    readers[0].join()
+    assert counts == [(expected, expected)]
+    count_rows()
+    assert counts[-1] == (expected, expected)
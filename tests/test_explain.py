@@ -0,0 +1,34 @@
+"""
+Explanations must add up to the model's log-odds, and top drivers must be the largest contributions
+"""
+import numpy as np
+import pytest
+
+from utils import explain, scoring
+
+
+@pytest.mark.parametrize("model", ["gradient_boost", "logistic_regression"])
+def test_contributions_add_up_to_log_odds(customers, model, request):
+    pipeline, _ = request.getfixturevalue(model)
+    X = customers[scoring.expected_features]
+    explainer = explain.compile_explainer(pipeline)
+    explainer.block_rows = 300
+    contributions = explainer.contributions(X)
+    assert sorted(contributions.columns) == sorted(scoring.expected_features)
+    np.testing.assert_allclose(explainer.bias + contributions.sum(axis = 1).to_numpy(), pipeline.decision_function(X),
+                               rtol = 0, atol = 1e-9)
+
+
+@pytest.mark.parametrize("model", ["gradient_boost", "logistic_regression"])
+def test_top_drivers_are_largest_contributions(customers, model, request):
+    pipeline, _ = request.getfixturevalue(model)
+    X = customers[scoring.expected_features].head(500)
+    explainer = explain.compile_explainer(pipeline)
+    contributions = explainer.contributions(X)
+    drivers = explainer.top_drivers(X)
+    assert list(drivers.columns) == explain.driver_columns()
+    for rank in range(1, explain.TOP_K + 1):
+        effects = contributions.to_numpy()[np.arange(len(X)), contributions.columns.get_indexer(drivers[f"Driver_{rank}"])]
+        np.testing.assert_allclose(drivers[f"Driver_{rank}_effect"], np.round(effects, explain.EFFECT_DECIMALS))
+    largest = np.sort(np.abs(contributions.to_numpy()), axis = 1)[:, -1]
+    np.testing.assert_allclose(np.abs(drivers["Driver_1_effect"]), np.round(largest, explain.EFFECT_DECIMALS))
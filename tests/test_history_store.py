@@ -0,0 +1,57 @@
+"""
+History pages must filter on the prediction date itself and reads must not set the store up again
+"""
+import pandas as pd
+import pytest
+
+from utils import history_store
+
+
+def history_rows(dates):
+    rows = pd.DataFrame({column: ["x"] * len(dates) for column in history_store.columns})
+    rows["Prediction_Date"] = dates
+    rows["Prediction_Time"] = "12:00:00"
+    rows["Model_used"] = "Gradient Boost"
+    rows["Customer_Churn_status"] = "No"
+    rows["Probability"] = 0.25
+    for column in ["tenure", "MonthlyCharges", "TotalCharges"]:
+        rows[column] = 1
+    return rows[history_store.columns]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    # Rows are stored out of date order, as after importing an older history.csv
+    path = str(tmp_path / "history.db")
+    history_store.append(history_rows(["2024-05-02", "2024-05-01", "2024-05-03", "2024-05-01", "2024-05-02"]), path)
+    return path
+
+
+@pytest.mark.parametrize("date_from, date_to", [("2024-05-01", "2024-05-01"), ("2024-05-02", None), (None, "2024-05-02"),
+                                                ("2024-05-02", "2024-05-03")])
+def test_pages_filter_on_prediction_date(db_path, date_from, date_to):
+    page = history_store.read_page(2, date_from = date_from, date_to = date_to, db_path = db_path)
+    pages = [page]
+    while history_store.has_rows(before_id = page.index[-1], date_from = date_from, date_to = date_to, db_path = db_path):
+        page = history_store.read_page(2, before_id = page.index[-1], date_from = date_from, date_to = date_to, db_path = db_path)
+        pages.append(page)
+    dates = pd.concat(pages)["Prediction_Date"]
+
+    expected = history_rows(["2024-05-02", "2024-05-01", "2024-05-03", "2024-05-01", "2024-05-02"])["Prediction_Date"]
+    expected = expected[(expected >= (date_from or "")) & (expected <= (date_to or "9999"))]
+    assert dates.tolist() == expected.iloc[::-1].tolist()
+
+
+def test_reads_do_not_set_the_store_up_again(db_path, monkeypatch):
+    calls = []
+    initialize = history_store.initialize
+    monkeypatch.setattr(history_store, "initialize", lambda *args: calls.append(args) or initialize(*args))
+    history_store.read_page(db_path = db_path)
+    history_store.has_rows(before_id = 10, db_path = db_path)
+    assert calls == []
+
+    # Another store is set up on its first use only
+    other_path = db_path.replace("history.db", "other.db")
+    history_store.append(history_rows(["2024-05-01"]), other_path)
+    assert len(history_store.read_page(db_path = other_path)) == 1
+    assert len(calls) == 1
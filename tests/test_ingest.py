@@ -0,0 +1,70 @@
+"""
+The pyarrow csv path of ingest must give the frame of the pandas path
+"""
+import pandas as pd
+import numpy as np
+import io
+
+from utils import compact_frame, ingest
+
+
+def pandas_parse(data):
+    df, invalid = ingest._coerce_frame(pd.read_csv(io.BytesIO(data)))
+    return compact_frame.compact(df), invalid
+
+
+def nonzero(invalid):
+    # The pyarrow path only reports columns where something was set to NaN
+    return {column: count for column, count in invalid.items() if count}
+
+
+def assert_same_frame(parsed, expected):
+    assert list(parsed.columns) == list(expected.columns)
+    for column in expected.columns:
+        # Compact categories are compared by their values
+        left = parsed[column].astype(object) if isinstance(parsed[column].dtype, pd.CategoricalDtype) else parsed[column]
+        right = expected[column].astype(object) if isinstance(expected[column].dtype, pd.CategoricalDtype) else expected[column]
+        pd.testing.assert_series_equal(left, right, check_dtype = False, obj = column)
+        assert [type(value) for value in left.dropna()] == [type(value) for value in right.dropna()], column
+
+
+def test_csv_matches_pandas(telco):
+    data = telco.to_csv(index = False).encode()
+    parsed, report = ingest.parse(data, "customers.csv")
+    expected, invalid = pandas_parse(data)
+    assert_same_frame(parsed, expected)
+    assert nonzero(report["invalid"]) == nonzero(invalid)
+
+
+def test_extra_columns_match_pandas(telco):
+    df = telco.head(500).copy()
+    rows = np.arange(len(df))
+    df.insert(1, "Prediction_Date", pd.Timestamp("2024-05-01").strftime("%Y-%m-%d"))
+    df["Signup_Time"] = "2024-05-01 10:00:00"
+    df["Account_ID"] = [f"{row:08d}" for row in rows]
+    df["Region_Code"] = np.where(rows % 7 == 0, np.nan, rows % 5)
+    df["Score"] = np.where(rows % 3 == 0, "n/a", (rows / 10).astype(str))
+    df["Flagged"] = np.where(rows % 2 == 0, "True", "False")
+    df["Note"] = np.where(rows % 4 == 0, "", "ok")
+    data = df.to_csv(index = False).encode()
+
+    parsed, report = ingest.parse(data, "customers.csv")
+    expected, invalid = pandas_parse(data)
+    assert_same_frame(parsed, expected)
+    assert nonzero(report["invalid"]) == nonzero(invalid)
+    assert isinstance(parsed["Prediction_Date"].dropna().iloc[0], str)
+
+
+def test_invalid_numbers_match_pandas(telco):
+    df = telco.head(200).copy()
+    df["TotalCharges"] = df["TotalCharges"].astype(str)
+    df.loc[df.index[::9], "TotalCharges"] = " "
+    df.loc[df.index[::11], "tenure"] = -1
+    df["SeniorCitizen"] = df["SeniorCitizen"].astype(object)
+    df.loc[df.index[::13], "SeniorCitizen"] = "yes"
+    data = df.to_csv(index = False).encode()
+
+    parsed, report = ingest.parse(data, "customers.csv")
+    expected, invalid = pandas_parse(data)
+    assert_same_frame(parsed, expected)
+    assert nonzero(report["invalid"]) == nonzero(invalid)
@@ -0,0 +1,76 @@
+"""
+Streamed bulk scoring must write the history of scoring the whole file in memory
+"""
+import pandas as pd
+import pytest
+import io
+
+from utils import explain, incremental, scoring
+
+
+FORMATTED_DATE = "2024-05-01 10:00:00"
+
+
+def in_memory_history(telco, pipeline, threshold, encoder, explainer = None):
+    df = scoring.coerce_columns(telco.copy())
+    bulk_predict, probability_score = scoring.bulk_prediction(pipeline, threshold, df, encoder)
+    drivers = explainer.top_drivers(df) if explainer is not None else None
+    return scoring.build_bulk_history(df, bulk_predict, probability_score, FORMATTED_DATE, drivers)
+
+
+def streamed_history(data, file_name, score, chunksize, explain = None):
+    chunks = scoring.read_in_chunks(io.BytesIO(data), file_name, chunksize)
+    return pd.concat(scoring.score_chunks(chunks, score, FORMATTED_DATE, explain), ignore_index = True)
+
+
+@pytest.mark.parametrize("chunksize", [300, 5_000])
+def test_streamed_csv_matches_in_memory(telco, gradient_boost, encoder, chunksize):
+    pipeline, threshold = gradient_boost
+    data = telco.to_csv(index = False).encode()
+    streamed = streamed_history(data, "customers.csv", lambda chunk: scoring.bulk_prediction(pipeline, threshold, chunk, encoder), chunksize)
+    pd.testing.assert_frame_equal(streamed, in_memory_history(telco, pipeline, threshold, encoder))
+
+
+def test_streamed_xlsx_matches_in_memory(telco, gradient_boost, encoder):
+    pipeline, threshold = gradient_boost
+    data = io.BytesIO()
+    telco.to_excel(data, index = False)
+    streamed = streamed_history(data.getvalue(), "customers.xlsx", lambda chunk: scoring.bulk_prediction(pipeline, threshold, chunk, encoder), 700)
+    pd.testing.assert_frame_equal(streamed, in_memory_history(telco, pipeline, threshold, encoder))
+
+
+def test_streamed_explanations_match_in_memory(telco, gradient_boost, encoder):
+    pipeline, threshold = gradient_boost
+    explainer = explain.compile_explainer(pipeline)
+    data = telco.to_csv(index = False).encode()
+    streamed = streamed_history(data, "customers.csv", lambda chunk: scoring.bulk_prediction(pipeline, threshold, chunk, encoder), 300,
+                                explainer.top_drivers)
+    pd.testing.assert_frame_equal(streamed, in_memory_history(telco, pipeline, threshold, encoder, explainer))
+
+
+def test_incremental_runs_match_in_memory(telco, gradient_boost, encoder, tmp_path):
+    pipeline, threshold = gradient_boost
+    history_file = str(tmp_path / "history.csv")
+    expected = in_memory_history(telco, pipeline, threshold, encoder)
+    scored = []
+
+    def score(chunk):
+        scored.extend(chunk["customerID"])
+        return scoring.bulk_prediction(pipeline, threshold, chunk, encoder)
+
+    # The first run scores every row, the second reuses the unchanged customers
+    first = incremental.IncrementalScorer(score, threshold, encoder, history_file, "v1")
+    pd.testing.assert_frame_equal(streamed_history(telco.to_csv(index = False).encode(), "customers.csv", first, 300), expected)
+    first.save()
+    assert first.reused == 0
+    assert scored == telco["customerID"].tolist()
+
+    changed = telco.copy()
+    changed.loc[changed.index[::7], "MonthlyCharges"] += 10
+    scored.clear()
+    second = incremental.IncrementalScorer(score, threshold, encoder, history_file, "v1")
+    streamed = streamed_history(changed.to_csv(index = False).encode(), "customers.csv", second, 300)
+    pd.testing.assert_frame_equal(streamed, in_memory_history(changed, pipeline, threshold, encoder))
+    assert scored == changed["customerID"].iloc[::7].tolist()
+    assert second.scored == len(scored)
+    assert second.reused == len(changed) - len(scored)
@@ -0,0 +1,79 @@
+"""
+The inference service must batch concurrent requests, reject bad input and keep one bad row from failing its batch
+"""
+import numpy as np
+import asyncio
+import pytest
+import json
+
+from utils import scoring, serve
+
+
+def customer_payloads(customers, count):
+    rows = customers[scoring.expected_features].head(count)
+    return [{"model": "Gradient Boost", "customer": json.loads(row.to_json())} for _, row in rows.iterrows()]
+
+
+def post_all(service, *rounds):
+    """
+    sends the payloads of each round at once, with the batchers running, and returns the (status, response) of each
+    """
+    async def send():
+        tasks = [asyncio.create_task(batcher.run()) for batcher in service.batchers.values()]
+        try:
+            return [await asyncio.gather(*(service.handle("POST", "/predict", json.dumps(payload).encode()) for payload in payloads))
+                    for payloads in rounds]
+        finally:
+            for task in tasks:
+                task.cancel()
+    responses = asyncio.run(send())
+    return responses[0] if len(rounds) == 1 else responses
+
+
+@pytest.fixture
+def service():
+    # Batcher queues belong to the event loop of their first request, each test runs its own loop
+    return serve.InferenceService(max_batch_size = 16, max_wait_ms = 50)
+
+
+def test_concurrent_requests_are_batched(service, customers, gradient_boost):
+    pipeline, _ = gradient_boost
+    payloads = customer_payloads(customers, 40)
+    responses = post_all(service, payloads)
+    assert [status for status, _ in responses] == [200] * len(payloads)
+    assert service.batchers["Gradient Boost"].batches < len(payloads)
+    expected = pipeline.predict_proba(customers[scoring.expected_features].head(len(payloads)))[:, 1]
+    np.testing.assert_allclose([response["churn_probability"] for _, response in responses], expected, rtol = 0, atol = 1e-12)
+
+
+@pytest.mark.parametrize("feature, value", [("Contract", ["Month-to-month"]), ("gender", {"value": "Male"}), ("Partner", 1.5),
+                                            ("PaymentMethod", None), ("SeniorCitizen", [1])])
+def test_bad_categories_are_rejected(service, customers, feature, value):
+    payload = customer_payloads(customers, 1)[0]
+    payload["customer"][feature] = value
+    status, response = post_all(service, [payload])[0]
+    assert status == 400
+    assert feature in response["error"]
+
+
+def test_missing_features_are_rejected(service, customers):
+    payload = customer_payloads(customers, 1)[0]
+    del payload["customer"]["tenure"]
+    assert post_all(service, [payload])[0][0] == 400
+
+
+def test_bad_row_fails_only_its_request(service, customers, monkeypatch):
+    score = serve.MicroBatcher.score
+
+    # A row that passes validation but fails inside the model
+    def failing_score(self, rows):
+        if any(row["gender"] == "Unknown" for row in rows):
+            raise RuntimeError("model failed")
+        return score(self, rows)
+
+    monkeypatch.setattr(serve.MicroBatcher, "score", failing_score)
+    payloads = customer_payloads(customers, 10)
+    payloads[3]["customer"]["gender"] = "Unknown"
+    responses, good = post_all(service, payloads, payloads[:3] + payloads[4:])
+    assert [status for status, _ in responses] == [200] * 3 + [500] + [200] * 6
+    assert [response for _, response in good] == [response for _, response in responses[:3] + responses[4:]]
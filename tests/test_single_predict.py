@@ -0,0 +1,27 @@
+"""
+Single predictions must give the pipeline's probabilities for a one-row frame
+"""
+import pandas as pd
+import numpy as np
+import pytest
+
+from utils import scoring, single_predict
+
+
+@pytest.mark.parametrize("model", ["gradient_boost", "logistic_regression"])
+def test_matches_pipeline(customers, model, request):
+    pipeline, _ = request.getfixturevalue(model)
+    predictor = single_predict.SinglePredictor(pipeline)
+    for _, row in customers[scoring.expected_features].head(200).iterrows():
+        customer = row.to_dict()
+        expected = pipeline.predict_proba(pd.DataFrame([customer]))
+        np.testing.assert_allclose(predictor.predict_proba(customer), expected, rtol = 0, atol = 1e-12)
+
+
+def test_unknown_category_matches_pipeline(customers, gradient_boost):
+    pipeline, _ = gradient_boost
+    predictor = single_predict.SinglePredictor(pipeline)
+    customer = customers[scoring.expected_features].iloc[0].to_dict()
+    customer["PaymentMethod"] = "Barter"
+    expected = pipeline.predict_proba(pd.DataFrame([customer]))
+    np.testing.assert_allclose(predictor.predict_proba(customer), expected, rtol = 0, atol = 1e-12)
@@ -0,0 +1,32 @@
+"""
+The vectorized tree engine must score like the sklearn pipeline it was compiled from
+"""
+import numpy as np
+import pytest
+
+from utils import scoring, tree_engine
+
+
+@pytest.mark.parametrize("block_size", [tree_engine.DEFAULT_BLOCK_SIZE, 7])
+def test_probabilities_match_sklearn(customers, gradient_boost, block_size):
+    pipeline, _ = gradient_boost
+    X = customers[scoring.expected_features]
+    engine = tree_engine.compile_pipeline(pipeline, block_size = block_size)
+    np.testing.assert_allclose(engine.predict_proba(X), pipeline.predict_proba(X), rtol = 0, atol = 1e-12)
+
+
+def test_labels_match_sklearn(customers, gradient_boost, encoder):
+    pipeline, threshold = gradient_boost
+    engine = tree_engine.compile_pipeline(pipeline)
+    expected, _ = scoring.bulk_prediction(pipeline, threshold, customers, encoder)
+    labels, _ = scoring.bulk_prediction(engine, threshold, customers, encoder)
+    assert (labels == expected).all()
+
+
+def test_missing_and_unknown_values_match_sklearn(customers, gradient_boost):
+    pipeline, _ = gradient_boost
+    X = customers[scoring.expected_features].head(50).copy()
+    X.loc[X.index[::3], "TotalCharges"] = np.nan
+    X.loc[X.index[::4], "Contract"] = "Decade-long"
+    engine = tree_engine.compile_pipeline(pipeline)
+    np.testing.assert_allclose(engine.predict_proba(X), pipeline.predict_proba(X), rtol = 0, atol = 1e-12)
@@ -0,0 +1,139 @@
+"""
+Minified, content-hashed lottie animations
+
+Each animation is parsed once per server process. What the pages get is a
+minified version: floats are rounded to FLOAT_DECIMALS places, and the
+editor-only keys that only expressions read are dropped. The minified JSON is
+written next to the assets under a name holding the hash of the source and the
+minify settings, so later processes read that smaller file instead of minifying
+again. The same hash is the component key of the animation. The browser keeps
+the animation it already shows across reruns, where a new random key per
+rerun remounted it.
+
+Usage:
+    python -m utils.assets    # minify every animation and report sizes and load times
+"""
+import threading
+import hashlib
+import json
+import glob
+import time
+import os
+
+
+MINIFIED_DIR = "./assets/.min"
+FLOAT_DECIMALS = 3
+# Layer and property names and indexes, read by After Effects and by expressions only
+EDITOR_KEYS = {"mn", "nm", "ix", "cix"}
+
+# Minified animations held by this process, by source path, with the source stamp they were read at
+_cache = {}
+_lock = threading.Lock()
+
+
+def _stamp(path: str):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def content_hash(data: bytes):
+    """
+    returns the hash of a source file together with the minify settings, so changing either gives a new name
+    """
+    settings = json.dumps({"decimals": FLOAT_DECIMALS, "drop": sorted(EDITOR_KEYS)}).encode()
+    return hashlib.blake2b(data + settings, digest_size = 8).hexdigest()
+
+
+def has_expressions(value):
+    # Expressions are strings under an "x" key and may look up layers and properties by name or index
+    if isinstance(value, dict):
+        return any((key == "x" and isinstance(item, str)) or has_expressions(item) for key, item in value.items())
+    if isinstance(value, list):
+        return any(has_expressions(item) for item in value)
+    return False
+
+
+def _minify_value(value, drop):
+    if isinstance(value, float):
+        value = round(value, FLOAT_DECIMALS)
+        return int(value) if value.is_integer() else value
+    if isinstance(value, list):
+        return [_minify_value(item, drop) for item in value]
+    if isinstance(value, dict):
+        return {key: _minify_value(item, drop) for key, item in value.items() if key not in drop}
+    return value
+
+
+def minify(animation):
+    """
+    returns the animation with rounded floats, and without editor-only keys unless it uses expressions
+    """
+    return _minify_value(animation, set() if has_expressions(animation) else EDITOR_KEYS)
+
+
+def minified_path(filepath: str, digest: str):
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(MINIFIED_DIR, f"{name}.{digest}.min.json")
+
+
+def _load(filepath: str):
+    with open(filepath, "rb") as f:
+        data = f.read()
+    digest = content_hash(data)
+    path = minified_path(filepath, digest)
+    try:
+        with open(path, "rb") as f:
+            minified = f.read()
+    except OSError:
+        minified = json.dumps(minify(json.loads(data)), separators = (",", ":")).encode()
+        try:
+            os.makedirs(MINIFIED_DIR, exist_ok = True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(minified)
+            os.replace(temporary, path)
+        except OSError:
+            # A read-only checkout minifies again in the next process
+            pass
+    return {"animation": json.loads(minified), "key": f"lottie-{digest}", "source_bytes": len(data), "minified_bytes": len(minified)}
+
+
+def load(filepath: str):
+    """
+    returns the minified animation of a lottie file with its content-hashed key and sizes, parsed once per process
+    """
+    stamp = _stamp(filepath)
+    with _lock:
+        cached = _cache.get(filepath)
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, _load(filepath))
+        with _lock:
+            _cache[filepath] = cached
+    return cached[1]
+
+
+def report(pattern: str = "assets/*.json", repeats: int = 20):
+    """
+    returns the bytes each animation had and has now, with the per-rerun load time before and after
+    """
+    rows = []
+    for filepath in sorted(glob.glob(pattern)):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            with open(filepath, "r") as f:
+                json.load(f)
+        parse_ms = (time.perf_counter() - start) / repeats * 1000
+        asset = load(filepath)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            load(filepath)
+        cached_ms = (time.perf_counter() - start) / repeats * 1000
+        rows.append({"file": os.path.basename(filepath), "source_bytes": asset["source_bytes"], "minified_bytes": asset["minified_bytes"],
+                     "saved": f"{1 - asset['minified_bytes'] / asset['source_bytes']:.1%}",
+                     "parse_ms": round(parse_ms, 3), "cached_ms": round(cached_ms, 4)})
+    return rows
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    print(pd.DataFrame(report()).to_string(index = False))
@@ -0,0 +1,153 @@
+"""
+Login configuration of the pages that require a login
+
+config.yaml holds plain text passwords, and bcrypt is slow on purpose. Each
+password is therefore hashed once and its hash kept in a credential store with
+the stamp of the config file it was made from, and every server process holds
+the parsed, hashed config until config.yaml changes. While the stamp matches, a
+process takes the stored hashes as they are and runs no bcrypt at all. After an
+edit each stored hash is checked against its password with bcrypt once, and the
+store is written with the new stamp. The store holds nothing derived from the
+passwords but their bcrypt hashes. A page rerun only copies the cached config
+and builds its authenticator, so its cost does not grow with the number of users.
+
+Usage:
+    authenticator = auth.authenticator()
+    authenticator.login("sidebar", "Login")
+"""
+import streamlit_authenticator as stauth
+from streamlit_authenticator.utilities import Hasher
+from yaml.loader import SafeLoader
+import threading
+import bcrypt
+import yaml
+import copy
+import json
+import os
+
+from utils import stage_timing
+
+
+CONFIG_FILE = "config.yaml"
+CREDENTIAL_STORE = "./data/credentials.json"
+
+# Parsed config with hashed passwords, by config path, with the file stamp it was read at
+_cache = {}
+_lock = threading.Lock()
+
+
+def _stamp(path: str):
+    """
+    returns what changes whenever the file is written: its inode, modification and change times and size
+    """
+    stat = os.stat(path)
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size]
+
+
+def _matches(password: str, entry):
+    """
+    tells whether a stored entry holds a bcrypt hash of the password
+    """
+    try:
+        return bcrypt.checkpw(password.encode(), entry["hash"].encode())
+    except (KeyError, TypeError, AttributeError, ValueError):
+        # A damaged or foreign entry is hashed again
+        return False
+
+
+def read_store(store_path: str = CREDENTIAL_STORE):
+    """
+    returns the stored config stamp and hashes as {"config_stamp": ..., "users": {username: {"hash": ...}}}
+    """
+    try:
+        with open(store_path) as file:
+            store = json.load(file)
+    except (OSError, ValueError):
+        return {"config_stamp": None, "users": {}}
+    # Older stores hold the users at the top level and no stamp, their hashes are checked once
+    if "users" not in store:
+        return {"config_stamp": None, "users": store}
+    return store
+
+
+def write_store(store, store_path: str = CREDENTIAL_STORE):
+    temporary = f"{store_path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(store, file, indent = 1, sort_keys = True)
+    os.chmod(temporary, 0o600)
+    os.replace(temporary, store_path)
+
+
+def hash_credentials(credentials, config_stamp = None, store_path: str = CREDENTIAL_STORE):
+    """
+    replaces the plain text passwords of the credentials with bcrypt hashes, hashing only passwords not hashed before
+
+    Stored hashes are taken without checking them when `config_stamp` is the stamp they were stored with.
+    """
+    store = read_store(store_path)
+    users = store["users"]
+    verified = config_stamp is not None and store["config_stamp"] == config_stamp
+    changed = not verified
+    usernames = credentials.get("usernames") or {}
+    for username, user in usernames.items():
+        password = str(user["password"])
+        if Hasher._is_hash(password):
+            continue
+        entry = users.get(username)
+        if entry is None or not (verified and "hash" in entry or _matches(password, entry)):
+            entry = {"hash": Hasher([password]).generate()[0]}
+            changed = True
+        elif set(entry) != {"hash"}:
+            # Entries of older stores also kept a digest of the password, only the hash is kept
+            entry = {"hash": entry["hash"]}
+            changed = True
+        users[username] = entry
+        user["password"] = entry["hash"]
+
+    # Users removed from the config take their hashes with them
+    for username in set(users) - set(usernames):
+        del users[username]
+        changed = True
+    if changed:
+        try:
+            write_store({"config_stamp": config_stamp, "users": users}, store_path)
+        except OSError:
+            # Without a writable data directory the next process hashes again
+            pass
+    return credentials
+
+
+def load_config(config_path: str = CONFIG_FILE, store_path: str = CREDENTIAL_STORE):
+    """
+    returns a copy of the config with hashed passwords, parsing and hashing only when the file changed
+    """
+    stamp = _stamp(config_path)
+    with _lock:
+        cached = _cache.get(config_path)
+        if cached is None or cached[0] != stamp:
+            with stage_timing.timed("auth.load_config"):
+                with open(config_path) as file:
+                    config = yaml.load(file, Loader = SafeLoader)
+                hash_credentials(config["credentials"], stamp, store_path)
+            cached = _cache[config_path] = (stamp, config)
+    # Logins update the credentials they are given, so every authenticator gets its own copy
+    return copy.deepcopy(cached[1])
+
+
+def authenticator(config_path: str = CONFIG_FILE):
+    """
+    returns the authenticator of this rerun
+
+    The authenticator is built on every rerun: it reads the browser's cookies when it is
+    created, so one shared between sessions would hand one user's cookies to another.
+    """
+    config = load_config(config_path)
+    return stauth.Authenticate(
+        config["credentials"],
+        config["cookie"]["name"],
+        config["cookie"]["key"],
+        config["cookie"]["expiry_days"],
+        config["pre-authorized"],
+        False,
+        auto_hash = False
+    )
@@ -0,0 +1,141 @@
+"""
+Headless bulk scoring for scheduled jobs, using the same scoring code as the Predict page
+
+Usage:
+    python -m utils.batch_score input.csv output.csv
+    python -m utils.batch_score input.parquet output.parquet --workers 8
+    python -m utils.batch_score input.csv output.csv --engine vectorized
+    python -m utils.batch_score input.csv output.csv --explain
+    python -m utils.batch_score input.csv comparison.csv --compare
+"""
+import argparse
+import time
+import sys
+
+from utils import scoring
+
+
+class HistoryWriter:
+    """
+    writes scored chunks to a csv or parquet output file, one chunk at a time
+    """
+    def __init__(self, output: str):
+        if not output.endswith((".csv", ".parquet")):
+            raise ValueError("Unsupported output type. Please use a csv or parquet file")
+        self.output = output
+        self.parquet_writer = None
+        self.schema = None
+        self.chunks_written = 0
+
+    def write(self, bulk_history_df):
+        if self.output.endswith(".csv"):
+            scoring.write_history(bulk_history_df, self.output, append = self.chunks_written > 0)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            # Later chunks are cast to the first chunk's schema so all row groups match
+            table = pa.Table.from_pandas(bulk_history_df, schema = self.schema, preserve_index = False)
+            if self.parquet_writer is None:
+                self.schema = table.schema
+                self.parquet_writer = pq.ParquetWriter(self.output, self.schema)
+            self.parquet_writer.write_table(table)
+        self.chunks_written += 1
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Score a csv, xlsx or parquet customer file with the gradient boost model")
+    parser.add_argument("input", help = "csv, xlsx or parquet file to score")
+    parser.add_argument("output", help = "csv or parquet file the predictions are written to")
+    parser.add_argument("--chunk-size", type = int, default = 50_000, help = "rows read and scored at a time")
+    parser.add_argument("--workers", type = int, default = 1, help = "worker processes, 1 scores in this process")
+    parser.add_argument("--shard-size", type = int, default = 100_000, help = "rows per worker task when --workers > 1")
+    parser.add_argument("--engine", choices = ["sklearn", "vectorized"], default = "sklearn",
+                        help = "score with the sklearn pipeline or the compiled vectorized tree engine")
+    parser.add_argument("--explain", action = "store_true",
+                        help = "add the top drivers of every prediction, from the gradient boost model's tree paths")
+    parser.add_argument("--compare", action = "store_true",
+                        help = "score with both the gradient boost and the logistic regression model at once and report their agreement")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(args)
+
+    load_start = time.perf_counter()
+
+    if args.workers > 1:
+        from utils import parallel
+        score = lambda chunk: parallel.parallel_bulk_prediction(chunk, workers = args.workers, shard_size = args.shard_size, engine = args.engine)
+    else:
+        model, threshold = scoring.load_gradient_boost()
+        encoder = scoring.load_encoder()
+        if args.engine == "vectorized":
+            from utils import tree_engine
+            model = tree_engine.compile_pipeline(model)
+        score = lambda chunk: scoring.bulk_prediction(model, threshold, chunk, encoder)
+
+    explain = None
+    if args.explain:
+        from utils import explain as explanations
+        explain = explanations.compile_explainer(scoring.load_gradient_boost()[0]).top_drivers
+
+    start = time.perf_counter()
+    print(f"Loaded model in {start - load_start:.2f}s")
+
+    rows_scored = 0
+    try:
+        writer = HistoryWriter(args.output)
+        with open(args.input, "rb") as file:
+            chunks = scoring.read_in_chunks(file, args.input, args.chunk_size)
+            for bulk_history_df in scoring.score_chunks(chunks, score, scoring.prediction_date(), explain):
+                writer.write(bulk_history_df)
+                rows_scored += len(bulk_history_df)
+        writer.close()
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file = sys.stderr)
+        return 2
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows_scored:,} rows in {elapsed:.2f}s ({rows_scored / max(elapsed, 1e-9):,.0f} rows/s) -> {args.output}")
+    return 0
+
+
+def compare(args):
+    """
+    writes both models' predictions of every row with a disagreement flag, and prints their agreement
+    """
+    from utils import model_compare
+    summary = model_compare.AgreementSummary()
+    model_seconds = {name: 0.0 for name in model_compare.MODELS}
+    start = time.perf_counter()
+    try:
+        writer = HistoryWriter(args.output)
+        with open(args.input, "rb") as file:
+            chunks = scoring.read_in_chunks(file, args.input, args.chunk_size)
+            for chunk in scoring.prepare_chunks(chunks):
+                # Both models score the same parsed chunk on the worker pool
+                results, _ = model_compare.score(chunk, workers = args.workers, shard_size = args.shard_size, engine = args.engine)
+                comparison = model_compare.build_comparison(chunk, results, scoring.prediction_date())
+                writer.write(comparison)
+                summary.add(comparison)
+                for name, (_, _, seconds) in results.items():
+                    model_seconds[name] += seconds
+        writer.close()
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file = sys.stderr)
+        return 2
+
+    elapsed = time.perf_counter() - start
+    for name, (_, label) in model_compare.MODELS.items():
+        print(f"{label}: {model_seconds[name]:.2f}s of worker time")
+    print(f"Compared {summary.rows:,} rows in {elapsed:.2f}s -> {args.output}")
+    for key, value in summary.as_dict().items():
+        print(f"  {key}: {value:.4f}" if isinstance(value, float) else f"  {key}: {value:,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
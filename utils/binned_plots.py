@@ -0,0 +1,94 @@
+from plotly.subplots import make_subplots
+import plotly.graph_objects as go
+import plotly.express as px
+import numpy as np
+import itertools
+
+
+# Above this many rows the EDA Dashboard sends binned summaries instead of every point
+LARGE_DATA_ROWS = 100_000
+
+# Cells per axis of each pairplot density grid
+DENSITY_BINS = 40
+
+
+def box_stats(values):
+    """
+    returns the quartiles and 1.5 IQR whiskers plotly would compute from the raw points, None without any number
+    """
+    values = np.asarray(values, dtype = np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    # Whiskers end at the furthest points still inside the fences
+    lower = values[values >= q1 - 1.5 * iqr].min()
+    upper = values[values <= q3 + 1.5 * iqr].max()
+    return {"q1": [q1], "median": [median], "q3": [q3], "lowerfence": [lower], "upperfence": [upper]}
+
+
+def box_figure(df, column, title, color):
+    """
+    draws a box plot from precomputed statistics, without sending the points
+    """
+    # A column without numbers gets an empty box rather than an error
+    fig = go.Figure(go.Box(name = column, marker_color = color, **(box_stats(df[column]) or {})))
+    fig.update_layout(title = title, yaxis_title = column)
+    return fig
+
+
+def density_edges(values, bins: int = DENSITY_BINS):
+    """
+    returns bins + 1 evenly spaced edges over the numbers in values, None without any number
+    """
+    values = np.asarray(values, dtype = np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    low, high = values.min(), values.max()
+    # A constant column would give edges that do not increase, it is centred in a bin of width one instead
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+
+def density_pairplot(df, dimensions, color, title, bins = DENSITY_BINS):
+    """
+    draws the pairplot as 2-D density grids, one row of dimension pairs per value of color
+
+    Every grid has bins x bins cells, so the figure size does not depend on the number of rows.
+    Pairs with a dimension that holds no numbers are left empty.
+    """
+    pairs = list(itertools.combinations(dimensions, 2))
+    classes = sorted(df[color].dropna().unique())
+    if not classes or not pairs:
+        return go.Figure().update_layout(title = title)
+    # Shared edges so the grids of each class can be compared cell by cell
+    edges = {dimension: density_edges(df[dimension], bins) for dimension in dimensions}
+
+    fig = make_subplots(rows = len(classes), cols = len(pairs), horizontal_spacing = 0.08, vertical_spacing = 0.12,
+                        subplot_titles = [f"{color} = {value}" for value in classes for _ in pairs])
+    for row, value in enumerate(classes, start = 1):
+        members = df.loc[df[color] == value, dimensions]
+        for col, (x, y) in enumerate(pairs, start = 1):
+            fig.update_xaxes(title_text = x, row = row, col = col)
+            fig.update_yaxes(title_text = y, row = row, col = col)
+            if edges[x] is None or edges[y] is None:
+                continue
+            subset = members[[x, y]].dropna()
+            counts, _, _ = np.histogram2d(subset[x], subset[y], bins = [edges[x], edges[y]])
+            fig.add_trace(go.Heatmap(x = (edges[x][:-1] + edges[x][1:]) / 2, y = (edges[y][:-1] + edges[y][1:]) / 2,
+                                     z = counts.T, colorscale = "Viridis", showscale = False,
+                                     hovertemplate = f"{x}: %{{x:.1f}}<br>{y}: %{{y:.1f}}<br>customers: %{{z}}<extra></extra>"),
+                          row = row, col = col)
+    fig.update_layout(title = title, height = 350 * len(classes))
+    return fig
+
+
+def count_figure(df, x, color, title):
+    """
+    grouped counts per category, the same bars as px.histogram without sending the rows
+    """
+    counts = df.groupby([x, color]).size().reset_index(name = "count")
+    return px.bar(counts, x = x, y = "count", color = color, barmode = "group", title = title)
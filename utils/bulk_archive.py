@@ -0,0 +1,435 @@
+"""
+Append-only archive of bulk prediction runs
+
+Every bulk run is kept, tagged with a run id, as zstd-compressed Parquet files
+partitioned by source and prediction date:
+
+    data/bulk_archive/source=inbuilt/Prediction_Date=2026-10-18/run-20261018-101500-a1b2c3-00000.parquet
+
+Inside a file each row group holds the rows of one run and one Churn value, so a
+filter on the source or date skips whole directories and a filter on the run or
+Churn skips row groups by their statistics. Streaming runs add one file per
+chunk; compact() merges the files of a partition into one. The history CSV of a
+source keeps only the latest run, for the pages that read it.
+
+Usage:
+    python -m utils.bulk_archive --compact    # merge the files of every partition
+"""
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+import pyarrow.compute as pc
+import pyarrow as pa
+import pandas as pd
+import numpy as np
+import datetime
+import contextlib
+import threading
+import argparse
+import glob
+import os
+
+from utils import compact_frame, explain, history_aggregates, history_writer, scoring, stage_timing
+
+
+ARCHIVE_DIR = "./data/bulk_archive"
+COMPRESSION = "zstd"
+ROW_GROUP_ROWS = 100_000
+# A partition with more files than this is compacted when a run finishes
+MAX_FILES_PER_PARTITION = 8
+
+PARTITIONING = ds.HivePartitioning(pa.schema([("source", pa.string()), ("Prediction_Date", pa.string())]))
+
+# Columns of each file; source and Prediction_Date are held by the directory names
+FEATURE_TYPES = {feature: pa.string() for feature in scoring.expected_features}
+FEATURE_TYPES.update({"tenure": pa.float64(), "MonthlyCharges": pa.float64(), "TotalCharges": pa.float64()})
+SCHEMA = pa.schema([("run_id", pa.string()), ("row", pa.int64()), ("customerID", pa.string())]
+                   + list(FEATURE_TYPES.items())
+                   + [("Model_used", pa.string()), ("Churn", pa.string()), ("Probability", pa.float64()),
+                      ("Churn_probability", pa.float64()), ("Actual_Churn", pa.string())]
+                   + [(column, pa.float64() if column.endswith("_effect") else pa.string()) for column in explain.driver_columns()])
+
+DATASET_SCHEMA = pa.unify_schemas([SCHEMA, PARTITIONING.schema])
+
+# Columns of a history frame read back, in the order of the history CSV
+HISTORY_COLUMNS = ["run_id", "customerID", "Prediction_Date"] + scoring.expected_features \
+    + ["Model_used", "Churn", "Probability", "Churn_probability", "Actual_Churn"] + explain.driver_columns()
+
+# Columns only some runs have: known outcomes of labelled data, and drivers of explained runs
+OPTIONAL_COLUMNS = ["Actual_Churn"] + explain.driver_columns()
+
+# Row groups of the archive files read by this process, by path, with the file stamp they were read at
+_footers = {}
+_footers_lock = threading.Lock()
+
+
+def new_run_id():
+    """
+    returns an id that sorts in the order the runs were made
+    """
+    return f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{os.urandom(3).hex()}"
+
+
+def source_for(is_uploaded_data: bool):
+    return history_aggregates.UPLOADED if is_uploaded_data else history_aggregates.INBUILT
+
+
+def partition_dir(source: str, prediction_date: str, archive_dir: str = ARCHIVE_DIR):
+    return os.path.join(archive_dir, f"source={source}", f"Prediction_Date={prediction_date}")
+
+
+def _from_percent(probability):
+    # Bulk Probability has always been the class-1 probability in percent, rounded to 2 places
+    return pd.to_numeric(probability, errors = "coerce") / 100
+
+
+def _to_table(history_df, run_id: str, first_row: int):
+    """
+    turns a bulk history frame into a table of the archive schema, sorted into (run, Churn) groups
+    """
+    # Older history files name the prediction Customer_Churn_status
+    frame = history_df.rename(columns = {"Customer_Churn_status": "Churn"})
+    if "Churn_probability" not in frame.columns and "Probability" in frame.columns:
+        frame = frame.assign(Churn_probability = _from_percent(frame["Probability"]))
+    columns = {"run_id": pa.array(np.full(len(frame), run_id, dtype = object), pa.string()),
+               "row": pa.array(np.arange(first_row, first_row + len(frame)), pa.int64())}
+    for field in SCHEMA:
+        if field.name in columns:
+            continue
+        if field.name not in frame.columns:
+            columns[field.name] = pa.nulls(len(frame), field.type)
+        elif pa.types.is_string(field.type):
+            values = frame[field.name]
+            columns[field.name] = pa.array(values.where(values.isna(), values.astype(str)), pa.string(), from_pandas = True)
+        else:
+            columns[field.name] = pa.array(pd.to_numeric(frame[field.name], errors = "coerce").to_numpy(dtype = np.float64),
+                                           field.type, from_pandas = True)
+    table = pa.table(columns, schema = SCHEMA)
+    return table.sort_by([("run_id", "ascending"), ("Churn", "ascending"), ("row", "ascending")])
+
+
+def _write_file(table, path: str):
+    """
+    writes one row group per (run, Churn) pair, to a hidden temporary file first so readers never see half a file
+    """
+    temporary = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    keys = pc.binary_join_element_wise(table.column("run_id"), pc.fill_null(table.column("Churn"), ""), "\x00")
+    # Rows are sorted, so each group is one slice
+    boundaries = np.flatnonzero(np.asarray(pc.not_equal(keys[1:], keys[:-1]).to_numpy(zero_copy_only = False))) + 1
+    starts = np.concatenate([[0], boundaries])
+    ends = np.concatenate([boundaries, [table.num_rows]])
+    with pq.ParquetWriter(temporary, SCHEMA, compression = COMPRESSION) as writer:
+        for start, end in zip(starts, ends):
+            if end > start:
+                writer.write_table(table.slice(start, end - start), row_group_size = ROW_GROUP_ROWS)
+    os.replace(temporary, path)
+
+
+def append(history_df, source: str, run_id: str, part: int = 0, archive_dir: str = ARCHIVE_DIR):
+    """
+    adds the rows of one chunk of a run to the archive, numbering them after the chunks already written
+
+    Rows of a chunk are numbered from `part` * 10^9, so chunks of a streaming run read back in order.
+    """
+    with stage_timing.timed("bulk.write_archive", rows = len(history_df)):
+        for prediction_date, rows in history_df.groupby("Prediction_Date", sort = False):
+            directory = partition_dir(source, str(prediction_date), archive_dir)
+            os.makedirs(directory, exist_ok = True)
+            table = _to_table(rows, run_id, part * 10**9)
+            _write_file(table, os.path.join(directory, f"run-{run_id}-{part:05d}.parquet"))
+
+
+@contextlib.contextmanager
+def _reading(archive_dir: str = ARCHIVE_DIR):
+    """
+    keeps compactions from swapping files while the archive is listed and read
+
+    Readers share the lock; a compaction holds it alone only while it puts its merged file in
+    place of the files it merged, so a reader sees either all of those files or the merged one.
+    """
+    if not os.path.isdir(archive_dir):
+        yield
+        return
+    with history_writer.file_lock(os.path.join(archive_dir, ".files.lock"), shared = True):
+        yield
+
+
+def _dataset(archive_dir: str = ARCHIVE_DIR):
+    # Hidden temporary and lock files start with a dot and are left out of the discovery
+    if not os.path.isdir(archive_dir):
+        return None
+    return ds.dataset(archive_dir, schema = DATASET_SCHEMA, format = "parquet", partitioning = PARTITIONING)
+
+
+def _filter(sources = None, date_from = None, date_to = None, run_ids = None, churn = None):
+    expression = None
+    clauses = []
+    if sources is not None:
+        clauses.append(pc.field("source").isin(list(sources)))
+    if date_from is not None:
+        clauses.append(pc.field("Prediction_Date") >= str(date_from))
+    if date_to is not None:
+        clauses.append(pc.field("Prediction_Date") <= str(date_to))
+    if run_ids is not None:
+        clauses.append(pc.field("run_id").isin(list(run_ids)))
+    if churn is not None:
+        clauses.append(pc.field("Churn") == churn)
+    for clause in clauses:
+        expression = clause if expression is None else expression & clause
+    return expression
+
+
+def read(sources = None, date_from = None, date_to = None, run_ids = None, churn = None, columns = None,
+         compact: bool = False, archive_dir: str = ARCHIVE_DIR):
+    """
+    returns the archived rows matching every given filter in run and row order, as a compact frame if asked
+
+    Only the partitions of the chosen sources and dates are opened, only the row groups
+    of the chosen runs and Churn value are read, and of those only the chosen columns.
+    Optional columns no selected row has, such as Actual_Churn without known outcomes, are
+    left out unless they are asked for.
+    """
+    selected = list(columns) if columns is not None else HISTORY_COLUMNS
+    # Runs archived before the raw probability was kept have it recomputed from Probability
+    needed = set(selected) | {"run_id", "row"} | ({"Probability"} if "Churn_probability" in selected else set())
+    with _reading(archive_dir):
+        dataset = _dataset(archive_dir)
+        if dataset is None:
+            return pd.DataFrame(columns = selected)
+        table = dataset.to_table(filter = _filter(sources, date_from, date_to, run_ids, churn),
+                                 columns = [name for name in DATASET_SCHEMA.names if name in needed])
+    table = table.sort_by([("run_id", "ascending"), ("row", "ascending")])
+    if "Churn_probability" in selected and table.column("Churn_probability").null_count:
+        recomputed = pc.divide(table.column("Probability"), 100.0)
+        table = table.set_column(table.column_names.index("Churn_probability"), "Churn_probability",
+                                 pc.coalesce(table.column("Churn_probability"), recomputed))
+    if columns is None:
+        selected = [column for column in selected
+                    if column not in OPTIONAL_COLUMNS or table.column(column).null_count < table.num_rows]
+    table = table.select(selected)
+    # Tenure is stored as a float so missing values survive, whole numbers read back as int64 like the history CSV
+    if "tenure" in selected and table.column("tenure").null_count == 0:
+        table = table.set_column(table.column_names.index("tenure"), "tenure", pc.cast(table.column("tenure"), pa.int64()))
+
+    if compact:
+        # Strings go straight into Categoricals instead of one Python object per value
+        return compact_frame.compact(table.to_pandas(strings_to_categorical = True))
+    df = table.to_pandas()
+    # Missing text is NaN in frames read by pandas, not None
+    for column in table.column_names:
+        if pa.types.is_string(table.column(column).type) and table.column(column).null_count:
+            values = df[column].to_numpy(dtype = object)
+            values[pd.isna(values)] = np.nan
+            df[column] = values
+    return df
+
+
+def _partitions(sources = None, date_from = None, date_to = None, archive_dir: str = ARCHIVE_DIR):
+    """
+    returns (source, Prediction_Date, directory) of the partitions matching the filters, from the directory names alone
+    """
+    partitions = []
+    for directory in sorted(glob.glob(os.path.join(archive_dir, "source=*", "Prediction_Date=*"))):
+        source = os.path.basename(os.path.dirname(directory)).split("=", 1)[1]
+        prediction_date = os.path.basename(directory).split("=", 1)[1]
+        if sources is not None and source not in sources:
+            continue
+        # Same string comparison as the partition filter of read()
+        if (date_from is not None and prediction_date < str(date_from)) or (date_to is not None and prediction_date > str(date_to)):
+            continue
+        partitions.append((source, prediction_date, directory))
+    return partitions
+
+
+def _row_groups(file: str):
+    """
+    returns (row group, run_id, Churn, rows) of an archive file, from the statistics in its footer
+
+    Every row group holds one (run, Churn) pair, so its statistics name both without reading rows.
+    Files are never changed once written, the footer of each is read once per process.
+    """
+    stat = os.stat(file)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _footers_lock:
+        cached = _footers.get(file)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    parquet_file = pq.ParquetFile(file)
+    metadata = parquet_file.metadata
+    names = metadata.schema.names
+    groups = []
+    for group in range(metadata.num_row_groups):
+        row_group = metadata.row_group(group)
+        values = []
+        for name in ["run_id", "Churn"]:
+            statistics = row_group.column(names.index(name)).statistics
+            if statistics is not None and statistics.has_min_max and statistics.min == statistics.max and not statistics.null_count:
+                values.append(statistics.min)
+            elif statistics is not None and statistics.has_null_count and statistics.null_count == row_group.num_rows:
+                values.append(None)
+            else:
+                values = None
+                break
+        if values is not None:
+            groups.append((group, values[0], values[1], row_group.num_rows))
+            continue
+        # A row group without usable statistics is counted from its two columns
+        counts = parquet_file.read_row_group(group, columns = ["run_id", "Churn"]).group_by(["run_id", "Churn"]).aggregate([([], "count_all")])
+        for run_id, churn, rows in zip(*(counts.column(name).to_pylist() for name in ["run_id", "Churn", "count_all"])):
+            groups.append((group, run_id, churn, rows))
+    with _footers_lock:
+        _footers[file] = (stamp, groups)
+    return groups
+
+
+def _partition_files(directory: str):
+    # Hidden temporary files start with a dot and are left out, as in the dataset discovery
+    return sorted(glob.glob(os.path.join(directory, "*.parquet")))
+
+
+def latest_run(source: str, archive_dir: str = ARCHIVE_DIR):
+    """
+    returns the id of the newest run of a source, from the footers of its newest date partition
+    """
+    with _reading(archive_dir):
+        partitions = _partitions([source], archive_dir = archive_dir)
+        if not partitions:
+            return None
+        run_ids = [run_id for file in _partition_files(partitions[-1][2]) for _, run_id, _, _ in _row_groups(file) if run_id is not None]
+    return max(run_ids) if run_ids else None
+
+
+def runs(sources = None, date_from = None, date_to = None, archive_dir: str = ARCHIVE_DIR):
+    """
+    returns one row per archived run, newest first: source, run_id, Prediction_Date, rows and churned
+
+    Counts come from the row group footers of the selected partitions, no rows are read, so
+    listing the runs does not get slower as the archive grows by rows.
+    """
+    summary = {}
+    with _reading(archive_dir):
+        for source, prediction_date, directory in _partitions(sources, date_from, date_to, archive_dir):
+            for file in _partition_files(directory):
+                for _, run_id, churn, rows in _row_groups(file):
+                    date, total, churned = summary.get((source, run_id), (prediction_date, 0, 0))
+                    summary[(source, run_id)] = (min(date, prediction_date), total + rows, churned + (rows if churn == "Yes" else 0))
+    frame = pd.DataFrame([(source, run_id, date, rows, churned) for (source, run_id), (date, rows, churned) in summary.items()],
+                         columns = ["source", "run_id", "Prediction_Date", "rows", "churned"])
+    return frame.sort_values("run_id", ascending = False, ignore_index = True)
+
+
+def _run_groups(files):
+    """
+    returns (run_id, file, row group) of every row group of archive files in run order, from their statistics without reading rows
+    """
+    # One entry per row group, a row group counted from its rows may have listed several Churn values
+    groups = {}
+    for file in files:
+        for group, run_id, _, _ in _row_groups(file):
+            groups.setdefault((file, group), run_id)
+    # Stable, so the row groups of a run keep the order of their files and of their rows
+    return sorted(((run_id, file, group) for (file, group), run_id in groups.items()), key = lambda item: item[0])
+
+
+def _conform(table):
+    # Files written before a column was added read it as nulls
+    return pa.table([table.column(field.name) if field.name in table.column_names else pa.nulls(table.num_rows, field.type)
+                     for field in SCHEMA], schema = SCHEMA)
+
+
+def _merge_files(files, path: str):
+    """
+    writes the row groups of archive files into one file a row group at a time, returning the rows written
+
+    Every row group holds one (run, Churn) pair and its rows in order, so the row groups are
+    only put in run order and memory is bounded by a row group, not by the partition.
+    """
+    rows = 0
+    with pq.ParquetWriter(path, SCHEMA, compression = COMPRESSION) as writer:
+        for _, file, group in _run_groups(files):
+            table = _conform(pq.ParquetFile(file).read_row_group(group))
+            writer.write_table(table, row_group_size = ROW_GROUP_ROWS)
+            rows += table.num_rows
+    return rows
+
+
+def compact(sources = None, min_files: int = 2, archive_dir: str = ARCHIVE_DIR):
+    """
+    merges the files of each partition holding at least `min_files` into one, returning the partitions merged
+
+    Runs keep their own row groups in the merged file, so run and Churn filters still skip the rest.
+    Row groups are copied one at a time, a partition is never held in memory whole.
+    """
+    merged = []
+    os.makedirs(archive_dir, exist_ok = True)
+    # One compaction at a time across processes; runs being written add new files and are never touched
+    with history_writer.file_lock(os.path.join(archive_dir, ".compact.lock")):
+        for _, _, directory in _partitions(sources, archive_dir = archive_dir):
+            files = _partition_files(directory)
+            if len(files) < min_files:
+                continue
+            path = os.path.join(directory, f"compacted-{new_run_id()}.parquet")
+            # Merged under a hidden name, readers keep reading the files being merged meanwhile
+            temporary = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+            with stage_timing.timed("bulk.compact_archive") as timer:
+                timer.rows = _merge_files(files, temporary)
+                # No reader sees the merged file next to the files it replaces
+                with history_writer.file_lock(os.path.join(archive_dir, ".files.lock")):
+                    os.replace(temporary, path)
+                    for file in files:
+                        os.remove(file)
+                with _footers_lock:
+                    for file in files:
+                        _footers.pop(file, None)
+            merged.append(directory)
+    return merged
+
+
+def compact_if_needed(source: str, archive_dir: str = ARCHIVE_DIR):
+    """
+    compacts the partitions of a source once one of them holds more than MAX_FILES_PER_PARTITION files
+    """
+    directories = glob.glob(os.path.join(archive_dir, f"source={source}", "Prediction_Date=*"))
+    if any(len(glob.glob(os.path.join(directory, "*.parquet"))) > MAX_FILES_PER_PARTITION for directory in directories):
+        return compact([source], MAX_FILES_PER_PARTITION + 1, archive_dir)
+    return []
+
+
+def import_legacy_csv(source: str, csv_path: str, archive_dir: str = ARCHIVE_DIR):
+    """
+    archives the run kept in a source's history CSV once, when the source has no archived runs yet
+    """
+    if os.path.isdir(os.path.join(archive_dir, f"source={source}")) or not os.path.exists(csv_path):
+        return None
+    os.makedirs(archive_dir, exist_ok = True)
+    with history_writer.file_lock(os.path.join(archive_dir, ".import.lock")):
+        # Another process may have imported it while this one waited for the lock
+        if os.path.isdir(os.path.join(archive_dir, f"source={source}")):
+            return None
+        modified = datetime.datetime.fromtimestamp(os.stat(csv_path).st_mtime)
+        run_id = f"{modified:%Y%m%d-%H%M%S}-legacy"
+        for part, chunk in enumerate(pd.read_csv(csv_path, chunksize = 500_000)):
+            append(chunk, source, run_id, part, archive_dir)
+    return run_id
+
+
+def import_legacy_history(archive_dir: str = ARCHIVE_DIR):
+    for source, csv_path in history_aggregates.BULK_HISTORY_FILES.items():
+        import_legacy_csv(source, csv_path, archive_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Maintain the archive of bulk prediction runs")
+    parser.add_argument("--compact", action = "store_true", help = "merge the files of every partition into one")
+    parser.add_argument("--archive-dir", default = ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    import_legacy_history(args.archive_dir)
+    if args.compact:
+        merged = compact(archive_dir = args.archive_dir)
+        print(f"Compacted {len(merged)} partitions")
+    print(runs(archive_dir = args.archive_dir).to_string(index = False))
+
+
+if __name__ == "__main__":
+    main()
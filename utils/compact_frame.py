@@ -0,0 +1,183 @@
+"""
+Compact in-memory customer frames
+
+Customer data read by pandas holds every Yes/No answer as a Python string and
+every number as a 64-bit value. The compact form keeps the answer columns as
+Categoricals with fixed categories, customerID and other free text as Arrow
+strings, integers in the smallest integer type and charges as float32 when they
+round-trip exactly. expand() gives back the frame the pipelines expect.
+
+Usage:
+    df = compact_frame.compact(df)          # held in session state and caches
+    model.predict_proba(compact_frame.expand(df))
+"""
+import pandas as pd
+import numpy as np
+import sys
+
+
+YES_NO = ["No", "Yes"]
+INTERNET_ADD_ON = ["No", "No internet service", "Yes"]
+
+# Categories of every answer column, in the order they are stored
+CATEGORIES = {
+    "gender": ["Female", "Male"],
+    "SeniorCitizen": YES_NO,
+    "Partner": YES_NO,
+    "Dependents": YES_NO,
+    "PhoneService": YES_NO,
+    "MultipleLines": ["No", "No phone service", "Yes"],
+    "InternetService": ["DSL", "Fiber optic", "No"],
+    "OnlineSecurity": INTERNET_ADD_ON,
+    "OnlineBackup": INTERNET_ADD_ON,
+    "DeviceProtection": INTERNET_ADD_ON,
+    "TechSupport": INTERNET_ADD_ON,
+    "StreamingTV": INTERNET_ADD_ON,
+    "StreamingMovies": INTERNET_ADD_ON,
+    "Contract": ["Month-to-month", "One year", "Two year"],
+    "PaperlessBilling": YES_NO,
+    "PaymentMethod": ["Bank transfer (automatic)", "Credit card (automatic)", "Electronic check", "Mailed check"],
+    "Churn": YES_NO,
+    "Actual_Churn": YES_NO,
+    "Customer_Churn_status": YES_NO,
+    "Model_used": ["Gradient Boost Classifier", "Gradient Boost", "Logistic Regression"],
+}
+
+# Decimal places of money and percentage columns, restored when float32 values are widened again
+DECIMALS = {"MonthlyCharges": 2, "TotalCharges": 2, "Probability": 2}
+
+# Text columns with fewer distinct values than this share of rows are stored as Categoricals
+CATEGORICAL_RATIO = 0.5
+
+ARROW_STRING = pd.StringDtype("pyarrow")
+
+
+def memory_usage(df):
+    """
+    returns the bytes held by a frame, counting the Python objects of object columns
+    """
+    return int(df.memory_usage(index = True, deep = True).sum())
+
+
+def _object_bytes(categorical):
+    """
+    returns what the column held as Python strings, as df.memory_usage(deep = True) would count it
+
+    Counted from the categories and their frequencies, which is much faster than visiting every object.
+    """
+    codes = categorical.cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0], minlength = len(categorical.cat.categories))
+    sizes = np.array([sys.getsizeof(category) for category in categorical.cat.categories], dtype = np.int64)
+    return int(8 * len(codes) + counts @ sizes + np.count_nonzero(codes < 0) * sys.getsizeof(np.nan))
+
+
+def _is_text(values):
+    return pd.api.types.infer_dtype(values, skipna = True) in ("string", "empty")
+
+
+def _categorical(values, fixed):
+    """
+    stores text as a Categorical with the fixed categories first, so no value is ever lost
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        extras = sorted(set(values.cat.categories) - set(fixed))
+        return values.cat.set_categories(list(fixed) + extras)
+    codes, uniques = pd.factorize(values, use_na_sentinel = True)
+    extras = sorted(set(uniques) - set(fixed))
+    categories = pd.Index(list(fixed) + extras)
+    # Map each value's factorized code onto its position in the categories
+    remap = np.append(categories.get_indexer(uniques), -1)
+    return pd.Series(pd.Categorical.from_codes(remap[codes], categories = categories), index = values.index, name = values.name)
+
+
+def _small_integers(values):
+    low, high = (values.min(), values.max()) if len(values) else (0, 0)
+    for integer_type in [np.int8, np.int16, np.int32]:
+        if np.iinfo(integer_type).min <= low and high <= np.iinfo(integer_type).max:
+            return values.astype(integer_type)
+    return values
+
+
+def _single_precision(values):
+    """
+    returns the column as float32 when widening it back gives exactly the same numbers, else unchanged
+    """
+    original = values.to_numpy()
+    narrow = original.astype(np.float32)
+    widened = narrow.astype(np.float64)
+    if values.name in DECIMALS:
+        widened = np.round(widened, DECIMALS[values.name])
+    if np.array_equal(widened, original, equal_nan = True):
+        return pd.Series(narrow, index = values.index, name = values.name)
+    return values
+
+
+def compact(df):
+    """
+    returns a compact copy of a customer frame; its attrs record the bytes the original held
+    """
+    columns = {}
+    original_bytes = int(df.index.memory_usage(deep = True))
+    for column in df.columns:
+        values = df[column]
+        text = values.dtype == object and _is_text(values)
+        if column in CATEGORIES and (text or isinstance(values.dtype, pd.CategoricalDtype)):
+            compacted = _categorical(values, CATEGORIES[column])
+        elif text and values.nunique() <= CATEGORICAL_RATIO * len(values):
+            compacted = _categorical(values, [])
+        elif text:
+            # Arrow keeps all strings of a column in one buffer instead of one Python object each
+            compacted = values.astype(ARROW_STRING)
+        elif pd.api.types.is_integer_dtype(values.dtype) and values.dtype.itemsize > 1:
+            compacted = _small_integers(values)
+        elif values.dtype == np.float64:
+            compacted = _single_precision(values)
+        else:
+            compacted = values
+
+        # Strings turned into categories are counted from the categories, visiting every object is slow
+        if text and isinstance(compacted.dtype, pd.CategoricalDtype):
+            original_bytes += _object_bytes(compacted)
+        else:
+            original_bytes += int(values.memory_usage(index = False, deep = True))
+        columns[column] = compacted
+
+    result = pd.DataFrame(columns, index = df.index)
+    result.attrs["expanded_memory_bytes"] = original_bytes
+    return result
+
+
+def expand(df):
+    """
+    returns the frame with object text, missing values as NaN, int64 and float64 columns, as read by pandas
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = pd.Series(values.to_numpy(dtype = object, na_value = np.nan), index = values.index, name = column)
+        elif values.dtype == ARROW_STRING:
+            values = pd.Series(values.to_numpy(dtype = object, na_value = np.nan), index = values.index, name = column)
+        elif pd.api.types.is_integer_dtype(values.dtype) and values.dtype != np.int64:
+            values = values.astype(np.int64)
+        elif values.dtype == np.float32:
+            widened = values.to_numpy().astype(np.float64)
+            if column in DECIMALS:
+                widened = np.round(widened, DECIMALS[column])
+            values = pd.Series(widened, index = values.index, name = column)
+        columns[column] = values
+    return pd.DataFrame(columns, index = df.index)
+
+
+def memory_report(df):
+    """
+    returns (bytes before compacting, bytes now) of a frame made by compact()
+    """
+    return df.attrs.get("expanded_memory_bytes", memory_usage(df)), memory_usage(df)
+
+
+def format_bytes(size: int):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024 or unit == "GB":
+            return f"{size:,.1f} {unit}" if unit != "B" else f"{size:,} B"
+        size /= 1024
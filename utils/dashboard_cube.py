@@ -0,0 +1,95 @@
+import pandas as pd
+import numpy as np
+
+
+# Charges are binned on fixed-width edges anchored at 0, so cubes built from different rows line up
+BIN_WIDTHS = {"MonthlyCharges": 1.0, "TotalCharges": 100.0}
+
+# Dimensions every cell is keyed by, tenure is kept at its exact (integer) value
+DIMENSIONS = ["tenure", "TotalCharges_bin", "MonthlyCharges_bin", "Churn", "InternetService", "Contract"]
+MEASURES = ["count", "MonthlyCharges", "TotalCharges"]
+
+
+def charge_bins(values, column):
+    """
+    returns the fixed-width bin of each charge, -1 for missing values
+    """
+    bins = np.floor(np.asarray(values, dtype = np.float64) / BIN_WIDTHS[column])
+    return np.where(np.isnan(bins), -1, bins).astype(np.int64)
+
+
+class FilterCube:
+    """
+    pre-aggregated counts and charge sums of a churn dataset for the Analytical Dashboard
+
+    One cell per (tenure, TotalCharges bin, MonthlyCharges bin, Churn, InternetService,
+    Contract). Slider filters and the dashboard's metrics and charts are answered
+    from the cells, so their cost depends on the number of occupied cells rather
+    than the number of rows. Charge ranges are matched on whole bins.
+    """
+    def __init__(self, cells):
+        self.cells = cells
+
+    @classmethod
+    def from_frame(cls, df):
+        keys = pd.DataFrame({
+            "tenure": df["tenure"].to_numpy(),
+            "TotalCharges_bin": charge_bins(df["TotalCharges"], "TotalCharges"),
+            "MonthlyCharges_bin": charge_bins(df["MonthlyCharges"], "MonthlyCharges"),
+            "Churn": df["Churn"].to_numpy(),
+            "InternetService": df["InternetService"].to_numpy(),
+            "Contract": df["Contract"].to_numpy(),
+            "count": 1,
+            "MonthlyCharges": df["MonthlyCharges"].to_numpy(),
+            "TotalCharges": df["TotalCharges"].to_numpy(),
+        })
+        # Missing keys get cells of their own, the unfiltered totals still count them
+        cells = keys.groupby(DIMENSIONS, dropna = False, sort = False)[MEASURES].sum().reset_index()
+        return cls(cells)
+
+    def __len__(self):
+        return int(self.cells["count"].sum())
+
+    def tenure_max(self):
+        return int(self.cells["tenure"].max())
+
+    def charge_range(self, column):
+        """
+        returns the slider range for a charge column, from the lower edge of the first bin to the upper edge of the last
+        """
+        bins = self.cells.loc[self.cells[f"{column}_bin"] >= 0, f"{column}_bin"]
+        return float(bins.min() * BIN_WIDTHS[column]), float((bins.max() + 1) * BIN_WIDTHS[column])
+
+    def filter(self, tenure, total_charges, monthly_charges):
+        """
+        returns the cells inside the slider ranges, missing values never match a range
+        """
+        cells = self.cells
+        mask = (cells["tenure"] >= tenure[0]) & (cells["tenure"] <= tenure[1])
+        for column, (low, high) in [("TotalCharges", total_charges), ("MonthlyCharges", monthly_charges)]:
+            width = BIN_WIDTHS[column]
+            # Slider values sit on bin edges, the tolerance absorbs float rounding of the steps
+            lower_edge = cells[f"{column}_bin"] * width
+            mask &= (cells[f"{column}_bin"] >= 0) & (lower_edge >= low - width * 1e-6) & (lower_edge + width <= high + width * 1e-6)
+        return FilterCube(cells[mask])
+
+    def total(self, measure):
+        return float(self.cells[measure].sum())
+
+    def churn_count(self, churn):
+        return int(self.cells.loc[self.cells["Churn"] == churn, "count"].sum())
+
+    def churn_by_tenure(self):
+        """
+        share of each Churn value per tenure, same table as groupby("tenure")["Churn"].value_counts(normalize=True).unstack()
+        """
+        cells = self.cells.dropna(subset = ["tenure", "Churn"])
+        counts = cells.groupby(["tenure", "Churn"])["count"].sum().unstack(fill_value = 0)
+        return counts.div(counts.sum(axis = 1), axis = 0)
+
+    def churned_by(self, column):
+        """
+        number of churned customers per value of column
+        """
+        churned = self.cells[self.cells["Churn"] == "Yes"]
+        return churned.groupby(column)["count"].sum()
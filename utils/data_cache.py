@@ -0,0 +1,144 @@
+"""
+Parquet sidecar for the inbuilt Telco dataset
+
+The cleaned frame is written next to the Excel file the first time it is loaded
+and read back with a columnar read afterwards, by every page and every server
+process. The sidecar records the source file's mtime, size and sha256 and is
+rebuilt when the source changes.
+
+Usage:
+    python -m utils.data_cache    # rebuild the sidecar and report cold-start load times
+"""
+import pyarrow.parquet as pq
+import pyarrow as pa
+import pandas as pd
+import hashlib
+import time
+import os
+
+from utils import compact_frame, scoring
+
+
+INBUILT_DATA = "./data/Telco-churn-last-2000.xlsx"
+
+# Timing of the last load in this process, shown on the Data page
+last_load = {}
+
+# Compact frames of the inbuilt dataset held by this process, with the source stamp they were built from
+_compact = {}
+
+
+def sidecar_path(source: str):
+    return os.path.splitext(source)[0] + ".parquet"
+
+
+def source_hash(path: str):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_source(source: str = INBUILT_DATA):
+    """
+    parses the Excel file and applies the SeniorCitizen mapping and numeric coercion
+    """
+    return scoring.coerce_columns(pd.read_excel(source), stage = "data.coerce")
+
+
+def _stamp(source):
+    stat = os.stat(source)
+    return {"source_mtime_ns": str(stat.st_mtime_ns), "source_size": str(stat.st_size)}
+
+
+def _sidecar_stamp(sidecar):
+    try:
+        metadata = pq.read_schema(sidecar).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return {key.decode(): value.decode() for key, value in metadata.items() if key.startswith(b"source_")}
+
+
+def write_sidecar(df, source: str, stamp: dict):
+    """
+    writes the cleaned frame with the source stamp in its schema metadata, atomically
+
+    Raises ValueError naming the columns that would not read back as they are, no sidecar is written then.
+    """
+    sidecar = sidecar_path(source)
+    table = pa.Table.from_pandas(df, preserve_index = False)
+    # Parquet stores missing strings as nulls, which come back as None rather than NaN
+    round_trip = table.to_pandas()
+    if not round_trip.equals(df):
+        changed = [column for column in df.columns if column not in round_trip.columns or not round_trip[column].equals(df[column])]
+        raise ValueError(f"Sidecar not written, {', '.join(map(str, changed)) or 'the frame'} would not read back unchanged")
+    table = table.replace_schema_metadata({**table.schema.metadata, **{key.encode(): value.encode() for key, value in stamp.items()}})
+    # Write to a temporary file and rename so other processes never read a partial sidecar
+    temporary = f"{sidecar}.{os.getpid()}.tmp"
+    pq.write_table(table, temporary)
+    os.replace(temporary, sidecar)
+
+
+def load_inbuilt_data(source: str = INBUILT_DATA):
+    """
+    returns the cleaned inbuilt dataset, from the sidecar when it matches the source file
+    """
+    start = time.perf_counter()
+    sidecar = sidecar_path(source)
+    stamp = _stamp(source)
+    cached = _sidecar_stamp(sidecar)
+    sidecar_error = None
+
+    if cached is not None and cached.get("source_mtime_ns") == stamp["source_mtime_ns"] and cached.get("source_size") == stamp["source_size"]:
+        df, origin = pq.read_table(sidecar).to_pandas(), "sidecar"
+    else:
+        # A touched but unchanged file keeps its sidecar, only the stamp is refreshed
+        stamp["source_sha256"] = source_hash(source)
+        if cached is not None and cached.get("source_sha256") == stamp["source_sha256"]:
+            df, origin = pq.read_table(sidecar).to_pandas(), "sidecar"
+        else:
+            df, origin = read_source(source), "excel"
+        try:
+            write_sidecar(df, source, stamp)
+        except (OSError, ValueError) as error:
+            # A read-only data directory or a frame parquet cannot hold still works, just without the sidecar
+            sidecar_error = str(error)
+
+    last_load.update(source = source, origin = origin, seconds = time.perf_counter() - start, rows = len(df), sidecar_error = sidecar_error)
+    return df
+
+
+def load_compact_inbuilt_data(source: str = INBUILT_DATA):
+    """
+    returns the inbuilt dataset as a compact frame, shared by every session of this process
+
+    The frame is rebuilt when the source file changes and must not be modified in place.
+    """
+    start = time.perf_counter()
+    stamp = _stamp(source)
+    cached = _compact.get(source)
+    if cached is not None and cached[0] == stamp:
+        last_load.update(source = source, origin = "memory", seconds = time.perf_counter() - start, rows = len(cached[1]))
+        return cached[1]
+
+    df = compact_frame.compact(load_inbuilt_data(source))
+    _compact[source] = (stamp, df)
+    last_load.update(seconds = time.perf_counter() - start)
+    return df
+
+
+def main():
+    sidecar = sidecar_path(INBUILT_DATA)
+    if os.path.exists(sidecar):
+        os.remove(sidecar)
+    load_inbuilt_data()
+    print(f"Cold start without sidecar: {last_load['seconds'] * 1000:.1f} ms from {last_load['origin']}")
+    if last_load["sidecar_error"]:
+        print(last_load["sidecar_error"])
+    load_inbuilt_data()
+    print(f"Cold start with sidecar:    {last_load['seconds'] * 1000:.1f} ms from {last_load['origin']} ({sidecar})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Per-customer churn explanations for whole bulk files
+
+Each prediction is split into one contribution per input column, in log-odds
+of churn: the model's score for a customer about whom nothing is known plus a
+customer's contributions is that customer's score. Positive contributions push
+towards churn, negative ones away from it.
+
+    gradient boost       tree path attribution from the compiled tree engine: every
+                         split on a row's path adds the change of the tree's expected
+                         value to the input column it splits on
+    logistic regression  coefficient x transformed feature, the one-hot features of
+                         a column summed back into it
+
+Both run on the compiled preprocessor for blocks of rows at a time, so explaining
+a file costs about as much as scoring it.
+
+Usage:
+    explainer = registry.get_explainer("gradient_boost")
+    explainer.top_drivers(df)          # Driver_1, Driver_1_effect, ... per row
+    explainer.customer_drivers(df)     # the first row's drivers with their values
+"""
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+import pandas as pd
+import numpy as np
+
+from utils import tree_engine
+
+
+# Drivers kept per customer, and rows explained at a time
+TOP_K = 3
+DEFAULT_BLOCK_ROWS = 65_536
+# Contributions are stored in log-odds rounded to this many places
+EFFECT_DECIMALS = 4
+
+
+def driver_columns(k: int = TOP_K):
+    """
+    returns the names of the driver columns of a bulk history, each driver followed by its effect
+    """
+    return [column for rank in range(1, k + 1) for column in (f"Driver_{rank}", f"Driver_{rank}_effect")]
+
+
+class Explainer:
+    """
+    contributions and top drivers of a compiled model; subclasses set `input_columns`, `bias` and `_contributions`
+    """
+    block_rows = DEFAULT_BLOCK_ROWS
+
+    def contributions(self, df):
+        """
+        returns the (n, input columns) log-odds contributions of every row as a frame
+        """
+        values = np.empty((len(df), len(self.input_columns)))
+        for start in range(0, len(df), self.block_rows):
+            values[start:start + self.block_rows] = self._contributions(df.iloc[start:start + self.block_rows])
+        return pd.DataFrame(values, columns = self.input_columns, index = df.index)
+
+    def top_drivers(self, df, k: int = TOP_K):
+        """
+        returns the k input columns with the largest contribution of every row, largest first, with their signed effects
+        """
+        k = min(k, len(self.input_columns))
+        names = np.empty((len(df), k), dtype = object)
+        effects = np.empty((len(df), k))
+        columns = np.asarray(self.input_columns, dtype = object)
+        # Blocks bound the (rows x columns) arrays, only the k drivers of each row are kept
+        for start in range(0, len(df), self.block_rows):
+            block = self._contributions(df.iloc[start:start + self.block_rows])
+            order = np.argsort(-np.abs(block), axis = 1, kind = "stable")[:, :k]
+            names[start:start + len(block)] = columns[order]
+            effects[start:start + len(block)] = np.take_along_axis(block, order, axis = 1)
+        drivers = {}
+        for rank in range(k):
+            drivers[f"Driver_{rank + 1}"] = names[:, rank]
+            drivers[f"Driver_{rank + 1}_effect"] = np.round(effects[:, rank], EFFECT_DECIMALS)
+        return pd.DataFrame(drivers, index = df.index)
+
+    def customer_drivers(self, df, k: int = TOP_K):
+        """
+        returns the first row's k largest contributions as Feature, Value and Effect rows
+        """
+        contributions = self._contributions(df.iloc[:1])[0]
+        order = np.argsort(-np.abs(contributions), kind = "stable")[:k]
+        return pd.DataFrame({"Feature": [self.input_columns[i] for i in order],
+                             "Value": [df[self.input_columns[i]].iloc[0] for i in order],
+                             "Effect": np.round(contributions[order], EFFECT_DECIMALS)})
+
+
+class TreePathExplainer(Explainer):
+    """
+    tree path attribution of a gradient boosting pipeline, through its vectorized tree engine
+    """
+    def __init__(self, pipeline):
+        self.engine = tree_engine.compile_pipeline(pipeline)
+        self.input_columns = self.engine.preprocessor.input_columns
+        self.bias = self.engine.expected_raw
+
+    def _contributions(self, df):
+        return self.engine.raw_contributions(self.engine.transform(df))
+
+
+class LinearExplainer(Explainer):
+    """
+    coefficient x transformed feature of a logistic regression pipeline, summed per input column
+    """
+    def __init__(self, pipeline):
+        self.preprocessor = tree_engine.CompiledPreprocessor(pipeline.named_steps["preprocessor"])
+        classifier = pipeline.named_steps["classifier"]
+        if classifier.coef_.shape[0] != 1:
+            raise ValueError("Only binary logistic regressions can be explained")
+        self.input_columns = self.preprocessor.input_columns
+        self.bias = float(classifier.intercept_[0]) if classifier.fit_intercept else 0.0
+        # Coefficients placed in the row of their input column, so one product sums the one-hot features too
+        self.weights = np.zeros((self.preprocessor.n_features, len(self.input_columns)))
+        self.weights[np.arange(self.preprocessor.n_features), self.preprocessor.feature_input] = classifier.coef_[0]
+
+    def _contributions(self, df):
+        return self.preprocessor.transform(df) @ self.weights
+
+
+def compile_explainer(pipeline):
+    """
+    returns the explainer of a fitted churn pipeline, raising ValueError for other classifiers
+    """
+    classifier = pipeline.named_steps["classifier"]
+    if isinstance(classifier, GradientBoostingClassifier):
+        return TreePathExplainer(pipeline)
+    if isinstance(classifier, LogisticRegression):
+        return LinearExplainer(pipeline)
+    raise ValueError(f"No explainer for {type(classifier).__name__}")
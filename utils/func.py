@@ -1,23 +1,26 @@
-import streamlit as st
-import pandas as pd
-import json
-from streamlit_lottie import st_lottie
-
-# Create function to load Telco-churn-last-2000
-@st.cache_data(persist = True)
-def load_data():
-    """
-    loads Telco-churn-last-2000 to the script
-    """
-    df = pd.read_excel("./data/Telco-churn-last-2000.xlsx")
-    df["SeniorCitizen"] = df["SeniorCitizen"].map({1: "Yes", 0: "No"})
-    df["tenure"] = pd.to_numeric(df["tenure"], errors = "coerce")
-    df["MonthlyCharges"] = pd.to_numeric(df["MonthlyCharges"], errors = "coerce")
-    df["TotalCharges"] = pd.to_numeric(df["TotalCharges"], errors = "coerce")
-    return df
-
-
-# Function to load lottie files
-def load_lottie(filepath: str):
-    with open(filepath, "r") as f:
-        return json.load(f)
+from streamlit_lottie import st_lottie
+
+from utils import assets, data_cache, stage_timing
+
+# Create function to load Telco-churn-last-2000
+def load_data():
+    """
+    loads Telco-churn-last-2000 as a compact frame, from its parquet sidecar after the first load
+
+    Pass the frame through compact_frame.expand before scoring it.
+    """
+    with stage_timing.timed("load.inbuilt_data") as timer:
+        df = data_cache.load_compact_inbuilt_data()
+        timer.rows = len(df)
+    return df
+
+
+# Function to load lottie files, minified and parsed once per server process
+def load_lottie(filepath: str):
+    with stage_timing.timed("load.lottie"):
+        return assets.load(filepath)["animation"]
+
+
+# Stable key of a lottie animation, so the browser keeps it across reruns instead of mounting it again
+def lottie_key(filepath: str):
+    return assets.load(filepath)["key"]
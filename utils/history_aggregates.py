@@ -0,0 +1,117 @@
+import pandas as pd
+import numpy as np
+import os
+
+from utils import dashboard_cube, scoring
+
+
+# Prediction history kept as running aggregates, one set of cells per source
+SINGLE = "single"
+INBUILT = "inbuilt"
+UPLOADED = "uploaded"
+SOURCES = {SINGLE: "Single predictions", INBUILT: "Bulk predictions (test data)", UPLOADED: "Bulk predictions (uploaded data)"}
+BULK_HISTORY_FILES = {INBUILT: scoring.INBUILT_HISTORY_FILE, UPLOADED: scoring.UPLOADED_HISTORY_FILE}
+
+# SQLite treats NULLs as distinct in a unique key, missing keys are stored as these instead
+MISSING_NUMBER = -1
+MISSING_TEXT = ""
+TEXT_DIMENSIONS = ["Churn", "InternetService", "Contract"]
+
+
+def create_table(connection):
+    dimension_sql = ", ".join(f'"{dimension}" {"TEXT" if dimension in TEXT_DIMENSIONS else "REAL"} NOT NULL'
+                              for dimension in dashboard_cube.DIMENSIONS)
+    key_sql = ", ".join(f'"{dimension}"' for dimension in dashboard_cube.DIMENSIONS)
+    connection.execute(f'CREATE TABLE IF NOT EXISTS dashboard_cells (source TEXT NOT NULL, {dimension_sql}, '
+                       f'"count" INTEGER NOT NULL, "MonthlyCharges" REAL NOT NULL, "TotalCharges" REAL NOT NULL, '
+                       f'UNIQUE (source, {key_sql}))')
+
+
+def add(connection, history_df, source: str):
+    """
+    adds the rows of a history frame to the running aggregates of a source
+
+    The rows are first grouped into cube cells, then each cell is added onto the
+    stored one, so the cost grows with the new rows only.
+    """
+    if history_df.empty:
+        return
+    # Single predictions name the prediction Customer_Churn_status, bulk ones Churn
+    frame = history_df.rename(columns = {"Customer_Churn_status": "Churn"})
+    frame = frame.assign(tenure = pd.to_numeric(frame["tenure"], errors = "coerce"),
+                         MonthlyCharges = pd.to_numeric(frame["MonthlyCharges"], errors = "coerce"),
+                         TotalCharges = pd.to_numeric(frame["TotalCharges"], errors = "coerce"))
+    cells = dashboard_cube.FilterCube.from_frame(frame).cells
+    cells["tenure"] = cells["tenure"].fillna(MISSING_NUMBER)
+    cells[TEXT_DIMENSIONS] = cells[TEXT_DIMENSIONS].fillna(MISSING_TEXT).astype(str)
+
+    columns = dashboard_cube.DIMENSIONS + dashboard_cube.MEASURES
+    column_sql = ", ".join(f'"{column}"' for column in columns)
+    key_sql = ", ".join(f'"{dimension}"' for dimension in dashboard_cube.DIMENSIONS)
+    update_sql = ", ".join(f'"{measure}" = "{measure}" + excluded."{measure}"' for measure in dashboard_cube.MEASURES)
+    rows = ((source,) + tuple(row) for row in cells[columns].astype(object).itertuples(index = False, name = None))
+    connection.executemany(f"INSERT INTO dashboard_cells (source, {column_sql}) VALUES (?, {', '.join('?' for _ in columns)}) "
+                           f"ON CONFLICT (source, {key_sql}) DO UPDATE SET {update_sql}", rows)
+
+
+def clear(connection, source: str):
+    connection.execute("DELETE FROM dashboard_cells WHERE source = ?", (source,))
+
+
+def _set_meta(connection, key, value):
+    connection.execute("INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, value))
+
+
+def _get_meta(connection, key):
+    row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def record_bulk_file(connection, bulk_history_df, source: str, history_file: str, append: bool):
+    """
+    mirrors a bulk history write: an overwrite replaces the source's aggregates, an append adds to them
+    """
+    if not append:
+        clear(connection, source)
+    add(connection, bulk_history_df, source)
+    # Remember which version of the file the aggregates describe
+    _set_meta(connection, f"dashboard_mtime:{source}", str(os.stat(history_file).st_mtime_ns))
+
+
+def sync(connection):
+    """
+    builds aggregates that do not exist yet, and rebuilds a bulk source whose file was changed outside the app
+    """
+    if _get_meta(connection, "dashboard_built:single") is None:
+        clear(connection, SINGLE)
+        query = 'SELECT tenure, MonthlyCharges, TotalCharges, InternetService, Contract, Customer_Churn_status FROM history'
+        for chunk in pd.read_sql_query(query, connection, chunksize = 50_000):
+            add(connection, chunk, SINGLE)
+        _set_meta(connection, "dashboard_built:single", "1")
+
+    for source, history_file in BULK_HISTORY_FILES.items():
+        mtime = str(os.stat(history_file).st_mtime_ns) if os.path.exists(history_file) else None
+        if mtime == _get_meta(connection, f"dashboard_mtime:{source}"):
+            continue
+        clear(connection, source)
+        if mtime is not None:
+            for chunk in pd.read_csv(history_file, chunksize = 50_000):
+                add(connection, chunk, source)
+            _set_meta(connection, f"dashboard_mtime:{source}", mtime)
+        else:
+            connection.execute("DELETE FROM meta WHERE key = ?", (f"dashboard_mtime:{source}",))
+
+
+def read_cube(connection, sources = None):
+    """
+    returns the summed cells of the chosen sources as a FilterCube
+    """
+    sources = list(SOURCES) if sources is None else list(sources)
+    key_sql = ", ".join(f'"{dimension}"' for dimension in dashboard_cube.DIMENSIONS)
+    measure_sql = ", ".join(f'SUM("{measure}") AS "{measure}"' for measure in dashboard_cube.MEASURES)
+    cells = pd.read_sql_query(f"SELECT {key_sql}, {measure_sql} FROM dashboard_cells "
+                              f"WHERE source IN ({', '.join('?' for _ in sources)}) GROUP BY {key_sql}", connection, params = sources)
+    cells["tenure"] = cells["tenure"].replace(MISSING_NUMBER, np.nan)
+    cells[TEXT_DIMENSIONS] = cells[TEXT_DIMENSIONS].replace(MISSING_TEXT, np.nan)
+    cells[["TotalCharges_bin", "MonthlyCharges_bin"]] = cells[["TotalCharges_bin", "MonthlyCharges_bin"]].astype(np.int64)
+    return dashboard_cube.FilterCube(cells)
@@ -0,0 +1,196 @@
+import pandas as pd
+import threading
+import sqlite3
+import os
+
+from utils import history_aggregates, scoring
+
+
+# Indexed store for single predictions, replaces appending to history.csv
+HISTORY_DB = "./data/history.db"
+LEGACY_HISTORY_CSV = "./data/history.csv"
+
+# Columns in the order history.csv has always used
+columns = ["Prediction_Date", "Prediction_Time"] + scoring.expected_features + ["Model_used", "Customer_Churn_status", "Probability"]
+column_types = {"tenure": "INTEGER", "MonthlyCharges": "REAL", "TotalCharges": "REAL", "Probability": "REAL"}
+
+
+# Stores set up by this process, by path, with the file they were set up in
+_initialized = {}
+_initialized_lock = threading.Lock()
+
+
+def _file_key(db_path: str):
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def initialize(connection, db_path: str = HISTORY_DB):
+    """
+    creates the table and indexes and imports history.csv, once per store
+    """
+    # WAL is a property of the database file, it stays on for later connections
+    connection.execute("PRAGMA journal_mode = WAL")
+    column_sql = ", ".join(f'"{column}" {column_types.get(column, "TEXT")}' for column in columns)
+    with connection:
+        connection.execute(f"CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY AUTOINCREMENT, {column_sql})")
+        # Each filter index ends with id so filtered pages are read newest-first straight from the index
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_history_date ON history (Prediction_Date, id)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_history_model ON history (Model_used, id)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_history_churn ON history (Customer_Churn_status, id)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_history_model_churn ON history (Model_used, Customer_Churn_status, id)")
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        history_aggregates.create_table(connection)
+
+    if db_path == HISTORY_DB:
+        import_legacy_csv(connection)
+
+
+def connect(db_path: str = HISTORY_DB):
+    """
+    opens the store, setting it up the first time this process opens it
+
+    Reads and writes after that only open the connection, unless the file at db_path
+    was replaced by another one since.
+    """
+    connection = sqlite3.connect(db_path, timeout = 30)
+    with _initialized_lock:
+        key = _file_key(db_path)
+        if key is None or _initialized.get(db_path) != key:
+            try:
+                initialize(connection, db_path)
+            except Exception:
+                connection.close()
+                raise
+            _initialized[db_path] = _file_key(db_path)
+    return connection
+
+
+def import_legacy_csv(connection, csv_path: str = LEGACY_HISTORY_CSV):
+    """
+    copies the rows of the old history.csv into the store once
+    """
+    if connection.execute("SELECT 1 FROM meta WHERE key = 'legacy_csv_imported'").fetchone():
+        return
+    with connection:
+        if os.path.exists(csv_path):
+            for chunk in pd.read_csv(csv_path, chunksize = 50_000):
+                insert(connection, chunk)
+        connection.execute("INSERT INTO meta (key, value) VALUES ('legacy_csv_imported', '1')")
+
+
+def insert(connection, history_df):
+    rows = history_df.reindex(columns = columns)
+    # Missing values are stored as NULL
+    rows = rows.astype(object).where(rows.notna(), None)
+    placeholders = ", ".join("?" for _ in columns)
+    column_sql = ", ".join(f'"{column}"' for column in columns)
+    connection.executemany(f"INSERT INTO history ({column_sql}) VALUES ({placeholders})", rows.itertuples(index = False, name = None))
+
+
+def append(history_df, db_path: str = HISTORY_DB):
+    """
+    appends single prediction rows to the store and to the dashboard aggregates
+    """
+    connection = connect(db_path)
+    try:
+        with connection:
+            insert(connection, history_df)
+            history_aggregates.add(connection, history_df, history_aggregates.SINGLE)
+    finally:
+        connection.close()
+
+
+def record_bulk_history(bulk_history_df, history_file: str, append: bool = False, db_path: str = HISTORY_DB):
+    """
+    updates the dashboard aggregates after a bulk history file was written or appended to
+    """
+    sources = {file: source for source, file in history_aggregates.BULK_HISTORY_FILES.items()}
+    if history_file not in sources:
+        return
+    connection = connect(db_path)
+    try:
+        with connection:
+            history_aggregates.record_bulk_file(connection, bulk_history_df, sources[history_file], history_file, append)
+    finally:
+        connection.close()
+
+
+def dashboard_cube(sources = None, db_path: str = HISTORY_DB):
+    """
+    returns the running dashboard aggregates of the chosen history sources, all of them by default
+    """
+    connection = connect(db_path)
+    try:
+        with connection:
+            history_aggregates.sync(connection)
+        return history_aggregates.read_cube(connection, sources)
+    finally:
+        connection.close()
+
+
+def _where(date_from = None, date_to = None, model = None, churn = None, before_id = None, after_id = None):
+    clauses, params = [], []
+    if model is not None:
+        clauses.append("Model_used = ?")
+        params.append(model)
+    if churn is not None:
+        clauses.append("Customer_Churn_status = ?")
+        params.append(churn)
+    # Dates are filtered on the column itself, through idx_history_date, since rows
+    # are not always stored in date order (history.csv imports, clock changes)
+    if date_from is not None:
+        clauses.append("Prediction_Date >= ?")
+        params.append(str(date_from))
+    if date_to is not None:
+        clauses.append("Prediction_Date <= ?")
+        params.append(str(date_to))
+    # Ids are only used to page through the rows; pandas returns them as numpy integers, which sqlite3 cannot bind
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(int(before_id))
+    if after_id is not None:
+        clauses.append("id > ?")
+        params.append(int(after_id))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def read_page(page_size: int = 50, before_id = None, after_id = None, date_from = None, date_to = None,
+              model = None, churn = None, db_path: str = HISTORY_DB):
+    """
+    returns one page of history, newest first
+
+    Pages are addressed by id (keyset pagination): pass the last id of a page as
+    `before_id` for the next older page, or the first id as `after_id` for the newer one.
+    Without a date filter the cost depends on the page size, not on how many predictions are
+    stored; with one it depends on the predictions of the chosen dates.
+    """
+    column_sql = ", ".join(f'"{column}"' for column in columns)
+    # Newer pages are read upwards from after_id and flipped back to newest-first
+    order = "ASC" if after_id is not None else "DESC"
+    connection = connect(db_path)
+    try:
+        where, params = _where(date_from, date_to, model, churn, before_id, after_id)
+        page = pd.read_sql_query(f"SELECT id, {column_sql} FROM history{where} ORDER BY id {order} LIMIT ?",
+                                 connection, params = params + [int(page_size)])
+    finally:
+        connection.close()
+    if after_id is not None:
+        page = page.iloc[::-1].reset_index(drop = True)
+    return page.set_index("id")
+
+
+def has_rows(before_id = None, after_id = None, date_from = None, date_to = None, model = None, churn = None,
+             db_path: str = HISTORY_DB):
+    """
+    checks through the index whether any row exists past a page boundary
+    """
+    connection = connect(db_path)
+    try:
+        where, params = _where(date_from, date_to, model, churn, before_id, after_id)
+        return connection.execute(f"SELECT 1 FROM history{where} LIMIT 1", params).fetchone() is not None
+    finally:
+        connection.close()
@@ -0,0 +1,196 @@
+"""
+Background writer for the single prediction history
+
+Predictions hand their history rows to a bounded queue and return straight away.
+One writer thread per server process gathers the queued rows into batches and
+writes each batch in a single transaction, holding an exclusive lock on
+`history.db.lock` so writers of other server processes never interleave with it.
+A batch is written once it holds MAX_BATCH_ROWS rows or its oldest row has
+waited FLUSH_INTERVAL seconds, whichever comes first.
+
+Usage:
+    history_writer.submit(history_df)    # from the prediction path
+    history_writer.flush()               # before reading, to see every submitted row
+"""
+import pandas as pd
+import contextlib
+import threading
+import sqlite3
+import atexit
+import queue
+import time
+
+from utils import history_store, stage_timing
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no fcntl, msvcrt locks a byte range of the lock file instead
+    fcntl = None
+    import msvcrt
+
+
+# Predictions waiting to be written; new ones wait for room only when the writer is this far behind
+MAX_QUEUED = 10_000
+MAX_BATCH_ROWS = 500
+FLUSH_INTERVAL = 0.5
+
+# A batch that cannot be written is retried this many times, RETRY_INTERVAL apart, before it is dropped
+MAX_ATTEMPTS = 5
+RETRY_INTERVAL = 1.0
+
+
+@contextlib.contextmanager
+def file_lock(path: str, shared: bool = False):
+    """
+    holds an exclusive lock on `path` across processes, or one shared with other shared holders, waiting for it as long as it takes
+
+    msvcrt has no shared locks, on Windows every lock is exclusive.
+    """
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after 10 seconds, keep waiting
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class _FlushMarker:
+    """
+    queued by flush, set by the writer thread once the rows queued before it are handled
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        # The write error of those rows, None when all of them were written
+        self.error = None
+
+
+class HistoryWriter:
+    """
+    writes history rows submitted from any session in batches on a background thread
+    """
+    def __init__(self, db_path: str = history_store.HISTORY_DB, max_queued: int = MAX_QUEUED,
+                 max_batch_rows: int = MAX_BATCH_ROWS, flush_interval: float = FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.lock_path = db_path + ".lock"
+        self.max_batch_rows = max_batch_rows
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize = max_queued)
+        self.thread = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def _start(self):
+        with self._start_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target = self._run, name = "history-writer", daemon = True)
+                self.thread.start()
+
+    def submit(self, history_df):
+        """
+        queues the rows of a prediction, waiting only while the queue is full
+        """
+        self._start()
+        self.queue.put(history_df)
+
+    def flush(self, timeout: float = 30.0):
+        """
+        waits until every row submitted before the call is written
+
+        Returns False if that took longer than `timeout` or some of those rows could not be written, see `last_error`.
+        """
+        if self.thread is None:
+            return True
+        marker = _FlushMarker()
+        try:
+            self.queue.put(marker, timeout = timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout) and marker.error is None
+
+    def _write(self, batch):
+        rows = pd.concat(batch, ignore_index = True)
+        with stage_timing.timed("history.write_batch", rows = len(rows)):
+            with file_lock(self.lock_path):
+                history_store.append(rows, self.db_path)
+        self.written += len(rows)
+
+    def _run(self):
+        batch, rows, attempts = [], 0, 0
+        deadline = None
+        # Error of a batch dropped since the last flush marker, reported to that marker
+        dropped_error = None
+        while True:
+            timeout = None if not batch else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout = timeout)
+            except queue.Empty:
+                item = None
+
+            # A flush marker writes what is waiting now, even while a failing batch is being retried
+            flushing = isinstance(item, _FlushMarker)
+            if item is not None and not flushing:
+                batch.append(item)
+                rows += len(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            write_error = None
+            if batch and (flushing or rows >= self.max_batch_rows or time.monotonic() >= deadline):
+                try:
+                    self._write(batch)
+                    batch, rows, attempts, deadline = [], 0, 0, None
+                except (sqlite3.Error, OSError) as error:
+                    self.last_error = write_error = error
+                    attempts += 1
+                    if attempts >= MAX_ATTEMPTS:
+                        self.dropped += rows
+                        dropped_error = error
+                        batch, rows, attempts, deadline = [], 0, 0, None
+                    else:
+                        deadline = time.monotonic() + RETRY_INTERVAL
+            if flushing:
+                # A failed batch keeps being retried, but the flush waiting for it has failed
+                item.error = write_error or dropped_error
+                dropped_error = None
+                item.done.set()
+
+
+# One writer per server process, shared by every session
+_writer = HistoryWriter()
+
+
+def submit(history_df):
+    _writer.submit(history_df)
+
+
+def flush(timeout: float = 30.0):
+    return _writer.flush(timeout)
+
+
+def stats():
+    """
+    returns rows written, rows dropped after failed retries, rows waiting and the last write error
+    """
+    return {"written": _writer.written, "dropped": _writer.dropped, "queued": _writer.queue.qsize(),
+            "last_error": None if _writer.last_error is None else str(_writer.last_error)}
+
+
+# Rows still queued when the server stops are written before it exits
+atexit.register(flush, 10.0)
@@ -0,0 +1,183 @@
+"""
+Incremental bulk scoring
+
+Each bulk run stores, per customerID, a fingerprint of the customer's feature
+values and the probabilities they were given, next to the history file of the
+source. The next run with the same model only scores customers that are new or
+whose features changed and reuses the stored probabilities for the rest, so
+its output is the same as scoring every row again.
+"""
+import pyarrow.parquet as pq
+import pyarrow as pa
+import pandas as pd
+import numpy as np
+import uuid
+import os
+
+from utils import scoring, stage_timing
+
+
+def cache_path_for(history_file: str):
+    return os.path.splitext(history_file)[0] + ".scores.parquet"
+
+
+def fingerprints(df):
+    """
+    returns a 64-bit hash of the feature values of every row, whatever the other columns
+    """
+    return pd.util.hash_pandas_object(df[scoring.expected_features], index = False).to_numpy()
+
+
+def cache_version(cache_path: str):
+    """
+    returns the model version the stored scores were made with, or None when there are none
+    """
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return metadata.get(b"model_version", b"").decode()
+
+
+def customer_keys(customer_ids):
+    """
+    returns a 64-bit hash of every customerID
+
+    Two customers sharing a hash would only reuse each other's scores when their fingerprints match as well.
+    """
+    return pd.util.hash_array(np.asarray(customer_ids, dtype = object))
+
+
+def read_scores(cache_path: str):
+    """
+    returns the stored customer keys, sorted, with the fingerprint and probabilities of each
+
+    The file is read batch by batch into four arrays of 8 bytes per customer. A customer stored
+    twice keeps the last row, as in the run that stored it.
+    """
+    keys, fingerprint, p0, p1 = [], [], [], []
+    for batch in pq.ParquetFile(cache_path).iter_batches(columns = ["customerID", "fingerprint", "p0", "p1"]):
+        keys.append(customer_keys(batch.column("customerID").to_numpy(zero_copy_only = False)))
+        fingerprint.append(batch.column("fingerprint").to_numpy())
+        p0.append(batch.column("p0").to_numpy())
+        p1.append(batch.column("p1").to_numpy())
+    if not keys:
+        return {"key": np.empty(0, np.uint64), "fingerprint": np.empty(0, np.uint64), "p0": np.empty(0), "p1": np.empty(0)}
+
+    # A stable sort keeps the rows of a customer in file order, the last of them is kept
+    keys = np.concatenate(keys)
+    order = np.argsort(keys, kind = "stable")
+    keys = keys[order]
+    last = np.append(keys[1:] != keys[:-1], True)
+    order = order[last]
+    return {"key": keys[last], "fingerprint": np.concatenate(fingerprint)[order],
+            "p0": np.concatenate(p0)[order], "p1": np.concatenate(p1)[order]}
+
+
+def lookup(stored, customer_ids):
+    """
+    returns the position of every customer in the stored scores, -1 for the ones not stored
+    """
+    keys = customer_keys(customer_ids)
+    if len(stored["key"]) == 0:
+        return np.full(len(keys), -1)
+    positions = np.minimum(np.searchsorted(stored["key"], keys), len(stored["key"]) - 1)
+    return np.where(stored["key"][positions] == keys, positions, -1)
+
+
+class IncrementalScorer:
+    """
+    scores the chunks of one bulk run, reusing the previous run's probabilities of unchanged customers
+
+    `score` takes a frame and returns the predictions and probability scores, like scoring.bulk_prediction.
+    The stored scores are read once, on the first chunk, into sorted arrays that every chunk looks its
+    customers up in, and the scores of this run are written to a temporary file chunk by chunk, so memory
+    depends on the number of stored customers and the chunk size, not on the uploaded file.
+    Call save() once the run is done so the next run can reuse this one, or discard() when it failed.
+    """
+    def __init__(self, score, threshold, encoder, history_file: str, model_version: str):
+        self.score = score
+        self.threshold = threshold
+        self.encoder = encoder
+        self.cache_path = cache_path_for(history_file)
+        self.model_version = model_version
+        self.has_previous = cache_version(self.cache_path) == model_version
+        # Sessions of one process may run at the same time, each writes its own file
+        self.temporary = f"{self.cache_path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+        self.stored = None
+        self.writer = None
+        self.failed = False
+        self.reused = 0
+        self.scored = 0
+
+    def _write(self, df, fingerprint, prob_score):
+        table = pa.table({"customerID": pa.array(df["customerID"].astype(str).to_numpy(dtype = object), pa.string()),
+                          "fingerprint": pa.array(fingerprint, pa.uint64()),
+                          "p0": prob_score[:, 0], "p1": prob_score[:, 1]})
+        if self.writer is None:
+            schema = table.schema.with_metadata({b"model_version": self.model_version.encode()})
+            self.writer = pq.ParquetWriter(self.temporary, schema)
+        self.writer.write_table(table)
+
+    def __call__(self, df):
+        with stage_timing.timed("bulk.fingerprint", rows = len(df)):
+            fingerprint = fingerprints(df)
+            reuse = np.zeros(len(df), dtype = bool)
+            if self.has_previous:
+                if self.stored is None:
+                    self.stored = read_scores(self.cache_path)
+                positions = lookup(self.stored, df["customerID"].astype(str).to_numpy(dtype = object))
+                found = positions >= 0
+                reuse[found] = self.stored["fingerprint"][positions[found]] == fingerprint[found]
+
+        prob_score = np.empty((len(df), 2), dtype = np.float64)
+        if reuse.any():
+            prob_score[reuse, 0] = self.stored["p0"][positions[reuse]]
+            prob_score[reuse, 1] = self.stored["p1"][positions[reuse]]
+        if not reuse.all():
+            _, prob_score[~reuse] = self.score(df[~reuse])
+
+        # Labels come from the probabilities exactly as in scoring.bulk_prediction
+        with stage_timing.timed("bulk.inverse_transform", rows = len(df)):
+            bulk_prediction = self.encoder.inverse_transform((prob_score[:, 1] >= self.threshold).astype(int))
+
+        self.reused += int(reuse.sum())
+        self.scored += int((~reuse).sum())
+        if not self.failed:
+            try:
+                self._write(df, fingerprint, prob_score)
+            except OSError:
+                # Without a writable data directory the next run simply scores every row
+                self.failed = True
+                self.discard()
+        return bulk_prediction, prob_score
+
+    def save(self):
+        """
+        replaces the stored scores with this run's
+        """
+        if self.writer is None:
+            return
+        try:
+            self.writer.close()
+            self.writer = None
+            os.replace(self.temporary, self.cache_path)
+        except OSError:
+            self.discard()
+
+    def discard(self):
+        """
+        drops this run's scores, the stored ones stay as they were
+        """
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except OSError:
+                pass
+            self.writer = None
+        try:
+            os.remove(self.temporary)
+        except OSError:
+            pass
@@ -0,0 +1,219 @@
+"""
+Typed parsing of uploaded customer files
+
+Uploads are parsed once with the pyarrow CSV reader and explicit column types,
+coerced like scoring.coerce_columns in one vectorized pass and kept in memory by
+their content hash, so reruns of a page and moving between the Data and Predict
+pages never parse the same bytes again.
+
+The frames returned are compact (see compact_frame), shared between sessions and
+must not be modified in place.
+"""
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow as pa
+import pandas as pd
+import numpy as np
+import collections
+import threading
+import hashlib
+import io
+
+from utils import compact_frame, scoring, stage_timing
+
+
+# Columns coerced to numbers, anything that is not a number becomes NaN
+NUMERIC_COLUMNS = ["tenure", "MonthlyCharges", "TotalCharges"]
+STRING_COLUMNS = ["customerID"] + [column for column in scoring.expected_features if column not in NUMERIC_COLUMNS + ["SeniorCitizen"]]
+
+# Strings pandas reads as missing by default
+NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+             "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+
+# Text pandas reads as booleans by default
+TRUE_VALUES = ["True", "TRUE", "true"]
+FALSE_VALUES = ["False", "FALSE", "false"]
+
+# Parsed uploads kept by this process, the least recently used is dropped first
+MAX_CACHED_UPLOADS = 4
+_cache = collections.OrderedDict()
+# Content hashes of uploads already seen, by the upload's file id, so a rerun does not hash the bytes again
+_hashes = collections.OrderedDict()
+_lock = threading.Lock()
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size = 16).hexdigest()
+
+
+def _header(data):
+    """
+    returns the column names of csv bytes, reading only the first block
+    """
+    return pacsv.open_csv(pa.py_buffer(data)).schema.names
+
+
+def _read_csv_table(data, typed: bool):
+    # Typed numbers are parsed straight from the bytes; untyped ones are kept as text for the slow path
+    number_types = {"tenure": pa.int64(), "SeniorCitizen": pa.int64(), "MonthlyCharges": pa.float64(), "TotalCharges": pa.float64()} \
+        if typed else {column: pa.string() for column in NUMERIC_COLUMNS + ["SeniorCitizen"]}
+    # Other columns are read as text and converted by pandas' rules in _coerce_table, pyarrow would infer dates and times
+    column_types = {column: pa.string() for column in _header(data)}
+    column_types.update({column: pa.string() for column in STRING_COLUMNS})
+    column_types.update(number_types)
+    convert = pacsv.ConvertOptions(column_types = column_types, null_values = NA_VALUES, strings_can_be_null = True)
+    return pacsv.read_csv(pa.py_buffer(data), convert_options = convert)
+
+
+def _infer_like_pandas(values):
+    """
+    converts an extra text column as pd.read_csv would: whole numbers, then numbers, then True/False, else text
+    """
+    cast = _to_number(values)
+    if cast is not None:
+        return cast
+    present = pc.drop_null(values)
+    # Booleans only without missing entries, pandas keeps a column with gaps as objects
+    if values.null_count == 0 and len(present) and pc.all(pc.is_in(present, pa.array(TRUE_VALUES + FALSE_VALUES))).as_py():
+        return pc.is_in(values, pa.array(TRUE_VALUES))
+    return values
+
+
+def _to_number(values):
+    """
+    casts a text column to int64, else float64, returning None when some entry is not a plain number
+    """
+    for number_type in [pa.int64(), pa.float64()]:
+        try:
+            return pc.cast(values, number_type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            continue
+    return None
+
+
+def _coerce_table(table):
+    """
+    turns an Arrow table into the frame scoring.coerce_columns would give, counting the entries set to NaN
+    """
+    invalid = {}
+    coerced = {}
+    for column in table.column_names:
+        if column not in NUMERIC_COLUMNS + STRING_COLUMNS + ["SeniorCitizen"]:
+            table = table.set_column(table.column_names.index(column), column, _infer_like_pandas(table.column(column)))
+    for column in NUMERIC_COLUMNS + ["SeniorCitizen"]:
+        values = table.column(column)
+        if not pa.types.is_string(values.type):
+            continue
+        cast = _to_number(values)
+        if cast is not None:
+            table = table.set_column(table.column_names.index(column), column, cast)
+        elif column == "SeniorCitizen":
+            # A text column never matches the 0/1 keys of the mapping
+            coerced[column] = np.full(len(values), np.nan)
+            invalid[column] = len(values) - values.null_count
+        else:
+            # Same rules as pd.to_numeric for entries like " 12 " or "1e3"
+            coerced[column] = pd.to_numeric(values.to_pandas(), errors = "coerce")
+            invalid[column] = int(coerced[column].isna().sum()) - values.null_count
+
+    # Missing text is NaN in frames read by pandas, not None
+    with_nulls = [column for column in table.column_names
+                  if pa.types.is_string(table.column(column).type) and table.column(column).null_count and column not in coerced]
+    df = table.to_pandas()
+    for column in with_nulls:
+        df[column] = df[column].fillna(np.nan)
+    for column, values in coerced.items():
+        df[column] = values
+
+    senior = df["SeniorCitizen"].to_numpy(dtype = np.float64)
+    mapped = np.full(len(senior), np.nan, dtype = object)
+    mapped[senior == 1] = "Yes"
+    mapped[senior == 0] = "No"
+    df["SeniorCitizen"] = mapped
+    invalid.setdefault("SeniorCitizen", int(np.count_nonzero(~np.isnan(senior) & (senior != 1) & (senior != 0))))
+    return df, invalid
+
+
+def _coerce_frame(df):
+    """
+    coerces a frame read by pandas with scoring.coerce_columns, counting the entries set to NaN
+    """
+    before = df[NUMERIC_COLUMNS + ["SeniorCitizen"]].notna().sum()
+    df = scoring.coerce_columns(df)
+    after = df[NUMERIC_COLUMNS + ["SeniorCitizen"]].notna().sum()
+    return df, {column: int(count) for column, count in (before - after).items()}
+
+
+def validate(columns):
+    """
+    returns the expected features missing from a file's columns
+    """
+    return [feature for feature in scoring.expected_features if feature not in columns]
+
+
+def parse(data, file_name: str):
+    """
+    parses csv or xlsx bytes into a coerced compact frame and a report of what was fixed and the memory saved
+
+    Raises ValueError for an unsupported file type or a file without the expected features.
+    """
+    with stage_timing.timed("bulk.parse") as timer:
+        if file_name.endswith(".csv"):
+            try:
+                parsed = _read_csv_table(data, typed = True)
+            except pa.ArrowInvalid:
+                # Some numeric entry is not a plain number, parse those columns as text and coerce them
+                parsed = _read_csv_table(data, typed = False)
+            columns = parsed.column_names
+        elif file_name.endswith(".xlsx"):
+            parsed = pd.read_excel(io.BytesIO(data))
+            columns = list(parsed.columns)
+        else:
+            raise ValueError("Unsupported file type. Please upload a csv or xlsx file")
+        timer.rows = len(parsed)
+
+    missing = validate(columns)
+    if missing:
+        raise ValueError(f"Uploaded data does not match expected features, missing: {', '.join(missing)}")
+
+    if isinstance(parsed, pa.Table):
+        with stage_timing.timed("bulk.coerce", rows = parsed.num_rows):
+            df, invalid = _coerce_table(parsed)
+    else:
+        df, invalid = _coerce_frame(parsed)
+
+    df = compact_frame.compact(df)
+    memory_before, memory_after = compact_frame.memory_report(df)
+    return df, {"rows": len(df), "invalid": invalid, "memory_before": memory_before, "memory_after": memory_after}
+
+
+def read_upload(file, file_name: str = None):
+    """
+    returns the parsed frame and report of an uploaded file, parsing its bytes only the first time they are seen
+    """
+    data = file.getvalue() if hasattr(file, "getvalue") else file.read()
+    file_name = file_name or file.name
+    file_id = getattr(file, "file_id", None)
+    with _lock:
+        digest = _hashes.get(file_id) if file_id is not None else None
+    if digest is None:
+        digest = content_hash(data)
+
+    key = (digest, file_name.rsplit(".", 1)[-1])
+    with _lock:
+        parsed = _cache.get(key)
+        if parsed is not None:
+            _cache.move_to_end(key)
+    if parsed is None:
+        parsed = parse(data, file_name)
+
+    with _lock:
+        _cache[key] = parsed
+        _cache.move_to_end(key)
+        if file_id is not None:
+            _hashes[file_id] = digest
+        while len(_cache) > MAX_CACHED_UPLOADS:
+            _cache.popitem(last = False)
+        while len(_hashes) > MAX_CACHED_UPLOADS:
+            _hashes.popitem(last = False)
+    return parsed
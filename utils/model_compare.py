@@ -0,0 +1,146 @@
+"""
+Bulk scoring with both churn models and a report of where they agree
+
+The customer file is read and checked once, then the gradient boost and the
+logistic regression model score it side by side on the worker pool of the
+parallel scoring engine, so the run takes about as long as the slower model.
+The result is one frame with both models' labels and probabilities, their gap
+and a disagreement flag. The agreement summary is kept as counts, so the
+summaries of streamed chunks add up to that of the whole file.
+
+Usage:
+    results, wall_seconds = model_compare.score(df)
+    comparison = model_compare.build_comparison(df, results, scoring.prediction_date())
+    summary = model_compare.AgreementSummary()
+    summary.add(comparison)
+"""
+import pandas as pd
+import numpy as np
+import time
+
+from utils import parallel, stage_timing
+
+
+# Models compared, with the column prefix and display name of each
+MODELS = {"gradient_boost": ("GB", "Gradient Boost"), "logistic_regression": ("LR", "Logistic Regression")}
+INBUILT_COMPARISON_FILE = "./data/inbuilt_model_comparison.csv"
+UPLOADED_COMPARISON_FILE = "./data/uploaded_model_comparison.csv"
+
+
+def comparison_file_for(is_uploaded_data: bool):
+    """
+    returns the model comparison file of the dataset source
+    """
+    return UPLOADED_COMPARISON_FILE if is_uploaded_data else INBUILT_COMPARISON_FILE
+
+
+def score(df, workers = parallel.DEFAULT_WORKERS, shard_size = parallel.DEFAULT_SHARD_SIZE, engine = "sklearn"):
+    """
+    scores df with every compared model at once, returns {name: (prediction, probability scores, seconds)} and the wall seconds
+
+    `engine` applies to the gradient boost model, the logistic regression always runs its own pipeline.
+    """
+    start = time.perf_counter()
+    results = parallel.parallel_model_predictions(df, list(MODELS), workers = workers, shard_size = shard_size, engine = engine)
+    wall_seconds = time.perf_counter() - start
+    for name, (_, _, seconds) in results.items():
+        stage_timing.observe(f"compare.{name}", seconds, len(df))
+    stage_timing.observe("compare.score", wall_seconds, len(df))
+    return results, wall_seconds
+
+
+def build_comparison(df, results, formatted_date):
+    """
+    returns the customers with each model's label and class-1 probability, the probability gap and a disagreement flag
+    """
+    comparison = df.copy()
+    # Known outcomes of labelled data are kept apart from the predictions, as in the bulk history
+    if "Churn" in comparison.columns:
+        comparison = comparison.rename(columns = {"Churn": "Actual_Churn"})
+    comparison.insert(1, "Prediction_Date", formatted_date)
+
+    labels = []
+    probabilities = []
+    for name, (prefix, _) in MODELS.items():
+        prediction, probability_score = results[name][:2]
+        comparison[f"{prefix}_Churn"] = prediction
+        comparison[f"{prefix}_Churn_probability"] = probability_score[:, 1]
+        labels.append(np.asarray(prediction))
+        probabilities.append(probability_score[:, 1])
+    comparison["Probability_gap"] = np.abs(probabilities[0] - probabilities[1])
+    comparison["Models_disagree"] = labels[0] != labels[1]
+    return comparison
+
+
+def write_comparison(comparison, comparison_file: str, append: bool = False):
+    """
+    overrides the comparison file, or appends to it without repeating the header
+    """
+    with stage_timing.timed("compare.write_csv", rows = len(comparison)):
+        comparison.to_csv(comparison_file, mode = "a" if append else "w", header = not append, index = False)
+
+
+class AgreementSummary:
+    """
+    agreement counts of the two models over every comparison added so far
+
+    Cohen's kappa corrects the agreement rate for the agreement two models with the
+    same churn rates would reach by chance.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.both_churn = 0
+        self.both_retain = 0
+        # Customers only one model flags, by the model that flags them
+        self.only_churn = {name: 0 for name in MODELS}
+        self.gap_sum = 0.0
+        self.gap_max = 0.0
+
+    def add(self, comparison):
+        (first, (first_prefix, _)), (second, (second_prefix, _)) = MODELS.items()
+        first_churn = (comparison[f"{first_prefix}_Churn"] == "Yes").to_numpy()
+        second_churn = (comparison[f"{second_prefix}_Churn"] == "Yes").to_numpy()
+        self.rows += len(comparison)
+        self.both_churn += int((first_churn & second_churn).sum())
+        self.both_retain += int((~first_churn & ~second_churn).sum())
+        self.only_churn[first] += int((first_churn & ~second_churn).sum())
+        self.only_churn[second] += int((~first_churn & second_churn).sum())
+        if len(comparison):
+            gap = comparison["Probability_gap"].to_numpy()
+            self.gap_sum += float(gap.sum())
+            self.gap_max = max(self.gap_max, float(gap.max()))
+
+    @property
+    def disagreements(self):
+        return sum(self.only_churn.values())
+
+    @property
+    def agreement_rate(self):
+        return (self.both_churn + self.both_retain) / self.rows if self.rows else np.nan
+
+    @property
+    def kappa(self):
+        if not self.rows:
+            return np.nan
+        churn_rates = [(self.both_churn + self.only_churn[name]) / self.rows for name in MODELS]
+        chance = churn_rates[0] * churn_rates[1] + (1 - churn_rates[0]) * (1 - churn_rates[1])
+        # Two models that each flag everyone or no one agree by chance alone
+        return (self.agreement_rate - chance) / (1 - chance) if chance < 1 else 1.0
+
+    def as_dict(self):
+        summary = {"rows": self.rows, "agreement_rate": self.agreement_rate, "kappa": self.kappa,
+                   "both_churn": self.both_churn, "both_retain": self.both_retain, "disagreements": self.disagreements}
+        for name, (prefix, _) in MODELS.items():
+            summary[f"only_{prefix}_churn"] = self.only_churn[name]
+        summary["mean_probability_gap"] = self.gap_sum / self.rows if self.rows else np.nan
+        summary["max_probability_gap"] = self.gap_max
+        return summary
+
+    def crosstab(self):
+        """
+        returns the 2x2 table of the two models' labels
+        """
+        (first, (_, first_label)), (second, (_, second_label)) = MODELS.items()
+        return pd.DataFrame({f"{second_label}: Yes": [self.both_churn, self.only_churn[second]],
+                             f"{second_label}: No": [self.only_churn[first], self.both_retain]},
+                            index = [f"{first_label}: Yes", f"{first_label}: No"])
@@ -0,0 +1,119 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+import time
+import os
+
+from utils import registry, scoring
+
+
+# Defaults for the parallel scoring engine
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_SHARD_SIZE = 100_000
+
+# Pools kept alive between runs, keyed by their worker count
+_pools = {}
+
+
+def _load_worker_artifacts():
+    """
+    loads the model, threshold and encoder into the worker's registry once when it starts
+    """
+    registry.get("gradient_boost")
+    registry.get("encoder")
+
+
+def _score_shard(shard, engine = "sklearn", name = "gradient_boost"):
+    """
+    scores one row shard with the worker's artifacts, same steps as the serial bulk prediction
+    """
+    # The registry reloads the model in the worker if the file on disk has changed,
+    # only the tree model compiles to the vectorized engine
+    if engine == "vectorized" and name == "gradient_boost":
+        model, threshold = registry.get_engine(name)
+    else:
+        model, threshold = registry.get(name)
+    return scoring.bulk_prediction(model, threshold, shard, registry.get("encoder"))
+
+
+def _timed_score_shard(shard, engine, name):
+    """
+    scores one row shard and returns the seconds the worker spent on it with the result
+    """
+    start = time.perf_counter()
+    bulk_prediction, prob_score = _score_shard(shard, engine, name)
+    return bulk_prediction, prob_score, time.perf_counter() - start
+
+
+def _shards(df, shard_size):
+    shard_size = max(int(shard_size), 1)
+    return [df.iloc[start:start + shard_size] for start in range(0, len(df), shard_size)]
+
+
+def get_pool(workers):
+    """
+    returns a process pool whose workers have already been told to load the artifacts
+    """
+    if workers not in _pools:
+        # Spawned workers do not inherit the threads of the Streamlit server
+        _pools[workers] = ProcessPoolExecutor(max_workers = workers,
+                                              mp_context = multiprocessing.get_context("spawn"),
+                                              initializer = _load_worker_artifacts)
+    return _pools[workers]
+
+
+def shutdown_pools():
+    """
+    stops every pool started by this process
+    """
+    for pool in _pools.values():
+        pool.shutdown(cancel_futures = True)
+    _pools.clear()
+
+
+def parallel_bulk_prediction(df, workers = DEFAULT_WORKERS, shard_size = DEFAULT_SHARD_SIZE, engine = "sklearn"):
+    """
+    splits df into row shards, scores them on a process pool and stitches the results back in row order
+
+    `engine` is "sklearn" for the pipeline's own predict_proba or "vectorized" for the compiled tree engine
+    """
+    shards = _shards(df, shard_size)
+    pool = get_pool(max(int(workers), 1))
+
+    # map yields results in submission order, which keeps the original row order
+    results = list(pool.map(_score_shard, shards, [engine] * len(shards)))
+    if not results:
+        return np.array([], dtype = object), np.empty((0, 2))
+
+    bulk_prediction = np.concatenate([prediction for prediction, _ in results])
+    prob_score = np.concatenate([probability for _, probability in results])
+    return bulk_prediction, prob_score
+
+
+def parallel_model_predictions(df, names, workers = DEFAULT_WORKERS, shard_size = DEFAULT_SHARD_SIZE, engine = "sklearn"):
+    """
+    scores the same rows with several models at once on a process pool
+
+    Every model gets at least one worker, and the shards of all models are queued
+    together, so the wall time is that of the slowest model rather than the sum.
+    Returns {name: (bulk prediction, probability scores, worker seconds)} in row order.
+    """
+    shards = _shards(df, shard_size)
+    pool = get_pool(max(int(workers), len(names), 1))
+
+    # Shards are queued model by model in turn, so no model waits for another to finish
+    futures = {name: [] for name in names}
+    for shard in shards:
+        for name in names:
+            futures[name].append(pool.submit(_timed_score_shard, shard, engine, name))
+
+    results = {}
+    for name, shard_futures in futures.items():
+        parts = [future.result() for future in shard_futures]
+        if not parts:
+            results[name] = (np.array([], dtype = object), np.empty((0, 2)), 0.0)
+            continue
+        results[name] = (np.concatenate([prediction for prediction, _, _ in parts]),
+                         np.concatenate([probability for _, probability, _ in parts]),
+                         sum(seconds for _, _, seconds in parts))
+    return results
@@ -0,0 +1,210 @@
+"""
+Process-wide registry of the model artifacts
+
+Each artifact is loaded once per process, versioned by a hash of its file and
+reloaded when the file on disk changes.
+
+Artifacts are read into memory by default. get_artifact(name, mmap_mode = "r")
+memory-maps their large numpy arrays instead, so processes share them through the
+page cache, but a mapped file must never be rewritten in place: a process still
+using the old model would read the new bytes, or crash on a shortened file. Writers
+of a mapped artifact write a temporary file next to it and os.replace it over the
+old one, which leaves the old mapping on the old file until it is reloaded.
+"""
+import numpy as np
+import threading
+import hashlib
+import joblib
+import time
+import sys
+import os
+
+from utils import explain, scoring, single_predict, tree_engine
+
+
+# Artifacts known to the registry
+ARTIFACTS = {
+    "gradient_boost": scoring.GRADIENT_BOOST_PATH,
+    "logistic_regression": scoring.LOGISTIC_REGRESSION_PATH,
+    "encoder": scoring.ENCODER_PATH,
+}
+
+# Artifacts loaded by this process, shared by every Streamlit session
+_loaded = {}
+# Compiled forms of loaded models, keyed by (artifact name, kind)
+_compiled = {}
+_lock = threading.Lock()
+
+
+class Artifact:
+    """
+    one loaded model file with its version and load statistics
+    """
+    def __init__(self, name, path, value, version, mtime_ns, size, load_seconds, resident_bytes, mapped_bytes, reloads):
+        self.name = name
+        self.path = path
+        self.value = value
+        self.version = version
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.load_seconds = load_seconds
+        self.resident_bytes = resident_bytes
+        self.mapped_bytes = mapped_bytes
+        self.reloads = reloads
+        self.loaded_at = time.time()
+
+
+def file_hash(path: str):
+    """
+    returns a short sha256 of the file, used as the artifact version
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def _memory_size(obj, seen = None):
+    """
+    estimates the bytes held by an object graph, split into heap and memory-mapped bytes
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0, 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            sizes = [_memory_size(item, seen) for item in obj.ravel()]
+            return obj.nbytes + sum(size[0] for size in sizes), sum(size[1] for size in sizes)
+        # Memory-mapped arrays live in the page cache and are shared between processes
+        if isinstance(obj, np.memmap) or isinstance(obj.base, np.memmap):
+            return 0, obj.nbytes
+        return obj.nbytes, 0
+
+    resident, mapped = sys.getsizeof(obj), 0
+    if isinstance(obj, dict):
+        children = list(obj.keys()) + list(obj.values())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        children = list(obj)
+    elif hasattr(obj, "__dict__"):
+        children = [vars(obj)]
+    elif hasattr(obj, "__getstate__") and type(obj).__module__.startswith("sklearn"):
+        # Compiled sklearn objects such as tree structures expose their arrays through their state
+        state = obj.__getstate__()
+        children = [state] if isinstance(state, dict) else []
+    else:
+        children = []
+
+    for child in children:
+        child_resident, child_mapped = _memory_size(child, seen)
+        resident += child_resident
+        mapped += child_mapped
+    return resident, mapped
+
+
+def _load(name, path, stat, version, reloads, mmap_mode):
+    start = time.perf_counter()
+    value = joblib.load(path, mmap_mode = mmap_mode)
+    load_seconds = time.perf_counter() - start
+    resident_bytes, mapped_bytes = _memory_size(value)
+    return Artifact(name, path, value, version, stat.st_mtime_ns, stat.st_size, load_seconds, resident_bytes, mapped_bytes, reloads)
+
+
+def get_artifact(name: str, mmap_mode = None):
+    """
+    returns the loaded artifact, loading it on first use and reloading it when the file on disk changes
+
+    With `mmap_mode="r"` large numpy arrays are memory-mapped, see the module docstring for how such files are written.
+    """
+    path = ARTIFACTS[name]
+    stat = os.stat(path)
+    artifact = _loaded.get(name)
+    # A stat per call is all it costs to notice a changed file
+    if artifact is not None and artifact.mtime_ns == stat.st_mtime_ns and artifact.size == stat.st_size:
+        return artifact
+
+    with _lock:
+        artifact = _loaded.get(name)
+        if artifact is not None and artifact.mtime_ns == stat.st_mtime_ns and artifact.size == stat.st_size:
+            return artifact
+
+        version = file_hash(path)
+        if artifact is not None and artifact.version == version:
+            # Touched but not changed, keep the loaded model
+            artifact.mtime_ns, artifact.size = stat.st_mtime_ns, stat.st_size
+            return artifact
+
+        reloads = artifact.reloads + 1 if artifact is not None else 0
+        _loaded[name] = _load(name, path, stat, version, reloads, mmap_mode)
+        return _loaded[name]
+
+
+def get(name: str):
+    """
+    returns the loaded value of an artifact: (model, threshold) for models, the encoder otherwise
+    """
+    return get_artifact(name).value
+
+
+def _get_compiled(name, kind, compile):
+    """
+    returns (compiled model, threshold), compiling once per model version
+    """
+    artifact = get_artifact(name)
+    cached = _compiled.get((name, kind))
+    if cached is None or cached[0] != artifact.version:
+        with _lock:
+            cached = _compiled.get((name, kind))
+            if cached is None or cached[0] != artifact.version:
+                pipeline, threshold = artifact.value
+                cached = (artifact.version, compile(pipeline), threshold)
+                _compiled[(name, kind)] = cached
+    return cached[1], cached[2]
+
+
+def get_engine(name: str = "gradient_boost"):
+    """
+    returns (engine, threshold) with the model compiled by the vectorized tree engine
+
+    The engine is recompiled when the model is reloaded.
+    """
+    return _get_compiled(name, "tree_engine", tree_engine.compile_pipeline)
+
+
+def get_single_predictor(name: str):
+    """
+    returns (predictor, threshold) with the model's categorical encodings precomputed for single predictions
+    """
+    return _get_compiled(name, "single_predict", single_predict.SinglePredictor)
+
+
+def get_explainer(name: str):
+    """
+    returns the explainer of a model, splitting its predictions into per-column contributions
+
+    The explainer is rebuilt when the model is reloaded.
+    """
+    explainer, _ = _get_compiled(name, "explainer", explain.compile_explainer)
+    return explainer
+
+
+def version(name: str):
+    return get_artifact(name).version
+
+
+def stats():
+    """
+    reports version, load time and memory of every artifact loaded by this process
+    """
+    return [{
+        "artifact": artifact.name,
+        "path": artifact.path,
+        "version": artifact.version,
+        "load_seconds": round(artifact.load_seconds, 4),
+        "resident_bytes": artifact.resident_bytes,
+        "mapped_bytes": artifact.mapped_bytes,
+        "reloads": artifact.reloads,
+        "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(artifact.loaded_at)),
+    } for artifact in _loaded.values()]
@@ -0,0 +1,195 @@
+import pandas as pd
+import numpy as np
+import datetime
+import joblib
+
+from utils import stage_timing
+
+
+# Define expected feature columns
+expected_features = ["gender", "SeniorCitizen", "Partner", "Dependents", "tenure", "PhoneService", "MultipleLines",
+                     "InternetService", "OnlineSecurity", "OnlineBackup", "DeviceProtection", "TechSupport", "StreamingTV",
+                     "StreamingMovies", "Contract", "PaperlessBilling", "PaymentMethod", "MonthlyCharges", "TotalCharges"]
+
+# Model artifacts and history files
+GRADIENT_BOOST_PATH = "./models/gradient_boost_model.joblib"
+LOGISTIC_REGRESSION_PATH = "./models/logistic_regression_model.joblib"
+ENCODER_PATH = "./models/encoder.joblib"
+INBUILT_HISTORY_FILE = "./data/inbuilt_data_history.csv"
+UPLOADED_HISTORY_FILE = "./data/uploaded_data_history.csv"
+
+
+# Load gradient boost and threshold
+def load_gradient_boost(model_path: str = GRADIENT_BOOST_PATH):
+    model, threshold = joblib.load(model_path)
+    return model, threshold
+
+
+# Load logistic regression and threshold
+def load_logistic_regression(model_path: str = LOGISTIC_REGRESSION_PATH):
+    model, threshold = joblib.load(model_path)
+    return model, threshold
+
+
+# Load label encoder used to turn predictions back into Yes/No
+def load_encoder(encoder_path: str = ENCODER_PATH):
+    return joblib.load(encoder_path)
+
+
+def history_file_for(is_uploaded_data: bool):
+    """
+    returns the bulk history file of the dataset source
+    """
+    return UPLOADED_HISTORY_FILE if is_uploaded_data else INBUILT_HISTORY_FILE
+
+
+def has_expected_features(df):
+    """
+    checks if data has same feature as expected
+    """
+    return all(feature in df.columns for feature in expected_features)
+
+
+def coerce_columns(df, stage: str = "bulk.coerce"):
+    """
+    maps SeniorCitizen to Yes/No and coerces non-numeric entries in numeric columns to NaN, timed as `stage`
+    """
+    with stage_timing.timed(stage, rows = len(df)):
+        df["SeniorCitizen"] = df["SeniorCitizen"].map({1: "Yes", 0: "No"})
+        df["tenure"] = pd.to_numeric(df["tenure"], errors = "coerce")
+        df["MonthlyCharges"] = pd.to_numeric(df["MonthlyCharges"], errors = "coerce")
+        df["TotalCharges"] = pd.to_numeric(df["TotalCharges"], errors = "coerce")
+    return df
+
+
+def bulk_prediction(model, threshold, df, encoder):
+    # Make predictions
+    with stage_timing.timed("bulk.predict_proba", rows = len(df)):
+        prob_score = model.predict_proba(df.drop(columns=["customerID"]))
+    bulk_pred = (prob_score[:, 1] >= threshold).astype(int)
+    # Inverse transform encoded predictions
+    with stage_timing.timed("bulk.inverse_transform", rows = len(df)):
+        bulk_prediction = encoder.inverse_transform(bulk_pred)
+    return bulk_prediction, prob_score
+
+
+def prediction_date():
+    # Get the current date
+    now = datetime.datetime.now()
+    return f"{now.date()}"
+
+
+def build_bulk_history(df, bulk_predict, probability_score, formatted_date, drivers = None):
+    # Copy the original DataFrame to avoid modifying it directly
+    bulk_history_df = df.copy()
+    # Known outcomes of labelled data are kept apart from the prediction that takes the Churn column
+    if "Churn" in bulk_history_df.columns:
+        bulk_history_df = bulk_history_df.rename(columns = {"Churn": "Actual_Churn"})
+
+    # Add relevant information to the DataFrame
+    bulk_history_df.insert(1, "Prediction_Date", formatted_date)
+    bulk_history_df["Model_used"] = "Gradient Boost Classifier"
+    bulk_history_df["Churn"] = bulk_predict
+    with stage_timing.timed("bulk.format_probability", rows = len(df)):
+        bulk_history_df["Probability"] = np.where(bulk_predict == 0, np.round(probability_score[:, 0]*100, 2), np.round(probability_score[:, 1]*100, 2))
+    # Unrounded class-1 probability, so labels can be recomputed for any threshold without the model
+    bulk_history_df["Churn_probability"] = probability_score[:, 1]
+    # Top drivers of every prediction, when the run was explained
+    if drivers is not None:
+        for column in drivers.columns:
+            bulk_history_df[column] = drivers[column].to_numpy()
+    return bulk_history_df
+
+
+def write_history(bulk_history_df, history_file: str, append: bool = False):
+    """
+    overrides the history file, or appends to it without repeating the header
+    """
+    with stage_timing.timed("bulk.write_csv", rows = len(bulk_history_df)):
+        bulk_history_df.to_csv(history_file, mode = "a" if append else "w", header = not append, index = False)
+
+
+def prepare_chunks(chunks):
+    """
+    validates and coerces each chunk, raising ValueError on the first one without the expected features
+    """
+    for chunk in chunks:
+        if not has_expected_features(chunk):
+            raise ValueError("Uploaded data does not match expected features.")
+        yield coerce_columns(chunk)
+
+
+def score_chunks(chunks, score, formatted_date, explain = None):
+    """
+    validates, coerces and scores each chunk, yielding its history rows as soon as it is done
+
+    `score` takes a coerced chunk and returns the predictions and probability scores,
+    `explain` takes it and returns the top drivers of its predictions or None
+    """
+    for chunk in prepare_chunks(chunks):
+        bulk_predict, probability_score = score(chunk)
+        drivers = explain(chunk) if explain is not None else None
+        yield build_bulk_history(chunk, bulk_predict, probability_score, formatted_date, drivers)
+
+
+# Function to count data rows of a csv/xlsx/parquet file without loading it
+def count_rows(file, file_name: str):
+    """
+    counts the data rows of a csv, xlsx or parquet file in bounded memory
+    """
+    if file_name.endswith(".csv"):
+        file.seek(0)
+        lines = sum(block.count(b"\n") for block in iter(lambda: file.read(1 << 20), b""))
+        file.seek(0)
+        # Header line does not count as a row
+        return max(lines - 1, 0)
+    elif file_name.endswith(".xlsx"):
+        from openpyxl import load_workbook
+        file.seek(0)
+        workbook = load_workbook(file, read_only = True)
+        rows = workbook.active.max_row or 1
+        workbook.close()
+        file.seek(0)
+        return max(rows - 1, 0)
+    elif file_name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        file.seek(0)
+        rows = pq.ParquetFile(file).metadata.num_rows
+        file.seek(0)
+        return rows
+    return 0
+
+
+# Function to read csv/xlsx/parquet files in bounded-size chunks
+def read_in_chunks(file, file_name: str, chunksize: int):
+    """
+    yields DataFrames of at most `chunksize` rows from a csv, xlsx or parquet file
+    """
+    file.seek(0)
+    if file_name.endswith(".csv"):
+        with pd.read_csv(file, chunksize = chunksize) as reader:
+            for chunk in reader:
+                yield chunk
+    elif file_name.endswith(".xlsx"):
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only = True)
+        rows = workbook.active.iter_rows(values_only = True)
+        columns = next(rows, None)
+        batch = []
+        for row in rows:
+            # Skip blank rows left behind in the sheet
+            if all(value is None for value in row):
+                continue
+            batch.append(row)
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns = columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns = columns)
+        workbook.close()
+    elif file_name.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(file).iter_batches(batch_size = chunksize):
+            yield batch.to_pandas()
+    else:
+        raise ValueError("Unsupported file type. Please upload a csv, xlsx or parquet file")
@@ -0,0 +1,258 @@
+"""
+Local HTTP inference service for single-customer predictions
+
+Concurrent requests that arrive within a short window are combined into one
+batched predict_proba call per model.
+
+Usage:
+    python -m utils.serve --port 8600 --max-batch-size 64 --max-wait-ms 5
+
+Endpoints:
+    POST /predict   {"model": "Gradient Boost", "customer": {"gender": "Male", ...}}
+    GET  /metrics   request, batch and p50/p99 latency statistics
+    GET  /health
+"""
+from collections import deque
+from http import HTTPStatus
+import pandas as pd
+import numpy as np
+import argparse
+import asyncio
+import json
+import time
+
+from utils import registry, scoring
+
+
+# Models that can be requested, same names as the Predict page's model selector
+MODEL_ARTIFACTS = {
+    "Gradient Boost": "gradient_boost",
+    "Logistic Regression": "logistic_regression",
+}
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+
+# Number of recent request latencies kept for the percentiles
+LATENCY_WINDOW = 10_000
+
+
+class MicroBatcher:
+    """
+    collects single-customer requests for one model and scores them together
+    """
+    def __init__(self, artifact, max_batch_size, max_wait_ms):
+        self.artifact = artifact
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.batched_rows = 0
+
+    async def predict(self, customer: dict):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((customer, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for the first request, then gather more until the batch is full or the window closes
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            customers = [customer for customer, _ in batch]
+            try:
+                # Score off the event loop so new requests keep being accepted
+                results = await loop.run_in_executor(None, self.score, customers)
+            except Exception as e:
+                # One bad row fails the whole call, the rows are scored one at a time so only its request fails
+                results = await loop.run_in_executor(None, self.score_each, customers) if len(batch) > 1 else [e]
+
+            self.batches += 1
+            self.batched_rows += len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def score(self, customers):
+        # Fetched per batch so a model replaced on disk is picked up without a restart
+        pipeline, threshold = registry.get(self.artifact)
+        df = pd.DataFrame(customers, columns = scoring.expected_features)
+        probability = pipeline.predict_proba(df)
+        pred = (probability[:, 1] >= threshold).astype(int)
+        prediction = registry.get("encoder").inverse_transform(pred)
+        return [{"prediction": str(label),
+                 "probability": float(np.round(probability[i, pred[i]] * 100, 2)),
+                 "churn_probability": float(probability[i, 1])}
+                for i, label in enumerate(prediction)]
+
+    def score_each(self, customers):
+        """
+        scores the customers one at a time, returning the exception of those that fail in place of their result
+        """
+        results = []
+        for customer in customers:
+            try:
+                results.extend(self.score([customer]))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def parse_customer(customer):
+    """
+    validates one customer's features, raising ValueError when some are missing or a category is not a string
+    """
+    if not isinstance(customer, dict):
+        raise ValueError("customer must be a JSON object")
+    missing = [feature for feature in scoring.expected_features if feature not in customer]
+    if missing:
+        raise ValueError(f"missing features: {', '.join(missing)}")
+
+    customer = {feature: customer[feature] for feature in scoring.expected_features}
+    # Accept the 0/1 encoding of the raw data as well as the Yes/No of the entry form
+    if customer["SeniorCitizen"] in (0, 1):
+        customer["SeniorCitizen"] = {1: "Yes", 0: "No"}[customer["SeniorCitizen"]]
+    # Anything else in a categorical feature would only fail inside the model, for every request of its batch
+    invalid = [feature for feature in scoring.expected_features
+               if feature not in ["tenure", "MonthlyCharges", "TotalCharges"] and not isinstance(customer[feature], str)]
+    if invalid:
+        raise ValueError(f"categorical features must be strings: {', '.join(invalid)}")
+    for feature in ["tenure", "MonthlyCharges", "TotalCharges"]:
+        try:
+            customer[feature] = float(customer[feature])
+        except (TypeError, ValueError):
+            customer[feature] = np.nan
+    return customer
+
+
+class InferenceService:
+    def __init__(self, max_batch_size = DEFAULT_MAX_BATCH_SIZE, max_wait_ms = DEFAULT_MAX_WAIT_MS):
+        self.batchers = {}
+        for name, artifact in MODEL_ARTIFACTS.items():
+            # Warm the registry so the first request does not pay for loading
+            registry.get(artifact)
+            self.batchers[name] = MicroBatcher(artifact, max_batch_size, max_wait_ms)
+        registry.get("encoder")
+        self.latencies = deque(maxlen = LATENCY_WINDOW)
+        self.requests = 0
+        self.errors = 0
+
+    async def predict(self, payload):
+        model = payload.get("model", "Gradient Boost")
+        if model not in self.batchers:
+            raise ValueError(f"unknown model {model!r}, choose one of {list(self.batchers)}")
+        customer = parse_customer(payload.get("customer", payload))
+        result = await self.batchers[model].predict(customer)
+        return {"model": model, **result}
+
+    def metrics(self):
+        latencies = np.array(self.latencies) * 1000
+        batches = sum(batcher.batches for batcher in self.batchers.values())
+        batched_rows = sum(batcher.batched_rows for batcher in self.batchers.values())
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": batches,
+            "mean_batch_size": round(batched_rows / batches, 2) if batches else 0.0,
+            "p50_latency_ms": round(float(np.percentile(latencies, 50)), 3) if latencies.size else None,
+            "p99_latency_ms": round(float(np.percentile(latencies, 99)), 3) if latencies.size else None,
+            "models": registry.stats(),
+        }
+
+    async def handle(self, method, path, body):
+        """
+        routes one request and returns the status code and JSON response
+        """
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok"}
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics()
+        if method == "POST" and path == "/predict":
+            start = time.perf_counter()
+            self.requests += 1
+            try:
+                result = await self.predict(json.loads(body or b"{}"))
+            except (ValueError, AttributeError) as e:
+                self.errors += 1
+                return 400, {"error": str(e)}
+            except Exception as e:
+                self.errors += 1
+                return 500, {"error": str(e)}
+            self.latencies.append(time.perf_counter() - start)
+            return 200, result
+        return 404, {"error": f"no route for {method} {path}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                # Read headers until the blank line
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, response = await self.handle(method, path, body)
+
+                payload = json.dumps(response).encode()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        # Keep references to the batching tasks so they are not garbage collected
+        self.tasks = [asyncio.create_task(batcher.run()) for batcher in self.batchers.values()]
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving churn predictions on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Serve single-customer churn predictions over HTTP with request micro-batching")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8600)
+    parser.add_argument("--max-batch-size", type = int, default = DEFAULT_MAX_BATCH_SIZE, help = "most requests scored in one predict_proba call")
+    parser.add_argument("--max-wait-ms", type = float, default = DEFAULT_MAX_WAIT_MS, help = "how long the first request of a batch waits for others")
+    args = parser.parse_args(argv)
+
+    service = InferenceService(args.max_batch_size, args.max_wait_ms)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
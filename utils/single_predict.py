@@ -0,0 +1,39 @@
+import numpy as np
+
+from utils import tree_engine
+
+
+class SinglePredictor:
+    """
+    scores one customer at a time without building a DataFrame
+
+    The one-hot block of every known category is computed once when the model
+    loads, so a prediction only looks up 16 blocks, transforms the three numerics
+    and calls the fitted classifier. Probabilities are identical to the pipeline's
+    predict_proba on a one-row DataFrame.
+    """
+    def __init__(self, pipeline):
+        self.preprocessor = tree_engine.CompiledPreprocessor(pipeline.named_steps["preprocessor"])
+        self.classifier = pipeline.named_steps["classifier"]
+        self.classes_ = self.classifier.classes_
+
+        # {column: {category: encoded block}}, values the encoder never saw encode to all zeros
+        self.tables = {}
+        self.unknown = {}
+        for position, column in enumerate(self.preprocessor.categorical_columns):
+            categories = self.preprocessor.category_index[position]
+            blocks = np.eye(len(categories))
+            self.tables[column] = {category: blocks[code] for code, category in enumerate(categories)}
+            self.unknown[column] = np.zeros(len(categories))
+
+    def encode(self, customer: dict):
+        """
+        returns the (1, n_features) row the classifier expects for one customer's features
+        """
+        numeric = self.preprocessor.transform_numeric(
+            np.array([[customer[column] for column in self.preprocessor.numeric_columns]], dtype = np.float64))
+        blocks = [self.tables[column].get(customer[column], self.unknown[column]) for column in self.preprocessor.categorical_columns]
+        return np.concatenate([numeric[0]] + blocks)[None, :]
+
+    def predict_proba(self, customer: dict):
+        return self.classifier.predict_proba(self.encode(customer))
@@ -0,0 +1,219 @@
+"""
+Per-stage timing of the prediction and loading paths
+
+Each stage keeps a latency histogram, its total time and the rows it handled
+for the lifetime of the server process, shared by every Streamlit session.
+The Metrics page shows them, and they are exported in the Prometheus text
+format to a file a node_exporter textfile collector can pick up.
+
+Usage:
+    with stage_timing.timed("bulk.predict_proba", rows = len(df)):
+        prob_score = model.predict_proba(df)
+"""
+import threading
+import bisect
+import time
+import os
+
+
+# Upper bounds of the latency buckets in seconds, from a tenth of a millisecond to a minute
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 60.0)
+
+METRICS_FILE = "./data/metrics.prom"
+# Seconds between two automatic writes of the metrics file
+EXPORT_INTERVAL = 15.0
+
+# Stages timed by this process
+_stages = {}
+_lock = threading.Lock()
+_last_export = 0.0
+
+
+class StageHistogram:
+    """
+    latency histogram and row counts of one stage
+    """
+    def __init__(self, buckets = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf bucket, not cumulative
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+        self.rows = 0
+        # Time of the calls that reported rows, the denominator of rows per second
+        self.row_seconds = 0.0
+
+    def observe(self, seconds: float, rows = None):
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.minimum = min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+        if rows is not None:
+            self.rows += rows
+            self.row_seconds += seconds
+
+    def quantile(self, q: float):
+        """
+        estimates a latency quantile by linear interpolation inside its bucket, like histogram_quantile
+
+        The estimate is kept within the fastest and slowest call seen.
+        """
+        if self.count == 0:
+            return float("nan")
+        rank = q * self.count
+        cumulative = 0
+        estimate = self.maximum
+        for position, bucket_count in enumerate(self.bucket_counts):
+            if cumulative + bucket_count >= rank and bucket_count > 0:
+                if position < len(self.buckets):
+                    lower = self.buckets[position - 1] if position > 0 else 0.0
+                    estimate = lower + (self.buckets[position] - lower) * (rank - cumulative) / bucket_count
+                break
+            cumulative += bucket_count
+        return min(max(estimate, self.minimum), self.maximum)
+
+    def rows_per_second(self):
+        return self.rows / self.row_seconds if self.row_seconds > 0 else float("nan")
+
+
+class _Timer:
+    """
+    context manager timing one call of a stage; rows can be set inside the block once known
+    """
+    def __init__(self, stage: str, rows = None):
+        self.stage = stage
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start, self.rows)
+        return False
+
+
+def observe(stage: str, seconds: float, rows = None):
+    with _lock:
+        histogram = _stages.get(stage)
+        if histogram is None:
+            histogram = _stages[stage] = StageHistogram()
+        histogram.observe(seconds, rows)
+
+
+def timed(stage: str, rows = None):
+    """
+    times the block it wraps as one call of the stage
+    """
+    return _Timer(stage, rows)
+
+
+def timed_chunks(stage: str, chunks):
+    """
+    yields the chunks of an iterator, timing the production of each one as a call of the stage
+    """
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        observe(stage, time.perf_counter() - start, len(chunk))
+        yield chunk
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+
+
+def snapshot():
+    """
+    returns per-stage statistics, one dict per stage sorted by stage name
+    """
+    with _lock:
+        stages = sorted(_stages.items())
+        return [{
+            "stage": stage,
+            "calls": histogram.count,
+            "rows": histogram.rows,
+            "mean_ms": histogram.seconds / histogram.count * 1000,
+            "p50_ms": histogram.quantile(0.5) * 1000,
+            "p95_ms": histogram.quantile(0.95) * 1000,
+            "p99_ms": histogram.quantile(0.99) * 1000,
+            "total_s": histogram.seconds,
+            "rows_per_second": histogram.rows_per_second(),
+        } for stage, histogram in stages]
+
+
+def histogram(stage: str):
+    """
+    returns [(bucket upper bound, calls in the bucket)] of a stage, the last bound being +Inf
+    """
+    with _lock:
+        counts = list(_stages[stage].bucket_counts) if stage in _stages else [0] * (len(LATENCY_BUCKETS) + 1)
+    return list(zip(LATENCY_BUCKETS + (float("inf"),), counts))
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def prometheus_text():
+    """
+    renders every stage in the Prometheus text exposition format
+    """
+    lines = [
+        "# HELP churn_stage_duration_seconds Time spent in each stage of the prediction and loading paths.",
+        "# TYPE churn_stage_duration_seconds histogram",
+    ]
+    with _lock:
+        stages = [(stage, list(histogram.bucket_counts), histogram.count, histogram.seconds, histogram.rows, histogram.rows_per_second())
+                  for stage, histogram in sorted(_stages.items())]
+
+    for stage, bucket_counts, count, seconds, _, _ in stages:
+        cumulative = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS + (float("inf"),), bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'churn_stage_duration_seconds_bucket{{stage="{stage}",le="{_format_bound(bound)}"}} {cumulative}')
+        lines.append(f'churn_stage_duration_seconds_sum{{stage="{stage}"}} {seconds!r}')
+        lines.append(f'churn_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+
+    lines += ["# HELP churn_stage_rows_total Rows handled by each stage.", "# TYPE churn_stage_rows_total counter"]
+    lines += [f'churn_stage_rows_total{{stage="{stage}"}} {rows}' for stage, _, _, _, rows, _ in stages]
+
+    lines += ["# HELP churn_stage_rows_per_second Rows per second of each stage since the process started.",
+              "# TYPE churn_stage_rows_per_second gauge"]
+    lines += [f'churn_stage_rows_per_second{{stage="{stage}"}} {rate!r}' for stage, _, _, _, _, rate in stages if rate == rate]
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: str = METRICS_FILE):
+    """
+    writes the metrics file atomically, so a collector never reads half of it
+    """
+    global _last_export
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        f.write(prometheus_text())
+    os.replace(temporary, path)
+    _last_export = time.monotonic()
+    return path
+
+
+def export(path: str = METRICS_FILE):
+    """
+    rewrites the metrics file unless it was written in the last EXPORT_INTERVAL seconds
+    """
+    if time.monotonic() - _last_export < EXPORT_INTERVAL:
+        return
+    try:
+        write_textfile(path)
+    except OSError:
+        # Metrics must never fail a prediction
+        pass
@@ -0,0 +1,199 @@
+"""
+Synthetic Telco customers for load and scale testing
+
+Learns the distributions of the inbuilt dataset and streams any number of new
+customers to a csv, xlsx or parquet file in constant memory. The same seed
+always gives the same file, whatever the chunk size.
+
+Usage:
+    python -m utils.synthetic_data customers.csv --rows 1000000
+    python -m utils.synthetic_data customers.parquet --rows 10000000 --seed 7
+"""
+import pandas as pd
+import numpy as np
+import argparse
+import time
+import sys
+
+from utils import data_cache, scoring
+
+
+# Rows drawn from one random stream; fixed so the output does not depend on the write chunk size
+BLOCK_SIZE = 100_000
+
+# Excel sheets end at 1,048,576 rows including the header
+XLSX_MAX_ROWS = 1_048_575
+
+ADD_ONS = ["OnlineSecurity", "OnlineBackup", "DeviceProtection", "TechSupport", "StreamingTV", "StreamingMovies"]
+
+# Columns sampled together, each group conditioned on columns sampled before it
+GROUPS = [
+    (["Contract"], []),
+    (["tenure"], ["Contract"]),
+    (["InternetService"], ["Contract"]),
+    # Add-ons are "No internet service" exactly when there is no internet, and correlate with each other
+    (ADD_ONS, ["InternetService"]),
+    (["PhoneService", "MultipleLines"], ["InternetService"]),
+    (["gender"], []),
+    (["SeniorCitizen", "Partner", "Dependents"], []),
+    (["PaperlessBilling", "PaymentMethod"], ["Contract"]),
+]
+
+# Services that explain MonthlyCharges
+CHARGE_FEATURES = ["PhoneService", "MultipleLines", "InternetService"] + ADD_ONS
+
+
+class TelcoGenerator:
+    """
+    a small Bayesian network over the Telco schema fitted to a real dataset
+
+    Each column group is drawn from its empirical joint distribution given its
+    parent columns. MonthlyCharges is a linear function of the subscribed
+    services plus residual noise, and TotalCharges is tenure x MonthlyCharges
+    times a ratio drawn from the observed ratios.
+    """
+    def __init__(self, df):
+        df = df.copy()
+        # Keep SeniorCitizen in the 0/1 encoding of the raw files
+        if df["SeniorCitizen"].dtype == object:
+            df["SeniorCitizen"] = df["SeniorCitizen"].map({"Yes": 1, "No": 0})
+
+        self.tables = []
+        for columns, parents in GROUPS:
+            table = {}
+            for parent, group in (df.groupby(parents) if parents else [((), df)]):
+                combos = group[columns].value_counts(normalize = True, sort = False)
+                table[parent if isinstance(parent, tuple) else (parent,)] = (
+                    np.array(combos.index.tolist(), dtype = object).reshape(len(combos), len(columns)), combos.to_numpy())
+            self.tables.append((columns, parents, table))
+
+        # MonthlyCharges = services @ coefficients + noise
+        design = self._charge_design(df)
+        self.charge_levels = design.columns
+        self.coefficients, *_ = np.linalg.lstsq(design.to_numpy(dtype = np.float64), df["MonthlyCharges"].to_numpy(), rcond = None)
+        residuals = df["MonthlyCharges"].to_numpy() - design.to_numpy(dtype = np.float64) @ self.coefficients
+        self.charge_noise = residuals.std()
+        self.charge_range = (df["MonthlyCharges"].min(), df["MonthlyCharges"].max())
+
+        # TotalCharges / (tenure x MonthlyCharges) of real customers
+        total = pd.to_numeric(df["TotalCharges"], errors = "coerce")
+        ratios = total / (df["tenure"] * df["MonthlyCharges"])
+        self.total_ratios = ratios[np.isfinite(ratios)].to_numpy()
+
+    def _charge_design(self, df):
+        design = pd.get_dummies(df[CHARGE_FEATURES].astype(str), dtype = np.float64)
+        design.insert(0, "intercept", 1.0)
+        return design
+
+    def sample(self, n_rows, rng, first_id = 0):
+        """
+        draws n_rows customers with the columns of the inbuilt dataset
+        """
+        df = pd.DataFrame(index = range(n_rows))
+        for columns, parents, table in self.tables:
+            values = np.empty((n_rows, len(columns)), dtype = object)
+            for parent, (combos, probabilities) in table.items():
+                rows = np.flatnonzero(np.all([df[column].to_numpy() == value for column, value in zip(parents, parent)], axis = 0)) \
+                    if parents else np.arange(n_rows)
+                if rows.size:
+                    values[rows] = combos[rng.choice(len(combos), size = rows.size, p = probabilities)]
+            for position, column in enumerate(columns):
+                df[column] = values[:, position]
+
+        design = self._charge_design(df).reindex(columns = self.charge_levels, fill_value = 0.0)
+        design["intercept"] = 1.0
+        monthly = design.to_numpy(dtype = np.float64) @ self.coefficients + rng.normal(0, self.charge_noise, n_rows)
+        df["MonthlyCharges"] = np.round(np.clip(monthly, *self.charge_range), 2)
+
+        df["tenure"] = df["tenure"].astype(np.int64)
+        df["SeniorCitizen"] = df["SeniorCitizen"].astype(np.int64)
+        total = df["tenure"] * df["MonthlyCharges"] * rng.choice(self.total_ratios, size = n_rows)
+        # New customers (tenure 0) have not been billed yet, as in the real data
+        df["TotalCharges"] = np.where(df["tenure"] > 0, np.round(total, 2), np.nan)
+
+        df.insert(0, "customerID", [f"{first_id + i:010d}-SYN" for i in range(n_rows)])
+        return df[["customerID"] + scoring.expected_features]
+
+
+def generate(generator, n_rows, seed = 0, chunk_size = BLOCK_SIZE):
+    """
+    yields DataFrames of at most chunk_size customers, n_rows in total
+    """
+    for start in range(0, n_rows, BLOCK_SIZE):
+        # One random stream per block, seeded by (seed, block) so any chunk size gives the same rows
+        rng = np.random.default_rng([seed, start // BLOCK_SIZE])
+        block = generator.sample(min(BLOCK_SIZE, n_rows - start), rng, first_id = start)
+        for offset in range(0, len(block), chunk_size):
+            yield block.iloc[offset:offset + chunk_size]
+
+
+class ChunkWriter:
+    """
+    writes chunks to a csv, xlsx or parquet file as they are produced
+    """
+    def __init__(self, output: str):
+        if not output.endswith((".csv", ".xlsx", ".parquet")):
+            raise ValueError("Unsupported output type. Please use a csv, xlsx or parquet file")
+        self.output = output
+        self.writer = None
+        self.chunks_written = 0
+
+    def write(self, chunk):
+        if self.output.endswith(".csv"):
+            chunk.to_csv(self.output, mode = "a" if self.chunks_written else "w", header = not self.chunks_written, index = False)
+        elif self.output.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index = False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.output, table.schema)
+            self.writer.write_table(table)
+        else:
+            from openpyxl import Workbook
+            if self.writer is None:
+                # Write-only workbooks stream rows to disk instead of keeping the sheet in memory
+                self.writer = Workbook(write_only = True)
+                self.sheet = self.writer.create_sheet()
+                self.sheet.append(list(chunk.columns))
+            for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index = False, name = None):
+                self.sheet.append(row)
+        self.chunks_written += 1
+
+    def close(self):
+        if self.output.endswith(".xlsx") and self.writer is not None:
+            self.writer.save(self.output)
+        elif self.writer is not None:
+            self.writer.close()
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Stream synthetic Telco customers to a csv, xlsx or parquet file")
+    parser.add_argument("output", help = "csv, xlsx or parquet file to write")
+    parser.add_argument("--rows", type = int, default = 1_000_000, help = "number of customers")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--chunk-size", type = int, default = BLOCK_SIZE, help = "rows written at a time")
+    parser.add_argument("--source", default = data_cache.INBUILT_DATA, help = "dataset the distributions are learned from")
+    args = parser.parse_args(argv)
+
+    if args.output.endswith(".xlsx") and args.rows > XLSX_MAX_ROWS:
+        print(f"error: an xlsx sheet holds at most {XLSX_MAX_ROWS:,} rows, use csv or parquet", file = sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    generator = TelcoGenerator(data_cache.load_inbuilt_data(args.source))
+    try:
+        writer = ChunkWriter(args.output)
+        for chunk in generate(generator, args.rows, args.seed, args.chunk_size):
+            writer.write(chunk)
+        writer.close()
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file = sys.stderr)
+        return 2
+
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {args.rows:,} customers in {elapsed:.2f}s ({args.rows / max(elapsed, 1e-9):,.0f} rows/s) -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
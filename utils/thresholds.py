@@ -0,0 +1,91 @@
+"""
+Threshold sweeps over stored churn probabilities
+
+A bulk run keeps every customer's raw class-1 probability, so the labels of any
+other threshold follow without calling the model. The probabilities are sorted
+once, highest first, together with running sums of the monthly charges and of
+the known outcomes. Then the customers flagged at threshold t are a prefix of
+that order, and every count and sum at t is one binary search plus a lookup.
+A sweep over any number of thresholds costs O(thresholds * log rows).
+
+Usage:
+    sweep = thresholds.ThresholdSweep(history["Churn_probability"], history["MonthlyCharges"], history.get("Actual_Churn"))
+    sweep.at([0.1, 0.2, 0.5])
+"""
+import pandas as pd
+import numpy as np
+
+
+class ThresholdSweep:
+    """
+    labels, confusion counts, precision/recall and revenue of a scored run at any threshold
+
+    Revenue is monthly: `expected_retained_revenue` is the churn-probability-weighted MonthlyCharges of the
+    flagged customers, the revenue a retention campaign on them could expect to keep. With known outcomes,
+    `retained_revenue` is the MonthlyCharges of the flagged customers who did churn.
+    """
+    def __init__(self, probability, monthly_charges, actual = None):
+        probability = np.asarray(probability, dtype = np.float64)
+        # Rows without a probability are never flagged, rows without charges add nothing to revenue
+        probability = np.where(np.isnan(probability), -np.inf, probability)
+        charges = np.nan_to_num(np.asarray(monthly_charges, dtype = np.float64))
+
+        order = np.argsort(-probability, kind = "stable")
+        self.rows = len(order)
+        self.descending = probability[order]
+        self.cumulative_expected = np.concatenate([[0.0], np.cumsum(np.maximum(self.descending, 0) * charges[order])])
+        self.cumulative_charges = np.concatenate([[0.0], np.cumsum(charges[order])])
+
+        self.has_actual = actual is not None and pd.Series(actual).notna().any()
+        if self.has_actual:
+            churned = (pd.Series(actual).to_numpy(dtype = object) == "Yes")[order]
+            self.positives = int(churned.sum())
+            self.cumulative_positives = np.concatenate([[0], np.cumsum(churned)])
+            self.cumulative_positive_charges = np.concatenate([[0.0], np.cumsum(charges[order] * churned)])
+
+    def flagged(self, thresholds):
+        """
+        returns how many customers have a probability of at least each threshold
+        """
+        thresholds = np.asarray(thresholds, dtype = np.float64)
+        # The probabilities are descending, so the flagged customers are the first ones
+        return np.searchsorted(-self.descending, -thresholds, side = "right")
+
+    def at(self, thresholds):
+        """
+        returns one row of counts, rates and revenue per threshold
+        """
+        thresholds = np.atleast_1d(np.asarray(thresholds, dtype = np.float64))
+        flagged = self.flagged(thresholds)
+        result = {
+            "threshold": thresholds,
+            "predicted_churners": flagged,
+            "predicted_retained": self.rows - flagged,
+            "flagged_share": flagged / max(self.rows, 1),
+            "flagged_revenue": self.cumulative_charges[flagged],
+            "expected_retained_revenue": self.cumulative_expected[flagged],
+        }
+        if self.has_actual:
+            true_positives = self.cumulative_positives[flagged]
+            false_positives = flagged - true_positives
+            false_negatives = self.positives - true_positives
+            with np.errstate(invalid = "ignore", divide = "ignore"):
+                precision = np.where(flagged > 0, true_positives / flagged, np.nan)
+                recall = np.where(self.positives > 0, true_positives / max(self.positives, 1), np.nan)
+            result.update({
+                "true_positives": true_positives,
+                "false_positives": false_positives,
+                "false_negatives": false_negatives,
+                "true_negatives": self.rows - flagged - false_negatives,
+                "precision": precision,
+                "recall": recall,
+                "retained_revenue": self.cumulative_positive_charges[flagged],
+            })
+        return pd.DataFrame(result)
+
+
+def labels(probability, threshold: float):
+    """
+    returns the Yes/No labels of a threshold, as bulk predictions would have given them
+    """
+    return np.where(np.asarray(probability, dtype = np.float64) >= threshold, "Yes", "No")
@@ -0,0 +1,315 @@
+from scipy.special import expit, ndtri
+import pandas as pd
+import numpy as np
+
+
+# Rows evaluated together, bounds the (rows x trees) work arrays
+DEFAULT_BLOCK_SIZE = 1_024
+
+# QuantileTransformer's margin for mapping values onto the first and last quantile
+BOUNDS_THRESHOLD = 1e-7
+
+# Deepest trees evaluated with split-bit lookup tables, deeper ones are walked node by node
+MAX_TABLE_DEPTH = 3
+
+
+class CompiledPreprocessor:
+    """
+    the fitted ColumnTransformer of the churn pipelines re-expressed as NumPy operations
+
+    numeric columns: mean/median imputation -> RobustScaler -> QuantileTransformer
+    categorical columns: most-frequent imputation -> OneHotEncoder(handle_unknown="ignore")
+
+    Uses the fitted statistics, so the output equals preprocessor.transform without
+    the per-call validation and pandas column handling.
+    """
+    def __init__(self, preprocessor):
+        transformers = {name: (pipeline, columns) for name, pipeline, columns in preprocessor.transformers_ if name != "remainder"}
+        if set(transformers) != {"num_pipeline", "cat_pipeline"} or preprocessor.remainder != "drop":
+            raise ValueError("Unsupported preprocessor, expected num_pipeline and cat_pipeline only")
+
+        num_pipeline, self.numeric_columns = transformers["num_pipeline"]
+        cat_pipeline, self.categorical_columns = transformers["cat_pipeline"]
+        if [name for name, _ in num_pipeline.steps] != ["numerical_imputer", "scaler", "quantile_transform"] or \
+           [name for name, _ in cat_pipeline.steps] != ["categorical_imputer", "encoder"]:
+            raise ValueError("Unsupported preprocessing steps")
+
+        self.numeric_fill = num_pipeline.named_steps["numerical_imputer"].statistics_
+        scaler = num_pipeline.named_steps["scaler"]
+        self.center = scaler.center_ if scaler.center_ is not None else np.zeros(len(self.numeric_columns))
+        self.scale = scaler.scale_ if scaler.scale_ is not None else np.ones(len(self.numeric_columns))
+        quantile = num_pipeline.named_steps["quantile_transform"]
+        if quantile.output_distribution != "normal":
+            raise ValueError("Unsupported quantile transform, expected a normal output distribution")
+        self.quantiles = quantile.quantiles_.T
+        self.references = quantile.references_
+        # norm.ppf is ndtri with its argument checks, the clip keeps the bounds finite
+        self.clip_min = ndtri(BOUNDS_THRESHOLD - np.spacing(1))
+        self.clip_max = ndtri(1 - (BOUNDS_THRESHOLD - np.spacing(1)))
+
+        self.categorical_fill = cat_pipeline.named_steps["categorical_imputer"].statistics_
+        encoder = cat_pipeline.named_steps["encoder"]
+        if encoder.drop is not None or encoder.handle_unknown != "ignore":
+            raise ValueError("Unsupported one-hot encoder settings")
+        self.category_index = [pd.Index(categories, dtype = object) for categories in encoder.categories_]
+        sizes = [len(categories) for categories in encoder.categories_]
+        self.offsets = len(self.numeric_columns) + np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        self.n_features = len(self.numeric_columns) + sum(sizes)
+        # Input column of every output feature, the one-hot features of a column all map back to it
+        self.input_columns = list(self.numeric_columns) + list(self.categorical_columns)
+        self.feature_input = np.concatenate([np.arange(len(self.numeric_columns)),
+                                             len(self.numeric_columns) + np.repeat(np.arange(len(sizes)), sizes)]).astype(np.intp)
+
+    def transform_numeric(self, values):
+        """
+        imputes, robust-scales and quantile-transforms an (n, 3) float array
+        """
+        values = np.array(values, dtype = np.float64)
+        missing = np.isnan(values)
+        values[missing] = np.broadcast_to(self.numeric_fill, values.shape)[missing]
+        values = (values - self.center) / self.scale
+        for column, quantiles in enumerate(self.quantiles):
+            x = values[:, column]
+            lower = x - BOUNDS_THRESHOLD < quantiles[0]
+            upper = x + BOUNDS_THRESHOLD > quantiles[-1]
+            # Interpolated both ways and averaged, as repeated quantiles would otherwise pick one extreme
+            x = 0.5 * (np.interp(x, quantiles, self.references) - np.interp(-x, -quantiles[::-1], -self.references[::-1]))
+            x[upper] = 1
+            x[lower] = 0
+            values[:, column] = np.clip(ndtri(x), self.clip_min, self.clip_max)
+        return values
+
+    def category_codes(self, position, values):
+        """
+        returns the one-hot position of every value of one categorical column, -1 for unknown values
+        """
+        values = np.asarray(values, dtype = object)
+        # The imputer only treats NaN as missing (x != x), a None is looked up as a category of its own
+        nan = values != values
+        if nan.any():
+            values = values.copy()
+            values[nan] = self.categorical_fill[position]
+        return self.category_index[position].get_indexer(values)
+
+    def transform(self, df, dtype = np.float64):
+        """
+        returns the dense (n, n_features) matrix of the fitted preprocessor
+        """
+        X = np.zeros((len(df), self.n_features), dtype = dtype)
+        X[:, :len(self.numeric_columns)] = self.transform_numeric(df[self.numeric_columns].to_numpy(dtype = np.float64))
+        rows = np.arange(len(df))
+        for position, column in enumerate(self.categorical_columns):
+            codes = self.category_codes(position, df[column].to_numpy(dtype = object))
+            known = codes >= 0
+            X[rows[known], self.offsets[position] + codes[known]] = 1.0
+        return X
+
+
+def expected_values(tree, learning_rate):
+    """
+    returns the learning-rate scaled value of every node, an internal node holding the sample-weighted mean of its leaves
+
+    Gradient boosting updates the leaf values only, the stored value of a split node is the
+    mean residual it was grown on and not the mean of the leaves below it.
+    """
+    expected = learning_rate * tree.value[:, 0, 0].astype(np.float64)
+    weight = tree.weighted_n_node_samples
+    left, right = tree.children_left, tree.children_right
+    # Children are numbered after their parent, so walking backwards visits them first
+    for node in range(tree.node_count - 1, -1, -1):
+        if left[node] != -1:
+            children_weight = weight[left[node]] + weight[right[node]]
+            expected[node] = (weight[left[node]] * expected[left[node]] + weight[right[node]] * expected[right[node]]) / children_weight
+    return expected
+
+
+class VectorizedGradientBoost:
+    """
+    the fitted trees of a gradient boosting pipeline compiled into flat NumPy node arrays
+
+    All trees are evaluated for a whole block of rows at once. For shallow trees
+    (the default depth of 3) every tree is padded to a perfect binary tree; the
+    decisions of its 7 split nodes form a 7-bit code that indexes a table of leaf
+    values, so a block costs one comparison per distinct split and one lookup per
+    tree. Works as a drop-in for the pipeline's predict_proba.
+
+    raw_contributions splits each row's raw score over the input columns by tree
+    path attribution: every split on a row's path adds the change in the tree's
+    expected value to the column it splits on, so `expected_raw` plus a row's
+    contributions is its raw score (log-odds).
+    """
+    def __init__(self, pipeline, block_size = DEFAULT_BLOCK_SIZE):
+        self.preprocessor = CompiledPreprocessor(pipeline.named_steps["preprocessor"])
+        classifier = pipeline.named_steps["classifier"]
+        if classifier.estimators_.shape[1] != 1:
+            raise ValueError("Only binary gradient boosting classifiers can be compiled")
+
+        self.classes_ = classifier.classes_
+        self.block_size = block_size
+        # The init estimator predicts the same raw score (prior log-odds) for every row
+        self.init_raw = float(classifier._raw_predict_init(np.zeros((1, classifier.n_features_in_)))[0, 0])
+
+        trees = [estimator.tree_ for estimator in classifier.estimators_[:, 0]]
+        self.depth = max(tree.max_depth for tree in trees)
+        expected = [expected_values(tree, classifier.learning_rate) for tree in trees]
+        # Raw score of a row about which nothing is known, the start of every attribution
+        self.expected_raw = self.init_raw + sum(values[0] for values in expected)
+        if self.depth <= MAX_TABLE_DEPTH:
+            self._compile_tables(trees, classifier.learning_rate, expected)
+        else:
+            self._compile_nodes(trees, classifier.learning_rate, expected)
+
+    def _compile_tables(self, trees, learning_rate, expected):
+        n_splits, n_leaves = 2 ** self.depth - 1, 2 ** self.depth
+        feature = np.zeros((n_splits, len(trees)), dtype = np.intp)
+        threshold = np.full((n_splits, len(trees)), np.inf)
+        leaf_value = np.zeros((len(trees), n_leaves))
+        # Tree node at every heap position, a padded position repeats the leaf above it
+        node_at = np.zeros((len(trees), n_splits + n_leaves), dtype = np.intp)
+
+        for t, tree in enumerate(trees):
+            # Heap-ordered walk; a leaf above the last level becomes an always-left split
+            stack = [(0, 0, 0)]
+            while stack:
+                node, position, level = stack.pop()
+                node_at[t, position] = node
+                if level == self.depth:
+                    leaf_value[t, position - n_splits] = learning_rate * tree.value[node, 0, 0]
+                elif tree.children_left[node] == -1:
+                    stack += [(node, 2 * position + 1, level + 1), (node, 2 * position + 2, level + 1)]
+                else:
+                    feature[position, t] = tree.feature[node]
+                    threshold[position, t] = tree.threshold[node]
+                    stack += [(tree.children_left[node], 2 * position + 1, level + 1),
+                              (tree.children_right[node], 2 * position + 2, level + 1)]
+
+        # Many trees share splits (one-hot columns always split at 0.5), each distinct split is compared once
+        splits, split_index = np.unique(np.column_stack([feature.ravel(), threshold.ravel()]), axis = 0, return_inverse = True)
+        self.split_feature = splits[:, 0].astype(np.intp)
+        self.split_threshold = splits[:, 1]
+        self.split_index = split_index.reshape(n_splits, len(trees))
+
+        # Bit j of a code is set when split node j sends the row right; follow the bits to a leaf
+        path_of_code = np.zeros((2 ** n_splits, self.depth + 1), dtype = np.intp)
+        for code in range(2 ** n_splits):
+            position = 0
+            for level in range(self.depth):
+                position = 2 * position + 1 + ((code >> position) & 1)
+                path_of_code[code, level + 1] = position
+        leaf_of_code = path_of_code[:, -1] - n_splits
+        self.code_value = leaf_value[:, leaf_of_code].ravel()
+        self.code_base = np.arange(len(trees)) * 2 ** n_splits
+
+        # What every code of every tree adds to each input column: the change of expected value
+        # at each split on its path, padded levels stay on the same leaf and add nothing
+        n_inputs = len(self.preprocessor.input_columns)
+        code_contribution = np.zeros((n_inputs, len(trees), 2 ** n_splits))
+        codes = np.arange(2 ** n_splits)
+        for t, tree in enumerate(trees):
+            for level in range(self.depth):
+                parent = node_at[t, path_of_code[:, level]]
+                child = node_at[t, path_of_code[:, level + 1]]
+                split_input = self.preprocessor.feature_input[np.where(tree.children_left[parent] == -1, 0, tree.feature[parent])]
+                np.add.at(code_contribution, (split_input, t, codes), expected[t][child] - expected[t][parent])
+        # Most trees split on one or two columns (many not at all), each column only sums the trees that touch it
+        self.column_trees = [np.flatnonzero(code_contribution[column].any(axis = 1)) for column in range(n_inputs)]
+        self.column_value = code_contribution.reshape(n_inputs, -1)
+
+    def _compile_nodes(self, trees, learning_rate, expected):
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+        self.roots = offsets.astype(np.intp)
+        feature, threshold, left, right, value = [], [], [], [], []
+        for offset, tree in zip(offsets, trees):
+            is_leaf = tree.children_left == -1
+            nodes = np.arange(tree.node_count) + offset
+            # Leaves point back to themselves so every row can take the same number of steps
+            left.append(np.where(is_leaf, nodes, tree.children_left + offset))
+            right.append(np.where(is_leaf, nodes, tree.children_right + offset))
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            value.append(learning_rate * tree.value[:, 0, 0])
+        self.node_feature = np.concatenate(feature).astype(np.intp)
+        self.node_threshold = np.concatenate(threshold)
+        self.node_left = np.concatenate(left).astype(np.intp)
+        self.node_right = np.concatenate(right).astype(np.intp)
+        self.node_value = np.concatenate(value)
+        self.node_expected = np.concatenate(expected)
+        self.node_input = self.preprocessor.feature_input[self.node_feature]
+
+    def transform(self, df):
+        """
+        applies the compiled preprocessing, returning the float32 matrix the trees were grown on
+        """
+        return self.preprocessor.transform(df, dtype = np.float32)
+
+    def _block_codes(self, XT):
+        """
+        returns the (trees, rows) positions in the code tables of a feature-major block
+        """
+        # Same split rule as sklearn: float32 feature value <= float64 threshold goes left
+        goes_right = (~(XT[self.split_feature] <= self.split_threshold[:, None])).view(np.uint8)
+        code = goes_right[self.split_index[0]]
+        for j in range(1, self.split_index.shape[0]):
+            code |= goes_right[self.split_index[j]] << j
+        return self.code_base[:, None] + code
+
+    def _block_raw(self, X):
+        # Feature-major copy of the block so every split and tree reads contiguous rows
+        XT = np.ascontiguousarray(X.T)
+        if self.depth <= MAX_TABLE_DEPTH:
+            return self.init_raw + self.code_value[self._block_codes(XT)].sum(axis = 0)
+
+        node = np.repeat(self.roots[:, None], XT.shape[1], axis = 1)
+        for _ in range(self.depth):
+            x = np.take_along_axis(XT, self.node_feature[node], axis = 0)
+            node = np.where(x <= self.node_threshold[node], self.node_left[node], self.node_right[node])
+        return self.init_raw + self.node_value[node].sum(axis = 0)
+
+    def _block_contributions(self, X):
+        XT = np.ascontiguousarray(X.T)
+        n_inputs = len(self.preprocessor.input_columns)
+        if self.depth <= MAX_TABLE_DEPTH:
+            index = self._block_codes(XT)
+            contributions = np.zeros((XT.shape[1], n_inputs))
+            for column, trees in enumerate(self.column_trees):
+                if len(trees):
+                    contributions[:, column] = self.column_value[column][index[trees]].sum(axis = 0)
+            return contributions
+
+        node = np.repeat(self.roots[:, None], XT.shape[1], axis = 1)
+        inputs, deltas = [], []
+        for _ in range(self.depth):
+            x = np.take_along_axis(XT, self.node_feature[node], axis = 0)
+            child = np.where(x <= self.node_threshold[node], self.node_left[node], self.node_right[node])
+            inputs.append(self.node_input[node])
+            deltas.append(self.node_expected[child] - self.node_expected[node])
+            node = child
+        # One weighted count per (row, input column) adds up every step of every path at once
+        slots = np.arange(XT.shape[1]) * n_inputs + np.stack(inputs)
+        return np.bincount(slots.ravel(), weights = np.stack(deltas).ravel(), minlength = XT.shape[1] * n_inputs).reshape(XT.shape[1], n_inputs)
+
+    def raw_contributions(self, X):
+        """
+        returns the (n, input columns) tree path attribution of the raw scores, in the order of preprocessor.input_columns
+        """
+        contributions = np.empty((X.shape[0], len(self.preprocessor.input_columns)))
+        for start in range(0, X.shape[0], self.block_size):
+            contributions[start:start + self.block_size] = self._block_contributions(X[start:start + self.block_size])
+        return contributions
+
+    def raw_predict(self, X):
+        raw = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], self.block_size):
+            raw[start:start + self.block_size] = self._block_raw(X[start:start + self.block_size])
+        return raw
+
+    def predict_proba(self, df):
+        positive = expit(self.raw_predict(self.transform(df)))
+        return np.column_stack([1 - positive, positive])
+
+
+def compile_pipeline(pipeline, block_size = DEFAULT_BLOCK_SIZE):
+    """
+    compiles a fitted gradient boosting pipeline, raising ValueError for unsupported pipelines
+    """
+    return VectorizedGradientBoost(pipeline, block_size)